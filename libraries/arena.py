@@ -0,0 +1,67 @@
+# Memory arena
+# The long-lived buffers of the controller are carved from one block allocated up front (see Linda), the work
+#   buffers of every module take an optional arena and fall back to the heap without one
+
+
+class MemoryArena:
+    def __init__(self, size_bytes: int) -> None:
+        """
+        One block of memory allocated up front and carved into the long-lived buffers of the controller, so
+        the heap is left with small objects only, never fragments around the big buffers, and a collection
+        has little to scan. Regions are handed out in order and never given back
+
+        Args:
+            size_bytes (int): Size of the whole arena
+        """
+        self._mem = memoryview(bytearray(size_bytes))
+        self._used = 0
+
+    def __len__(self) -> int:
+        return len(self._mem)
+
+    def __repr__(self) -> str:
+        return f"MemoryArena: {self._used} of {len(self._mem)} bytes carved"
+
+    def free(self) -> int:
+        """
+        Returns:
+            int: Bytes left to carve
+        """
+        return len(self._mem) - self._used
+
+    def carve(self, size_bytes: int) -> memoryview:
+        """
+        Take the next region of the arena
+
+        Args:
+            size_bytes (int): Size of the region
+
+        Returns:
+            memoryview: The region, zeroed only if it hasn't been written since the arena was made
+
+        Raises:
+            MemoryError: The arena has less than size_bytes left
+        """
+        if size_bytes > self.free():
+            raise MemoryError(f"Arena region of {size_bytes} bytes doesn't fit, {self.free()} bytes left")
+        region = self._mem[self._used:self._used + size_bytes]
+        self._used += size_bytes
+        return region
+
+    def sub_arena(self, size_bytes: int) -> 'MemoryArena':
+        """
+        Carve a region and manage it as an arena of its own, e.g. for the scratch buffers of one module
+        """
+        arena = MemoryArena(0)
+        arena._mem = self.carve(size_bytes)
+        return arena
+
+
+def arena_buffer(arena: MemoryArena, size_bytes: int):
+    """
+    Buffer carved from arena, or allocated on the heap without one
+
+    Returns:
+        memoryview: The region of the arena, or a new bytearray
+    """
+    return bytearray(size_bytes) if arena is None else arena.carve(size_bytes)
@@ -0,0 +1,196 @@
+from micropython import const
+from utime import ticks_ms, ticks_diff
+import array
+import uasyncio as asyncio
+
+from framing import FRAME_FLAG_LAST, FRAME_FLAG_COMPRESSED, FRAME_FLAG_POLL
+from laser import LindaLaser
+from rxframe import RX_ACK_SIZE
+from fec import FEC_MAX_DATA
+from compression import COMPRESS_OFFSET_SIZE
+from trace import TRACE_INFO, TR_TX_EMPTY, TR_ARQ_START, TR_ARQ_ABORTED, TR_ARQ_FAILED, TR_ARQ_DONE, TR_ARQ_RATE
+
+# Reliable transfers, selective-repeat ARQ over the half-duplex laser link
+# The message is split into numbered blocks, one per frame, exactly as transmit_data() would send it. The
+#   sender sends every unacknowledged block of its window in one burst, marking the last frame with
+#   FRAME_FLAG_POLL, then listens. The receiver stores each good block in place in its inbox and answers
+#   with an acknowledgement frame:
+# | BASE (2) | BITMAP (ARQ_WINDOW / 8) |
+#   BASE is the first block the receiver is still missing, and bit i of the bitmap, MSB first, is set if it
+#   has block BASE + i. The sender slides its window up to BASE and only resends the blocks still missing.
+#   Frame sequence numbers are block numbers modulo 256, unwrapped by the receiver around its window. The
+#   receiver's side is in arqrx.py
+#
+# Blocks per burst, at most 128 so sequence numbers unwrap unambiguously
+ARQ_WINDOW = const(32)
+ARQ_ACK_SIZE = const(2 + ARQ_WINDOW // 8)
+# Fewest message bytes in any block but the last, which sizes the receiver's block bitmap. Plain blocks
+#   carry FRAME_MAX_PAYLOAD bytes, or FEC_MAX_DATA with FEC, and compressed ones fall back to storing the
+#   data rather than carry less
+ARQ_MIN_BLOCK = FEC_MAX_DATA - COMPRESS_OFFSET_SIZE
+# Time the sender waits for an acknowledgement, longer than the receiver waits for a burst, so that a lost
+#   poll makes the receiver answer before the sender gives up on it
+ARQ_ACK_TIMEOUT_S = const(3)
+ARQ_ROUND_TIMEOUT_S = const(1)
+# Pause before either end starts sending, so the other end has switched over to listening
+ARQ_TURNAROUND_MS = const(50)
+# Rounds without progress before a transfer is abandoned
+ARQ_MAX_RETRIES = const(8)
+# Quiet rounds after which the receiver stops listening, longer than the sender waits for an acknowledgement
+#   so a sender still resending is always heard, e.g. once it has everything and its last acknowledgement
+#   was lost
+ARQ_LINGER_ROUNDS = const(ARQ_ACK_TIMEOUT_S // ARQ_ROUND_TIMEOUT_S + 1)
+# Pause between two reliable transfers, for the receiver to give up on the first and listen for the next
+ARQ_TRANSFER_GAP_MS = const((ARQ_LINGER_ROUNDS + 1) * ARQ_ROUND_TIMEOUT_S * 1000)
+
+assert ARQ_ACK_SIZE <= RX_ACK_SIZE
+
+
+async def send_reliable(laser: LindaLaser, data_mv: memoryview=None) -> bool:
+    """
+    Send a message with selective-repeat ARQ, to a receiver running receive_reliable(). Frames are sent
+    directly rather than through the laser's tx_pipeline, since they don't go out in order. LindaLaser.abort_tx()
+    and preempt_tx() stop the transfer at the end of the frame on the wire, or once the acknowledgement it
+    waits for is in, and the receiver is left with an incomplete message
+
+    Args:
+        laser (LindaLaser): Laser of the sending node
+        data_mv (memoryview, optional): The message to send. Defaults to None, the outbox message.
+
+    Returns:
+        bool: True once the receiver has acknowledged every block, LindaLaser.tx_aborted tells an aborted
+            transfer from a failed one
+    """
+    outer = laser._tx_begin()
+    try:
+        return await _send_reliable(laser, data_mv)
+    finally:
+        laser._tx_end(outer)
+
+async def _send_reliable(laser: LindaLaser, data_mv: memoryview) -> bool:
+    laser.tx_aborted = False
+    if data_mv is None:
+        data_mv = laser.outbox.view()
+    data_mv = memoryview(data_mv)
+    msg_len = len(data_mv)
+    if msg_len == 0:
+        laser.trace.emit(TRACE_INFO, TR_TX_EMPTY)
+        return True
+    compressor = laser._tx_compressor(0)
+    flags = 0
+    if compressor is not None:
+        compressor.reset_stats()
+        flags = FRAME_FLAG_COMPRESSED
+    fec = laser._tx_fec(0)
+    # Message offset of every block made so far and of the next one. Compressed blocks are only known
+    #   once made, and are made again the same way when resent
+    starts = array.array('I', (0,))
+    total = -1
+    # Acknowledged flags of the window's blocks, indexed by block % ARQ_WINDOW
+    acked = bytearray(ARQ_WINDOW)
+    base = 0
+    sent = 0
+    rounds = 0
+    retries = 0
+    start_ms = ticks_ms()
+    laser.trace.emit(TRACE_INFO, TR_ARQ_START, msg_len)
+    while total < 0 or base < total:
+        made = len(starts) - 1
+        end = base + ARQ_WINDOW if total < 0 else min(base + ARQ_WINDOW, total)
+        # The poll goes on the last block of the burst
+        poll = end - 1
+        while poll > base and poll < made and acked[poll % ARQ_WINDOW]:
+            poll -= 1
+        for block in range(base, end):
+            if block < made and acked[block % ARQ_WINDOW]:
+                continue
+            if block >= made and starts[made] >= msg_len:
+                break
+            payload_mv, next_start = laser._tx_payload(data_mv, starts[block], compressor, fec)
+            if block == made:
+                starts.append(next_start)
+                made += 1
+                if next_start >= msg_len:
+                    total = made
+            frame_flags = flags | (FRAME_FLAG_LAST if next_start >= msg_len else 0) | (FRAME_FLAG_POLL if block == poll else 0)
+            laser.frame_writer.seq = block & 0xFF
+            for segment_mv in laser._tx_frame(payload_mv, frame_flags, fec):
+                laser._transmit_segment(segment_mv)
+                await asyncio.sleep_ms(0)
+            sent += 1
+            # Only between frames, a frame cut short would garble the next one at the receiver
+            if laser._tx_abort:
+                break
+        if laser._tx_abort and block != poll:
+            # An empty poll ends the burst early, so the receiver answers and winds down now rather than
+            #   run into the next transfer while still waiting out this one
+            laser.frame_writer.seq = (block + 1) & 0xFF
+            for segment_mv in laser._tx_frame(data_mv[:0], FRAME_FLAG_POLL, fec):
+                laser._transmit_segment(segment_mv)
+                await asyncio.sleep_ms(0)
+        laser.laser.off()
+        rounds += 1
+        await laser.start_rx_async(ARQ_ACK_TIMEOUT_S)
+        if laser._tx_abort:
+            laser._tx_done(msg_len, ticks_diff(ticks_ms(), start_ms), True)
+            laser.trace.emit(TRACE_INFO, TR_ARQ_ABORTED, base)
+            return False
+        progress = False
+        if laser.rx_ack_pending and laser.rx_ack_len >= ARQ_ACK_SIZE:
+            ack = laser.rx_ack
+            ack_base = (ack[0] << 8) | ack[1]
+            if ack_base > base:
+                base = ack_base
+                progress = True
+            # Acknowledgements may overlap the window only partly, e.g. a late one from an earlier round
+            for idx in range(ARQ_WINDOW):
+                block = ack_base + idx
+                if block < base or block >= base + ARQ_WINDOW:
+                    continue
+                received = (ack[2 + (idx >> 3)] >> (7 - (idx & 7))) & 1
+                if received and not acked[block % ARQ_WINDOW]:
+                    progress = True
+                acked[block % ARQ_WINDOW] = received
+        retries = 0 if progress else retries + 1
+        if retries > ARQ_MAX_RETRIES:
+            laser.trace.emit(TRACE_INFO, TR_ARQ_FAILED, retries, base)
+            return False
+        await asyncio.sleep_ms(ARQ_TURNAROUND_MS)
+    elapsed_ms = max(ticks_diff(ticks_ms(), start_ms), 1)
+    laser._tx_done(msg_len, elapsed_ms)
+    laser.trace.emit(TRACE_INFO, TR_ARQ_DONE, msg_len, total, sent - total)
+    laser.trace.emit(TRACE_INFO, TR_ARQ_RATE, rounds, 8000 * msg_len // elapsed_ms)
+    return True
+
+async def send_queue_reliable(laser: LindaLaser) -> int:
+    """
+    Send every message queued in the outbox, highest priority first, each as a reliable transfer of its own
+    and taken out of the queue once acknowledged. A message preempted by a more urgent one (see
+    LindaLaser.preempt_tx()) is sent again after it, while abort_tx() or a failed transfer leaves the rest
+    of the queue for later
+
+    Args:
+        laser (LindaLaser): Laser of the sending node, with a queueing outbox
+
+    Returns:
+        int: Number of messages sent
+    """
+    outer = laser._tx_begin()
+    outbox = laser.outbox
+    sent = 0
+    try:
+        slot = outbox.peek()
+        while slot >= 0:
+            laser._tx_queue_start(slot)
+            if not await _send_reliable(laser, outbox.message(slot)) and not laser.tx_aborted:
+                break
+            sent += not laser.tx_aborted
+            if not laser._tx_queue_done(slot):
+                break
+            slot = outbox.peek()
+            if slot >= 0:
+                await asyncio.sleep_ms(ARQ_TRANSFER_GAP_MS)
+    finally:
+        laser.tx_priority = -1
+        laser._tx_end(outer)
+    return sent
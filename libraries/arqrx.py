@@ -0,0 +1,77 @@
+import uasyncio as asyncio
+
+from framing import FRAME_FLAG_ACK
+from laser import LindaLaser
+from arq import ARQ_WINDOW, ARQ_ACK_SIZE, ARQ_MIN_BLOCK, ARQ_ROUND_TIMEOUT_S, ARQ_TURNAROUND_MS, ARQ_LINGER_ROUNDS
+from trace import TRACE_INFO, TR_ARQ_RECEIVED, TR_ARQ_INCOMPLETE
+
+# Receiving end of reliable transfers, see arq.py. Blocks are stored in place in the inbox as they arrive (see
+#   rxframe.py), and every burst is answered with an acknowledgement of the blocks stored so far
+
+
+async def receive_reliable(laser: LindaLaser, timeout: int=5) -> bool:
+    """
+    Receive a message sent with send_reliable() into the inbox, acknowledging every burst. Returns early,
+    without acknowledging, if a link training control frame arrives instead
+
+    Args:
+        laser (LindaLaser): Laser of the receiving node
+        timeout (int, optional): Time to wait for the first burst, in seconds. Defaults to 5.
+
+    Returns:
+        bool: True if the whole message arrived
+    """
+    inbox = laser.inbox
+    received = bytearray((len(inbox._data) // ARQ_MIN_BLOCK + 8) // 8)
+    ack = bytearray(ARQ_ACK_SIZE)
+    laser.rx_blocks = received
+    base = 0
+    last = -1
+    msg_len = 0
+    quiet = 0
+    complete = False
+    round_timeout = timeout
+    try:
+        while True:
+            # Resent blocks can be up to a window behind the first missing one
+            laser.rx_block_base = max(base - ARQ_WINDOW, 0)
+            frames = laser.frame_decoder.frames_ok
+            await laser.start_rx_async(round_timeout)
+            # Every round starts the inbox over, the blocks stay where they were stored
+            msg_len = max(msg_len, len(inbox))
+            if laser.rx_train_pending:
+                return False
+            if laser.rx_last_block >= 0:
+                last = laser.rx_last_block
+            round_timeout = ARQ_ROUND_TIMEOUT_S
+            if laser.frame_decoder.frames_ok == frames:
+                # A burst that arrived damaged is left unanswered, the sender resends it once its wait for
+                #   an acknowledgement runs out. Only a link that stays dark means the sender is done or gone
+                quiet = quiet + 1 if laser.rx_bit_count == 0 else 0
+                if quiet >= ARQ_LINGER_ROUNDS:
+                    break
+                continue
+            quiet = 0
+            while base < 8 * len(received) and received[base >> 3] & (0x80 >> (base & 7)):
+                base += 1
+            complete = 0 <= last < base
+            ack[0] = base >> 8
+            ack[1] = base & 0xFF
+            for idx in range(ARQ_WINDOW // 8):
+                byte = 0
+                for bit in range(8):
+                    block = base + 8 * idx + bit
+                    if block < 8 * len(received):
+                        byte |= ((received[block >> 3] >> (7 - (block & 7))) & 1) << (7 - bit)
+                ack[2 + idx] = byte
+            await asyncio.sleep_ms(ARQ_TURNAROUND_MS)
+            await laser.transmit_data_async(ack, FRAME_FLAG_ACK)
+    finally:
+        laser.rx_blocks = None
+        laser.rx_block_base = 0
+        inbox._data_len = msg_len
+    if complete:
+        laser.trace.emit(TRACE_INFO, TR_ARQ_RECEIVED, msg_len, last + 1)
+    else:
+        laser.trace.emit(TRACE_INFO, TR_ARQ_INCOMPLETE, msg_len, base)
+    return complete
@@ -0,0 +1,154 @@
+from encoding import HAMMING_DATA_SIZE, HAMMING_TOTAL_SIZE, ASCII_STX, ASCII_EOT, hamming_encode_into, \
+    hamming_decode_into
+
+# ASCII messages through the table-driven Hamming(7,4)+parity codec of encoding.py
+# A message is wrapped in STX and EOT before it is encoded, and the markers are stripped again when it is decoded
+
+
+class HammingData:
+    def __init__(self, encoded_data: bytearray = bytearray(0),  data_string: str = ""):
+        self.data_string = data_string
+        self.encoded_data = encoded_data
+        self.decoded_string = ""
+        self.decoded_data = encoded_data
+        # Error counts from the last decode()
+        self.corrected = 0
+        self.detected = 0
+
+    def __str__(self):
+        return f"Data String: {self.data_string} -> Encoded Bits: {self.encoded_data}"
+    
+
+    def encode(self, data_string: str) -> int:
+        # Save the data string internally
+        self.data_string = data_string
+        # Encode the data_string and save the resulting bytearray() 
+        self.encoded_data = _encode_ascii(data_string)
+        return 1
+
+    def decode(self) -> int:
+        # Pass a memoryview pointer of the encoded data to the table-driven decoder
+        encoded_mv = memoryview(self.encoded_data)
+        self.decoded_data = bytearray(len(encoded_mv) // 2)
+        self.corrected, self.detected = hamming_decode_into(encoded_mv, self.decoded_data)
+        self.decoded_string = _strip_ascii_markers(self.decoded_data)
+        return 1
+    
+
+def _encode_ascii(data_string):
+    """
+    Takes a message and encodes representative 8-bit ASCII values throgh table-driven Hamming(7,4)+parity encoding.
+    Encoded message is stored and returned in an apropriately sized bytearray 
+
+    Args:
+        data_string (_str_): String message to encode
+
+    Returns:
+        _bytearrary_: Bytearray containing Hamming-encoded original string
+    """
+    # Encodes the data string to a bytearray with STX and EOT characters at beginning/end
+    # Adds STX (0x02 / 0b0000010) ASCII character to front of string
+    # Adds EOT (0x04 / 0b0000100) ASCII character to end of string
+    data_bytearray = bytearray((chr(ASCII_STX)+data_string+chr(ASCII_EOT)).encode())
+    hamming_msg_size = int((len(data_bytearray)*HAMMING_TOTAL_SIZE)/HAMMING_DATA_SIZE)
+    encoded_bytes = bytearray(hamming_msg_size)
+    hamming_encode_into(memoryview(data_bytearray), encoded_bytes)
+    return encoded_bytes
+ 
+def _decode_ascii(codeword_mv: memoryview) -> str: 
+    """
+    Given a bytearray representing an 8-bit ASCII message passed through Hamming(7,4)+parity encoding,
+    correct and decode it, and convert to Python _str_
+
+    Args:
+        codeword_mv (_memoryview_): Memoryview pointer to the bytearray to decode
+
+    Returns:
+        _str_: Decoded message
+    """
+    decoded = bytearray(len(codeword_mv) // 2)
+    hamming_decode_into(codeword_mv, decoded)
+    return _strip_ascii_markers(decoded)
+
+def _strip_ascii_markers(data: bytearray) -> str:
+    """
+    Convert decoded bytes to a string, dropping the leading STX and everything from EOT onwards
+
+    Args:
+        data (bytearray): Decoded message bytes
+
+    Returns:
+        str: The message between the STX and EOT markers
+    """
+    start = 1 if len(data) > 0 and data[0] == ASCII_STX else 0
+    end = start
+    while end < len(data) and data[end] != ASCII_EOT:
+        end += 1
+    return _bytes_to_str(bytes(memoryview(data)[start:end]))
+
+def _bytes_to_str(data: bytes) -> str:
+    """
+    Decode message bytes that may hold errors the Hamming code detected but couldn't correct. If they are no
+    longer valid UTF-8, each byte becomes one character instead, so the garbled bytes show up as wrong
+    characters and in the detected count rather than failing the decode
+
+    Args:
+        data (bytes or bytearray): Message bytes
+
+    Returns:
+        str: The decoded message
+    """
+    try:
+        return data.decode()
+    except UnicodeError:
+        return ''.join(map(chr, data))
+
+def binary_list_to_string(data_bytearray: list) -> str:
+    """
+    Takes a list() of integers representing binary values of 8-bit ASCII characters and converts to a string
+    E.g. 'f' (ASCII 102) -> [0,1,1,0,0,1,1,0]
+
+    Args:
+        data_bytearray (_memoryview_): A memoryview pointer to a list of 1 or 0 integers of an 8-bit ASCII message
+
+    Returns:
+        _str_: The 8-bit ASCII string decoded from the binary list
+    """
+    # Assume we're storing ASCII characters in 8-bit chunks (left-padded 0)
+    ascii_bytes = bytearray()
+    for idx in range(0, len(data_bytearray), 8):
+        ascii_code = 0
+        for bit in data_bytearray[idx:idx+8]:
+            ascii_code = (ascii_code << 1) | bit
+        if ascii_code == ASCII_STX:
+            continue
+        elif ascii_code == ASCII_EOT:
+            break
+        ascii_bytes.append(ascii_code)
+    return _bytes_to_str(ascii_bytes)
+
+def hamming_xor(bits_list: memoryview) -> int:
+    """
+    Takes a list of bits and continuously XOR's across those bits
+    Micropython-able reduce(lambda x,y: x^y, )
+
+    Args:
+        bits_list (_memoryview_): A memoryview pointer to the list of bits to XOR over
+
+    Returns:
+        _int_: The integer position of the bit to flip. If 0, the list is properly encoded/decoded
+    """
+    # Takes a list of bits, continuously XOR across those bits
+    # Can be used to encode or decode a block
+    # ENCODING USAGE:
+    #   Say you are encoding 4 data bits into a Hamming(7,4) codeword_mv
+    #   Place the data bits in the non 2^n indexes (data bits go in index 3, 5, 6, 7)
+    #   Set all other parity bit locations (0, 1, 2, 4) to 0
+    #   Running that bit list through hamming_xor() will return the index of bit to flip
+    #       if not 0, then flip it!
+    #       if hamming_xor() returns 0, the bit list represents a valid Hamming codeword_mv
+    xor_flag = 0
+    for i,bit in enumerate(bits_list):
+        if bit:
+            xor_flag ^= i
+    return xor_flag
@@ -0,0 +1,148 @@
+from micropython import const
+
+from modulation import Modulation, _ChipWriter
+
+# The multi-bit-per-symbol modulation modes, on the chip buffers of modulation.py
+# Binary PWM spends 5 T per bit with the default timing. With T as the unit:
+#   PulseWidth4:    2 bits per pulse, (1-4 T) lit then 1 T dark, 1.75 T per bit on average
+#   PulsePosition4: 2 bits per pulse, differential 4-PPM: (1-4 T) dark then 1 T lit, 1.75 T per bit on average
+#   Manchester:     1 bit per 2 T, self-clocking, the receiver tracks T from the pulse train
+#
+# Dark chips after each PulseWidth4 pulse, and minimum dark chips before each PulsePosition4 pulse
+MOD_GAP_CHIPS = const(1)
+
+
+class PulseWidth4(Modulation):
+    """
+    4-level pulse-width modulation, each pulse is 1-4 chips long and carries 2 bits
+    """
+    MAX_CHIPS_PER_BYTE = 4 * (4 + MOD_GAP_CHIPS)
+
+    def _byte_chips(self, byte: int) -> tuple:
+        value = 0
+        count = 0
+        for shift in (6, 4, 2, 0):
+            symbol = (byte >> shift) & 3
+            value = (value << (symbol + 1 + MOD_GAP_CHIPS)) | (((1 << (symbol + 1)) - 1) << MOD_GAP_CHIPS)
+            count += symbol + 1 + MOD_GAP_CHIPS
+        return value, count
+
+    def demodulate(self, width: int, gap: int, push_bit) -> bool:
+        symbol = self._slots(width) - 1
+        if symbol < 0 or symbol > 3:
+            return False
+        push_bit(symbol >> 1)
+        push_bit(symbol & 1)
+        return True
+
+
+class PulsePosition4(Modulation):
+    """
+    Differential 4-PPM, the dark time before each single-chip pulse is 1-4 chips long and carries 2 bits.
+    A buffer starts with a lone marker pulse, so the first symbol is measured from it instead of from idle,
+    and ends with enough dark chips that the next marker can't be mistaken for a symbol
+    """
+    MAX_CHIPS_PER_BYTE = 4 * (3 + MOD_GAP_CHIPS + 1)
+    MARKER_CHIPS = 1 + 4 + MOD_GAP_CHIPS
+    STOP_CHIPS = 4 + MOD_GAP_CHIPS
+
+    def _byte_chips(self, byte: int) -> tuple:
+        value = 0
+        count = 0
+        for shift in (6, 4, 2, 0):
+            symbol = (byte >> shift) & 3
+            value = (value << (symbol + MOD_GAP_CHIPS + 1)) | 1
+            count += symbol + MOD_GAP_CHIPS + 1
+        return value, count
+
+    def _start(self, writer: _ChipWriter) -> None:
+        writer.put(1, 1)
+
+    def _stop(self, writer: _ChipWriter) -> None:
+        # Dark for longer than any symbol, so the next marker is never read as a symbol
+        writer.put(0, 4 + MOD_GAP_CHIPS)
+
+    def demodulate(self, width: int, gap: int, push_bit) -> bool:
+        if self._slots(width) != 1:
+            return False
+        if gap == 0:
+            return True
+        symbol = self._slots(gap) - MOD_GAP_CHIPS
+        if symbol > 3:
+            # Marker pulse after idle
+            return True
+        if symbol < 0:
+            return False
+        push_bit(symbol >> 1)
+        push_bit(symbol & 1)
+        return True
+
+
+class Manchester(Modulation):
+    """
+    Manchester code, a 1 is sent as lit-dark and a 0 as dark-lit. A buffer is wrapped in a lit start and
+    stop chip followed by idle, so the first and last half-bits are not lost in the idle time. The receiver works out the
+    chip boundaries from the run lengths of the pulse train and tracks the chip period as it goes
+    """
+    MAX_CHIPS_PER_BYTE = 16
+    MARKER_CHIPS = 2 + 3
+    STOP_CHIPS = 1 + 3
+
+    def _byte_chips(self, byte: int) -> tuple:
+        value = 0
+        for shift in range(7, -1, -1):
+            value = (value << 2) | (0b10 if (byte >> shift) & 1 else 0b01)
+        return value, 16
+
+    def _start(self, writer: _ChipWriter) -> None:
+        writer.put(1, 1)
+
+    def _stop(self, writer: _ChipWriter) -> None:
+        # Stop chip, then dark long enough to read as idle before the next start chip
+        writer.put(1 << 3, 4)
+
+    def reset(self, unit_us: int) -> None:
+        super().reset(unit_us)
+        # Chip period in 1/8 us, tracked from the received runs
+        self._unit8 = self.unit << 3
+        self._half = -1
+
+    def _chip(self, value: int, push_bit) -> bool:
+        half = self._half
+        if half < 0:
+            self._half = value
+            return True
+        if half == value:
+            # Not a valid Manchester pair, slip by one chip to realign
+            return False
+        push_bit(half)
+        self._half = -1
+        return True
+
+    def demodulate(self, width: int, gap: int, push_bit) -> bool:
+        lit = self._slots(width)
+        dark = self._slots(gap)
+        if lit < 1 or lit > 2:
+            self._half = -1
+            return False
+        valid = True
+        if gap <= 0 or dark > 2:
+            # First pulse after idle, the first lit chip is the start marker
+            self._half = -1
+            lit -= 1
+        else:
+            for _ in range(dark):
+                valid = self._chip(0, push_bit) and valid
+            # Track the chip period through clock drift
+            self._unit8 += (((width + gap) << 3) // (lit + dark) - self._unit8) >> 3
+            self.unit = max(self._unit8 >> 3, 1)
+        for _ in range(lit):
+            valid = self._chip(1, push_bit) and valid
+        return valid
+
+
+MODULATIONS = {
+    'pwm4': PulseWidth4,
+    'ppm4': PulsePosition4,
+    'manchester': Manchester,
+}
@@ -0,0 +1,122 @@
+from micropython import const
+import array
+
+from fec import FEC_SOFT_MAX, FEC_SOFT_ERASED
+
+# Adaptive pulse-width classification for binary PWM
+# The widths the detector reports drift away from the nominal ones: rise and fall times differ, the laser and
+#   detector warm up, and the two RP2040 clocks disagree. Rather than compare every pulse against fixed widths,
+#   the classifier keeps a centroid and a spread for each of the two pulse-width clusters and decides against
+#   the midpoint of the centroids.
+# Every reception starts from the expected widths. The first CLASSIFY_ACQUIRE_PULSES pulses of each cluster,
+#   the frame preamble, are averaged with equal weight so the centroids settle within a few bits, after which
+#   each pulse moves its centroid by 1 / 2^CLASSIFY_TRACK_SHIFT of its error to follow slow drift.
+#   Centroids and spreads are kept in 1/2^CLASSIFY_FRAC_BITS us
+CLASSIFY_FRAC_BITS = const(4)
+CLASSIFY_ACQUIRE_PULSES = const(8)
+CLASSIFY_TRACK_SHIFT = const(4)
+# Spread assumed at least, ticks_us has a resolution of 1us
+CLASSIFY_MIN_SIGMA_US = const(1)
+# Ratio of the standard deviation to the mean absolute deviation of a Gaussian, sqrt(pi / 2)
+_SIGMA_PER_MAD = 1.2533
+
+
+class PulseClassifier:
+    def __init__(self, dur_0: int=1000, dur_1: int=4000) -> None:
+        """
+        Decides whether pulses are 0s or 1s from their width, learning where the two widths actually lie
+
+        Args:
+            dur_0 (int, optional): Expected width of a 0 pulse in us. Defaults to 1000.
+            dur_1 (int, optional): Expected width of a 1 pulse in us. Defaults to 4000.
+        """
+        self._centroids = array.array('i', (0, 0))
+        self._spreads = array.array('i', (0, 0))
+        self._counts = array.array('H', (0, 0))
+        # Without tracking, pulses are classified against the expected widths only
+        self.tracking = True
+        self.reset(dur_0, dur_1)
+
+    def reset(self, dur_0: int, dur_1: int) -> None:
+        """
+        Start learning over from the expected widths, e.g. at the start of a reception
+
+        Args:
+            dur_0 (int): Expected width of a 0 pulse in us
+            dur_1 (int): Expected width of a 1 pulse in us
+        """
+        self._centroids[0] = dur_0 << CLASSIFY_FRAC_BITS
+        self._centroids[1] = dur_1 << CLASSIFY_FRAC_BITS
+        self._spreads[0] = 0
+        self._spreads[1] = 0
+        # The expected width counts as the first pulse of each cluster
+        self._counts[0] = 1
+        self._counts[1] = 1
+
+    def classify(self, width: int) -> int:
+        """
+        Classify a pulse and learn from it. Doesn't allocate, so it can run in an IRQ handler
+
+        Args:
+            width (int): Pulse width in us, at most the longest valid pulse
+
+        Returns:
+            int: Soft decision, from 0 for a sure 0 to FEC_SOFT_MAX for a sure 1, with FEC_SOFT_ERASED and up
+                meaning 1. Pulses at the centroids or beyond are sure
+        """
+        centroids = self._centroids
+        width <<= CLASSIFY_FRAC_BITS
+        low = centroids[0]
+        high = centroids[1]
+        soft = FEC_SOFT_ERASED + (FEC_SOFT_MAX - FEC_SOFT_ERASED) * (2 * width - low - high) // max(high - low, 1)
+        soft = 0 if soft < 0 else min(soft, FEC_SOFT_MAX)
+        if self.tracking:
+            bit = 1 if soft >= FEC_SOFT_ERASED else 0
+            error = width - centroids[bit]
+            count = self._counts[bit]
+            if count < CLASSIFY_ACQUIRE_PULSES:
+                count += 1
+                self._counts[bit] = count
+                centroids[bit] += error // count
+                self._spreads[bit] += (abs(error) - self._spreads[bit]) // count
+            else:
+                centroids[bit] += error >> CLASSIFY_TRACK_SHIFT
+                self._spreads[bit] += (abs(error) - self._spreads[bit]) >> CLASSIFY_TRACK_SHIFT
+        return soft
+
+    def centroids(self) -> tuple:
+        """
+        Returns:
+            tuple: Current (0, 1) pulse-width centroids in us
+        """
+        return (self._centroids[0] >> CLASSIFY_FRAC_BITS, self._centroids[1] >> CLASSIFY_FRAC_BITS)
+
+    def threshold(self) -> int:
+        """
+        Returns:
+            int: Current decision threshold in us, wider pulses are 1s
+        """
+        return (self._centroids[0] + self._centroids[1]) >> (CLASSIFY_FRAC_BITS + 1)
+
+    def spread(self) -> tuple:
+        """
+        Returns:
+            tuple: Estimated standard deviation of the (0, 1) pulse widths in us
+        """
+        scale = _SIGMA_PER_MAD / (1 << CLASSIFY_FRAC_BITS)
+        return (self._spreads[0] * scale, self._spreads[1] * scale)
+
+    def quality(self) -> float:
+        """
+        Signal quality as the Q factor of the pulse widths, the distance between the centroids over the sum
+        of the standard deviations. Above 7 or so, fewer than one pulse in 10^12 lands on the wrong side of
+        the threshold
+
+        Returns:
+            float: Q factor, 0 if the clusters overlap
+        """
+        spread_0, spread_1 = self.spread()
+        distance = (self._centroids[1] - self._centroids[0]) / (1 << CLASSIFY_FRAC_BITS)
+        if distance <= 0:
+            return 0.0
+        return distance / (max(spread_0, CLASSIFY_MIN_SIGMA_US) + max(spread_1, CLASSIFY_MIN_SIGMA_US))
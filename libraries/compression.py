@@ -0,0 +1,142 @@
+from micropython import const
+import array
+
+from huffman import literal_code
+
+# Payload compression, LZSS with static Huffman-coded literals
+# Each compressed frame payload is an independent block, so a lost frame only loses its own data:
+# | OFFSET (3) | ITEMS ... |
+#   OFFSET is where the block's data starts in the message. If its top bit is set the block is stored,
+#   the message bytes follow as they are, which bounds the cost of data that doesn't compress.
+#   Otherwise a bit stream of items follows, MSB first:
+#     1 + literal byte, in a fixed canonical Huffman code built for English text
+#     0 + distance - 1 (COMPRESS_DIST_BITS) + length - COMPRESS_MIN_MATCH (COMPRESS_LEN_BITS), a back
+#       reference into the block's own output
+#   A frame payload holds a few hundred message bytes at most, too little for an adaptive code or a big
+#   window to pay off, so the literal code is fixed on both ends instead of sent along (see huffman.py).
+#   Blocks are decompressed by decompress.py
+COMPRESS_OFFSET_SIZE = const(3)
+COMPRESS_STORED = const(0x800000)
+COMPRESS_MIN_MATCH = const(3)
+COMPRESS_LEN_BITS = const(4)
+COMPRESS_MAX_MATCH = const(COMPRESS_MIN_MATCH + (1 << COMPRESS_LEN_BITS) - 1)
+# Message bytes compressed into one block at most, bounds the match window and the match finder's memory
+COMPRESS_DIST_BITS = const(10)
+COMPRESS_MAX_BLOCK = const(1 << COMPRESS_DIST_BITS)
+COMPRESS_MATCH_BITS = const(1 + COMPRESS_DIST_BITS + COMPRESS_LEN_BITS)
+COMPRESS_HASH_BITS = const(10)
+COMPRESS_HASH_MASK = const((1 << COMPRESS_HASH_BITS) - 1)
+# Candidates tried per position, trades ratio for speed
+COMPRESS_MAX_CHAIN = const(16)
+
+# Room an item needs in the output at most
+_MAX_ITEM_BITS = const(1 + 32)
+
+
+class LZSSCompressor:
+    def __init__(self) -> None:
+        """
+        Small-window LZSS compressor with hash chains, using fixed tables of about 4 kB. Fills frame payloads
+        with as much of the message as fits, and keeps totals for reporting the compression ratio
+        """
+        # Most recent block position of every 3-byte hash, and the previous position with the same hash
+        self._head = array.array('h', (-1 for _ in range(1 << COMPRESS_HASH_BITS)))
+        self._prev = array.array('h', (-1 for _ in range(COMPRESS_MAX_BLOCK)))
+        self.raw_bytes = 0
+        self.packed_bytes = 0
+
+    def reset_stats(self) -> None:
+        self.raw_bytes = 0
+        self.packed_bytes = 0
+
+    def compress(self, data_mv: memoryview, start: int, out: bytearray) -> tuple:
+        """
+        Compress message bytes from start into one block, until the input or the room in out runs out.
+        Falls back to a stored block when compressing doesn't make the block smaller
+
+        Args:
+            data_mv (memoryview): The whole message
+            start (int): First message byte of the block
+            out (bytearray): Output buffer, e.g. a frame payload
+
+        Returns:
+            tuple: (message bytes consumed, bytes written to out)
+        """
+        consumed, length = self._compress(data_mv, start, out)
+        if length - COMPRESS_OFFSET_SIZE >= consumed:
+            consumed = min(len(data_mv) - start, len(out) - COMPRESS_OFFSET_SIZE)
+            length = COMPRESS_OFFSET_SIZE + consumed
+            out[COMPRESS_OFFSET_SIZE:length] = data_mv[start:start + consumed]
+            start |= COMPRESS_STORED
+        for shift, idx in ((16, 0), (8, 1), (0, 2)):
+            out[idx] = (start >> shift) & 0xFF
+        self.raw_bytes += consumed
+        self.packed_bytes += length
+        return consumed, length
+
+    def _compress(self, data_mv: memoryview, start: int, out: bytearray) -> tuple:
+        end = min(len(data_mv), start + COMPRESS_MAX_BLOCK)
+        head = self._head
+        prev = self._prev
+        tables = literal_code()
+        codes = tables[0]
+        lengths = tables[1]
+        for idx in range(len(head)):
+            head[idx] = -1
+        out_idx = COMPRESS_OFFSET_SIZE
+        limit = 8 * (len(out) - COMPRESS_OFFSET_SIZE) - _MAX_ITEM_BITS
+        used = 0
+        acc = 0
+        bits = 0
+        pos = start
+        while pos < end and used <= limit:
+            # Longest earlier match in the block, following the hash chain
+            best_len = 0
+            best_pos = 0
+            max_len = min(COMPRESS_MAX_MATCH, end - pos)
+            if max_len >= COMPRESS_MIN_MATCH:
+                cand = head[((data_mv[pos] << 6) ^ (data_mv[pos + 1] << 3) ^ data_mv[pos + 2]) & COMPRESS_HASH_MASK]
+                chain = 0
+                while cand >= 0 and chain < COMPRESS_MAX_CHAIN:
+                    cand_pos = start + cand
+                    length = 0
+                    while length < max_len and data_mv[cand_pos + length] == data_mv[pos + length]:
+                        length += 1
+                    if length > best_len:
+                        best_len = length
+                        best_pos = cand_pos
+                        if length == max_len:
+                            break
+                    cand = prev[cand]
+                    chain += 1
+            # A reference only pays off if it is shorter than the literals it replaces
+            literal_bits = 0
+            for idx in range(pos, pos + best_len):
+                literal_bits += 1 + lengths[data_mv[idx]]
+            if best_len >= COMPRESS_MIN_MATCH and literal_bits > COMPRESS_MATCH_BITS:
+                value = (((pos - best_pos - 1) << COMPRESS_LEN_BITS) | (best_len - COMPRESS_MIN_MATCH))
+                nbits = COMPRESS_MATCH_BITS
+            else:
+                best_len = 1
+                value = (1 << lengths[data_mv[pos]]) | codes[data_mv[pos]]
+                nbits = 1 + lengths[data_mv[pos]]
+            used += nbits
+            acc = (acc << nbits) | value
+            bits += nbits
+            while bits >= 8:
+                bits -= 8
+                out[out_idx] = (acc >> bits) & 0xFF
+                out_idx += 1
+            acc &= (1 << bits) - 1
+            # Index every position covered, so later matches can start anywhere
+            for _ in range(best_len):
+                if pos + 2 < end:
+                    hashed = ((data_mv[pos] << 6) ^ (data_mv[pos + 1] << 3) ^ data_mv[pos + 2]) & COMPRESS_HASH_MASK
+                    prev[pos - start] = head[hashed]
+                    head[hashed] = pos - start
+                pos += 1
+        if bits:
+            # Zero padding is too short to be read as a reference
+            out[out_idx] = (acc << (8 - bits)) & 0xFF
+            out_idx += 1
+        return pos - start, out_idx
@@ -0,0 +1,113 @@
+from compression import COMPRESS_OFFSET_SIZE, COMPRESS_STORED, COMPRESS_MIN_MATCH, COMPRESS_LEN_BITS, \
+    COMPRESS_MATCH_BITS
+from huffman import literal_code
+
+# Decompression of the LZSS blocks of compression.py, into their place in the message
+
+
+def lzss_decompress_into(src_mv: memoryview, dst_mv: memoryview) -> int:
+    """
+    Decompress the items of one compressed block. Stops early at the end of dst_mv or at a reference
+    that points before the start of the block
+
+    Args:
+        src_mv (memoryview): The items, after the offset header
+        dst_mv (memoryview): Where the block's data goes
+
+    Returns:
+        int: Number of bytes written to dst_mv
+    """
+    tables = literal_code()
+    symbols = tables[2]
+    counts = tables[3]
+    max_code_bits = len(counts) - 1
+    dst_len = len(dst_mv)
+    src_bits = 8 * len(src_mv)
+    bit_pos = 0
+    dst_idx = 0
+    while bit_pos < src_bits:
+        literal = (src_mv[bit_pos >> 3] >> (7 - (bit_pos & 7))) & 1
+        bit_pos += 1
+        if literal:
+            # Canonical Huffman decode, one code length at a time
+            code = 0
+            first = 0
+            index = 0
+            sym = -1
+            for length in range(1, max_code_bits + 1):
+                if bit_pos >= src_bits:
+                    return dst_idx
+                code |= (src_mv[bit_pos >> 3] >> (7 - (bit_pos & 7))) & 1
+                bit_pos += 1
+                count = counts[length]
+                if code - count < first:
+                    sym = symbols[index + code - first]
+                    break
+                index += count
+                first = (first + count) << 1
+                code <<= 1
+            if sym < 0 or dst_idx >= dst_len:
+                return dst_idx
+            dst_mv[dst_idx] = sym
+            dst_idx += 1
+            continue
+        if bit_pos + COMPRESS_MATCH_BITS - 1 > src_bits:
+            # Padding at the end of the block
+            return dst_idx
+        value = 0
+        for _ in range(COMPRESS_MATCH_BITS - 1):
+            value = (value << 1) | ((src_mv[bit_pos >> 3] >> (7 - (bit_pos & 7))) & 1)
+            bit_pos += 1
+        dist = (value >> COMPRESS_LEN_BITS) + 1
+        if dist > dst_idx:
+            return dst_idx
+        for _ in range((value & ((1 << COMPRESS_LEN_BITS) - 1)) + COMPRESS_MIN_MATCH):
+            if dst_idx >= dst_len:
+                return dst_idx
+            dst_mv[dst_idx] = dst_mv[dst_idx - dist]
+            dst_idx += 1
+    return dst_idx
+
+def _header(payload_mv: memoryview) -> int:
+    header = 0
+    for idx in range(COMPRESS_OFFSET_SIZE):
+        header = (header << 8) | payload_mv[idx]
+    return header
+
+def decompress_block(payload_mv: memoryview, dst_mv: memoryview) -> int:
+    """
+    Decompress a compressed frame payload, stored or not, ignoring its offset
+
+    Args:
+        payload_mv (memoryview): The frame payload, offset header included
+        dst_mv (memoryview): Where the block's data goes
+
+    Returns:
+        int: Number of bytes written to dst_mv
+    """
+    if len(payload_mv) < COMPRESS_OFFSET_SIZE:
+        return 0
+    items_mv = payload_mv[COMPRESS_OFFSET_SIZE:]
+    if _header(payload_mv) & COMPRESS_STORED:
+        count = min(len(items_mv), len(dst_mv))
+        dst_mv[0:count] = items_mv[0:count]
+        return count
+    return lzss_decompress_into(items_mv, dst_mv)
+
+def decompress_frame(payload_mv: memoryview, data_mv: memoryview) -> tuple:
+    """
+    Decompress a compressed frame payload into its place in a message buffer
+
+    Args:
+        payload_mv (memoryview): The frame payload, offset header included
+        data_mv (memoryview): The whole message buffer, e.g. the inbox memory
+
+    Returns:
+        tuple: (message offset of the block, bytes written), writing nothing if the offset is past the buffer
+    """
+    if len(payload_mv) < COMPRESS_OFFSET_SIZE:
+        return 0, 0
+    offset = _header(payload_mv) & (COMPRESS_STORED - 1)
+    if offset >= len(data_mv):
+        return offset, 0
+    return offset, decompress_block(payload_mv, data_mv[offset:])
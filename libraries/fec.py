@@ -0,0 +1,63 @@
+from micropython import const
+
+from framing import FRAME_MAX_PAYLOAD
+
+# Forward error correction of frame payloads, for links whose errors come in bursts
+# The data of a frame and its own CRC16 go through a rate 1/2, constraint length 5 convolutional code,
+#   the encoder being flushed back to state 0 with FEC_TAIL_BITS zeros. Data of d bytes becomes
+#   2 * (8 * (d + 2) + 4) = 8 * (2d + 5) coded bits, a whole number of bytes.
+# The coded bits are then block interleaved: written row by row into FEC_DEPTH rows of ceil(bits / FEC_DEPTH)
+#   columns, and sent column by column, skipping the cells left empty at the end. A burst of up to FEC_DEPTH
+#   bits on the link ends up as isolated errors at least a row apart, which the Viterbi decoder corrects,
+#   where it would have swamped the code unspread. Payloads too short to fill every row spread bursts less.
+# The decoder takes a soft value per received bit, 0 for a sure 0, FEC_SOFT_MAX for a sure 1 and
+#   FEC_SOFT_ERASED for no idea, e.g. derived from how close each pulse width was to the nominal ones.
+#   Frames carrying a coded payload have FRAME_FLAG_FEC set, and are checked against the inner CRC
+#   once decoded, so the frame CRC is only a shortcut. The encoder and decoder are in feccodec.py
+FEC_CONSTRAINT = const(5)
+FEC_STATES = const(1 << (FEC_CONSTRAINT - 1))
+FEC_POLY_A = const(0o23)
+FEC_POLY_B = const(0o35)
+FEC_TAIL_BITS = const(FEC_CONSTRAINT - 1)
+# Most data bytes a coded frame payload carries
+FEC_MAX_DATA = const((FRAME_MAX_PAYLOAD - 5) // 2)
+# Default interleaver rows, the longest burst spread into isolated errors, and the depths allowed
+FEC_DEPTH = const(16)
+FEC_DEPTHS = (1, 2, 4, 8, 16, 32, 64)
+FEC_SOFT_MAX = const(255)
+FEC_SOFT_ERASED = const(128)
+
+# Start metric of the states the encoder can't be in, large enough never to win
+_UNREACHED = const(0x10000)
+
+
+def _parity(value: int) -> int:
+    value ^= value >> 4
+    value ^= value >> 2
+    value ^= value >> 1
+    return value & 1
+
+def _build_output_table() -> bytearray:
+    """
+    Precompute the two coded bits of every encoder step
+
+    Returns:
+        bytearray: (A << 1) | B, indexed by (state << 1) | input bit
+    """
+    table = bytearray(2 * FEC_STATES)
+    for reg in range(2 * FEC_STATES):
+        table[reg] = (_parity(reg & FEC_POLY_A) << 1) | _parity(reg & FEC_POLY_B)
+    return table
+
+_OUTPUTS = _build_output_table()
+
+
+def fec_encoded_len(data_len: int) -> int:
+    """
+    Args:
+        data_len (int): Data bytes of a frame, at most FEC_MAX_DATA
+
+    Returns:
+        int: Bytes of the coded payload
+    """
+    return 2 * data_len + 5
@@ -0,0 +1,147 @@
+import array
+
+from framing import crc16, FRAME_CRC_SIZE
+from fec import FEC_STATES, FEC_TAIL_BITS, FEC_MAX_DATA, FEC_DEPTH, FEC_SOFT_MAX, _UNREACHED, _OUTPUTS, fec_encoded_len
+
+# Encoder and soft-decision decoder of the frame payload code described in fec.py
+
+
+class FecCodec:
+    def __init__(self, depth: int=FEC_DEPTH) -> None:
+        """
+        Convolutional encoder and soft-decision Viterbi decoder with a block interleaver, for frame payloads
+        of up to FEC_MAX_DATA bytes. Decoding keeps a fixed 2 kB table of survivor decisions
+
+        Args:
+            depth (int, optional): Interleaver rows, both ends of a link have to use the same.
+                Defaults to FEC_DEPTH.
+        """
+        self.depth = depth
+        self._decisions = array.array('H', (0 for _ in range(8 * (FEC_MAX_DATA + FRAME_CRC_SIZE) + FEC_TAIL_BITS)))
+        self._metrics = array.array('i', (0 for _ in range(FEC_STATES)))
+        self._next = array.array('i', (0 for _ in range(FEC_STATES)))
+        self._costs = array.array('H', (0, 0, 0, 0))
+        # Frames whose frame CRC failed but which decoded correctly
+        self.frames_fixed = 0
+        # Frames that failed their inner CRC once decoded
+        self.frames_failed = 0
+
+    def _layout(self, nbits: int) -> tuple:
+        """
+        The cell at (row, col) goes out at col * full_rows + min(col, partial) + row: the first partial
+        columns hold one more bit than the others
+
+        Returns:
+            tuple: (columns of the interleaver, rows it fills completely, cells filled in the row after them)
+                for nbits coded bits
+        """
+        cols = (nbits + self.depth - 1) // self.depth
+        full_rows = nbits // cols if cols else 0
+        return cols, full_rows, nbits - full_rows * cols
+
+    def encode_into(self, data_mv: memoryview, out: bytearray) -> int:
+        """
+        Encode and interleave the data of one frame
+
+        Args:
+            data_mv (memoryview): At most FEC_MAX_DATA bytes
+            out (bytearray): Output buffer of at least fec_encoded_len(len(data_mv)) bytes
+
+        Returns:
+            int: Number of coded bytes written
+        """
+        data_len = len(data_mv)
+        length = fec_encoded_len(data_len)
+        for idx in range(length):
+            out[idx] = 0
+        cols, full_rows, partial = self._layout(8 * length)
+        crc = crc16(data_mv)
+        outputs = _OUTPUTS
+        state = 0
+        bit_idx = 0
+        for step in range(8 * (data_len + FRAME_CRC_SIZE) + FEC_TAIL_BITS):
+            byte_idx = step >> 3
+            if byte_idx < data_len:
+                bit = (data_mv[byte_idx] >> (7 - (step & 7))) & 1
+            elif byte_idx < data_len + FRAME_CRC_SIZE:
+                bit = (crc >> (15 - (step - 8 * data_len))) & 1
+            else:
+                bit = 0
+            reg = (state << 1) | bit
+            coded = outputs[reg]
+            state = reg & (FEC_STATES - 1)
+            for shift in (1, 0):
+                if (coded >> shift) & 1:
+                    # Position of coded bit bit_idx on the link, reading the interleaver column by column
+                    row = bit_idx // cols
+                    col = bit_idx - row * cols
+                    pos = col * full_rows + (col if col < partial else partial) + row
+                    out[pos >> 3] |= 0x80 >> (pos & 7)
+                bit_idx += 1
+        return length
+
+    def decode_into(self, soft_mv: memoryview, length: int, out: bytearray) -> int:
+        """
+        Deinterleave and Viterbi-decode the coded payload of one frame, and check its CRC
+
+        Args:
+            soft_mv (memoryview): Soft value of every received payload bit in link order, 8 * length of them
+            length (int): Bytes of the coded payload
+            out (bytearray): Output buffer of at least FEC_MAX_DATA + FRAME_CRC_SIZE bytes, may be the buffer
+                holding the hard-decision payload
+
+        Returns:
+            int: Number of data bytes decoded, or -1 if the payload is malformed or fails its CRC
+        """
+        data_len = (length - 5) // 2
+        if data_len < 0 or data_len > FEC_MAX_DATA or fec_encoded_len(data_len) != length:
+            return -1
+        steps = 8 * (data_len + FRAME_CRC_SIZE) + FEC_TAIL_BITS
+        cols, full_rows, partial = self._layout(8 * length)
+        outputs = _OUTPUTS
+        costs = self._costs
+        decisions = self._decisions
+        metrics = self._metrics
+        new = self._next
+        for state in range(FEC_STATES):
+            metrics[state] = _UNREACHED
+        metrics[0] = 0
+        for step in range(steps):
+            # Row and column of the two coded bits, without divmod()'s tuple
+            row = 2 * step // cols
+            col = 2 * step - row * cols
+            soft_a = soft_mv[col * full_rows + (col if col < partial else partial) + row]
+            row = (2 * step + 1) // cols
+            col = 2 * step + 1 - row * cols
+            soft_b = soft_mv[col * full_rows + (col if col < partial else partial) + row]
+            # Cost of every pair of coded bits, the further the soft values are from them the higher
+            costs[0] = soft_a + soft_b
+            costs[1] = soft_a + FEC_SOFT_MAX - soft_b
+            costs[2] = FEC_SOFT_MAX - soft_a + soft_b
+            costs[3] = 2 * FEC_SOFT_MAX - soft_a - soft_b
+            decision = 0
+            for state in range(FEC_STATES):
+                # The two states that lead here by shifting in the state's low bit
+                prev_0 = state >> 1
+                prev_1 = prev_0 | (FEC_STATES >> 1)
+                bit = state & 1
+                metric_0 = metrics[prev_0] + costs[outputs[(prev_0 << 1) | bit]]
+                metric_1 = metrics[prev_1] + costs[outputs[(prev_1 << 1) | bit]]
+                if metric_1 < metric_0:
+                    new[state] = metric_1
+                    decision |= 1 << state
+                else:
+                    new[state] = metric_0
+            decisions[step] = decision
+            metrics, new = new, metrics
+        # The tail brought the encoder back to state 0, trace the survivor back from there
+        for idx in range(data_len + FRAME_CRC_SIZE):
+            out[idx] = 0
+        state = 0
+        for step in range(steps - 1, -1, -1):
+            if step < 8 * (data_len + FRAME_CRC_SIZE) and state & 1:
+                out[step >> 3] |= 0x80 >> (step & 7)
+            state = (state >> 1) | ((FEC_STATES >> 1) if (decisions[step] >> state) & 1 else 0)
+        if crc16(memoryview(out)[0:data_len]) != (out[data_len] << 8) | out[data_len + 1]:
+            return -1
+        return data_len
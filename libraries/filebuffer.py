@@ -0,0 +1,180 @@
+from micropython import const
+import os
+import uasyncio as asyncio
+
+from arena import MemoryArena, arena_buffer
+from memory import InboxBuffer
+
+# File transfers, for messages larger than RAM
+# The message lives in a file on the flash filesystem and goes over the link in blocks of FILE_BLOCK_SIZE bytes,
+#   each sent as a message of its own behind a block header, big-endian:
+# | OFFSET (4) | TOTAL (4) | DATA (up to FILE_BLOCK_SIZE) |
+#   OFFSET is where the block's data goes in the file, TOTAL the size of the whole file. Only one block at a time
+#   is ever in RAM on either side: the sender reads block N+1 from flash while block N is on the wire, and the
+#   receiver appends every block that arrived whole to its file. The receiving file's length is where the
+#   transfer picks up again, so it survives a reset: the receiver ignores blocks it already has, and the
+#   sender can start over from FileInbox.offset, or from 0. The transfers themselves are in filexfer.py
+#
+FILE_HEADER_SIZE = const(8)
+FILE_BLOCK_SIZE = const(4096)
+# Bytes read from flash between yields to the transmitting task
+FILE_READ_SLICE = const(512)
+
+
+def _put32(buf, idx: int, value: int) -> None:
+    buf[idx] = (value >> 24) & 0xFF
+    buf[idx + 1] = (value >> 16) & 0xFF
+    buf[idx + 2] = (value >> 8) & 0xFF
+    buf[idx + 3] = value & 0xFF
+
+def _get32(buf, idx: int) -> int:
+    return (buf[idx] << 24) | (buf[idx + 1] << 16) | (buf[idx + 2] << 8) | buf[idx + 3]
+
+def file_size(path: str) -> int:
+    """
+    Returns:
+        int: Size of a file in bytes, 0 if there is none
+    """
+    try:
+        return os.stat(path)[6]
+    except OSError:
+        return 0
+
+
+class FileOutbox:
+    def __init__(self, path: str, block_size: int=FILE_BLOCK_SIZE, arena: MemoryArena=None) -> None:
+        """
+        Streams a file off the flash in blocks, each with its block header, through two block buffers: one
+        is on the wire while the next block is read into the other
+
+        Args:
+            path (str): The file to send
+            block_size (int, optional): File bytes per block. Defaults to FILE_BLOCK_SIZE.
+            arena (MemoryArena, optional): Arena to carve the block buffers from. Defaults to None, allocating
+                them on the heap.
+        """
+        self.path = path
+        self.block_size = block_size
+        self._slots = [arena_buffer(arena, FILE_HEADER_SIZE + block_size) for _ in range(2)]
+        self._slot_mvs = [memoryview(slot) for slot in self._slots]
+        self.total = 0
+        # File offset of the next block to read
+        self.offset = 0
+        self._file = None
+
+    def __repr__(self) -> str:
+        return f"FileOutbox({self.path}, {self.offset}/{self.total} bytes)"
+
+    def open(self, start: int=0) -> int:
+        """
+        Open the file, the first block starting at start
+
+        Returns:
+            int: Size of the file
+        """
+        self.close()
+        self.total = file_size(self.path)
+        self.offset = min(start, self.total)
+        self._file = open(self.path, 'rb')
+        self._file.seek(self.offset)
+        return self.total
+
+    async def read_block(self, slot: int) -> int:
+        """
+        Read the next block into a block buffer, FILE_READ_SLICE bytes at a time, yielding to the other
+        tasks in between
+
+        Args:
+            slot (int): Block buffer, 0 or 1
+
+        Returns:
+            int: Length of the block message, header included, 0 once the whole file has been read
+        """
+        count = min(self.block_size, self.total - self.offset)
+        if count <= 0:
+            return 0
+        block_mv = self._slot_mvs[slot]
+        _put32(block_mv, 0, self.offset)
+        _put32(block_mv, 4, self.total)
+        end = FILE_HEADER_SIZE
+        while end < FILE_HEADER_SIZE + count:
+            read = self._file.readinto(block_mv[end:min(end + FILE_READ_SLICE, FILE_HEADER_SIZE + count)])
+            if not read:
+                # The file was cut short while it was being sent
+                break
+            end += read
+            await asyncio.sleep_ms(0)
+        self.offset += end - FILE_HEADER_SIZE
+        return end if end > FILE_HEADER_SIZE else 0
+
+    def block(self, slot: int, length: int) -> memoryview:
+        return self._slot_mvs[slot][:length]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FileInbox:
+    def __init__(self, path: str) -> None:
+        """
+        Appends the received blocks of a file transfer to a file on the flash. Whatever the file already
+        holds counts as received, so a transfer cut short by a reset carries on where it stopped
+
+        Args:
+            path (str): The file to receive into
+        """
+        self.path = path
+        # File offset of the next block to store, and size of the file being received, -1 until a block says
+        self.offset = file_size(path)
+        self.total = -1
+
+    def __repr__(self) -> str:
+        return f"FileInbox({self.path}, {self.offset}/{self.total} bytes)"
+
+    def complete(self) -> bool:
+        return self.offset == self.total
+
+    def reset(self) -> None:
+        """
+        Empty the file, for a new transfer
+        """
+        open(self.path, 'wb').close()
+        self.offset = 0
+        self.total = -1
+
+    def store(self, inbox: InboxBuffer, verified: bool) -> bool:
+        """
+        Append a received block to the file, if it is the next one
+
+        Args:
+            inbox (InboxBuffer): Holds the block message
+            verified (bool): The block arrived whole, with no frame missing
+
+        Returns:
+            bool: True if the file now holds the block, False if it was dropped, e.g. because an earlier one
+                was lost
+        """
+        length = len(inbox)
+        if not verified or length < FILE_HEADER_SIZE:
+            return False
+        offset = _get32(inbox._data, 0)
+        total = _get32(inbox._data, 4)
+        count = length - FILE_HEADER_SIZE
+        if offset + count > total:
+            return False
+        if total != self.total:
+            # The first block of a different file starts it over, anything else resumes this one
+            if offset == 0 and (self.total >= 0 or self.offset > total):
+                self.reset()
+            self.total = total
+        if offset > self.offset:
+            return False
+        # Only what the file doesn't hold yet, resent blocks may overlap it
+        skip = self.offset - offset
+        if skip < count:
+            with open(self.path, 'ab') as f:
+                f.write(inbox.view(FILE_HEADER_SIZE + skip, length))
+            self.offset += count - skip
+        return True
@@ -0,0 +1,86 @@
+from micropython import const
+import uasyncio as asyncio
+
+from laser import LindaLaser
+from arq import send_reliable, ARQ_LINGER_ROUNDS, ARQ_ROUND_TIMEOUT_S
+from arqrx import receive_reliable
+from filebuffer import FileOutbox, FileInbox
+from trace import TRACE_INFO, TR_FILE_SEND, TR_FILE_DROPPED, TR_FILE_RECEIVED, TR_FILE_INCOMPLETE
+
+# File transfers over the link, block by block, with the block format and buffers of filebuffer.py
+#
+# Pause between blocks, for the receiver to store one and go back to listening. A receiver of ARQ blocks only
+#   does once the link has been quiet for its linger rounds
+FILE_BLOCK_GAP_MS = const(250)
+FILE_RELIABLE_GAP_MS = const((ARQ_LINGER_ROUNDS + 1) * ARQ_ROUND_TIMEOUT_S * 1000)
+
+
+async def send_file(laser: LindaLaser, outbox: FileOutbox, start: int=0, reliable: bool=False) -> bool:
+    """
+    Send a file to a receiver running receive_file(), block by block
+
+    Args:
+        laser (LindaLaser): Laser of the sending node
+        outbox (FileOutbox): The file to send
+        start (int, optional): File offset to start from, e.g. the receiver's FileInbox.offset after a reset.
+            Defaults to 0.
+        reliable (bool, optional): Send every block with selective-repeat ARQ (see arq.py), the receiver has to
+            agree. Defaults to False, blocks lost on the way have to be sent again with start.
+
+    Returns:
+        bool: True once every block was sent, and with reliable, acknowledged
+    """
+    total = outbox.open(start)
+    laser.trace.emit(TRACE_INFO, TR_FILE_SEND, total - outbox.offset, total, outbox.block_size)
+    slot = 0
+    sent = True
+    try:
+        length = await outbox.read_block(slot)
+        while length and sent:
+            # Block N+1 is read from flash while block N goes out
+            prefetch = asyncio.create_task(outbox.read_block(slot ^ 1))
+            if reliable:
+                sent = await send_reliable(laser, outbox.block(slot, length))
+            else:
+                await laser.transmit_data_async(outbox.block(slot, length))
+            length = await prefetch
+            slot ^= 1
+            if length:
+                await asyncio.sleep_ms(FILE_RELIABLE_GAP_MS if reliable else FILE_BLOCK_GAP_MS)
+    finally:
+        outbox.close()
+    return sent
+
+async def receive_file(laser: LindaLaser, inbox: FileInbox, timeout: int=5, reliable: bool=False) -> bool:
+    """
+    Receive a file sent with send_file(), block by block through the laser inbox, until it is complete or
+    the link stays quiet for timeout
+
+    Args:
+        laser (LindaLaser): Laser of the receiving node, its inbox has to hold a whole block message
+        inbox (FileInbox): The file to receive into
+        timeout (int, optional): Time to wait for a block, in seconds. Defaults to 5.
+        reliable (bool, optional): The blocks are sent with ARQ. Defaults to False.
+
+    Returns:
+        bool: True if the whole file arrived
+    """
+    while not inbox.complete():
+        if reliable:
+            verified = await receive_reliable(laser, timeout)
+            if not verified and len(laser.inbox) == 0:
+                break
+        else:
+            await laser.start_rx_async(timeout)
+            if laser.rx_bit_count == 0:
+                break
+            verified = laser.rx_done and not laser.rx_frames_missing and not laser.rx_truncated
+        if laser.rx_train_pending:
+            break
+        if not inbox.store(laser.inbox, verified):
+            laser.trace.emit(TRACE_INFO, TR_FILE_DROPPED, inbox.offset)
+    if inbox.complete():
+        laser.trace.emit(TRACE_INFO, TR_FILE_RECEIVED, inbox.total)
+    else:
+        laser.trace.emit(TRACE_INFO, TR_FILE_INCOMPLETE, inbox.offset)
+    return inbox.complete()
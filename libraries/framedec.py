@@ -0,0 +1,147 @@
+from micropython import const
+
+from framing import crc16, FRAME_SYNC_WORD, FRAME_SYNC_MAX_ERRORS, FRAME_HEADER_SIZE, FRAME_CRC_SIZE, \
+    FRAME_MAX_PAYLOAD, FRAME_FLAG_FEC
+
+# Receive side of the frame layout in framing.py
+#
+# Receiver states
+_HUNT = const(0)
+_HEADER = const(1)
+_PAYLOAD = const(2)
+
+
+def _build_popcount_table() -> bytearray:
+    table = bytearray(256)
+    for byte in range(256):
+        table[byte] = (byte & 1) + table[byte >> 1]
+    return table
+
+_POPCOUNT = _build_popcount_table()
+
+
+class FrameDecoder:
+    def __init__(self, max_payload: int=FRAME_MAX_PAYLOAD, sync_max_errors: int=FRAME_SYNC_MAX_ERRORS,
+                 fec=None) -> None:
+        """
+        Bit-at-a-time frame receiver. Hunts for the sync word, then collects the header, payload and CRC,
+        dropping frames that fail either check and going straight back to hunting
+
+        Args:
+            max_payload (int, optional): Largest payload accepted. Defaults to FRAME_MAX_PAYLOAD.
+            sync_max_errors (int, optional): Bit errors tolerated in the sync word. Defaults to FRAME_SYNC_MAX_ERRORS.
+            fec (FecCodec, optional): Decoder of FRAME_FLAG_FEC payloads, which are then checked against their
+                inner CRC instead of the frame CRC. Defaults to None, dropping them.
+        """
+        self.header = bytearray(FRAME_HEADER_SIZE)
+        self._header_fields = memoryview(self.header)[0:4]
+        self.payload = bytearray(max_payload + FRAME_CRC_SIZE)
+        self.payload_mv = memoryview(self.payload)
+        self.max_payload = max_payload
+        self.sync_max_errors = sync_max_errors
+        # Soft value of every payload bit, 0-255 from a sure 0 to a sure 1, for the FEC decoder
+        self.fec = fec
+        self.soft = bytearray(8 * max_payload if fec is not None else 0)
+        self.soft_mv = memoryview(self.soft)
+        # Fields of the last valid frame
+        self.length = 0
+        self.seq = 0
+        self.flags = 0
+        # Frame statistics
+        self.frames_ok = 0
+        self.frames_bad = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = _HUNT
+        self._shift = 0
+        self._byte = 0
+        self._nbits = 0
+        self._idx = 0
+
+    def push_bit(self, bit: int, soft: int=-1) -> bool:
+        """
+        Feed one received bit into the frame receiver
+
+        Args:
+            bit (int): The received bit
+            soft (int, optional): How sure the receiver is of it, from 0 for a sure 0 to 255 for a sure 1.
+                Defaults to -1, a hard decision.
+
+        Returns:
+            bool: True if this bit completed a valid frame, available in payload[:length]
+        """
+        if self.state == _HUNT:
+            self._shift = ((self._shift << 1) | bit) & 0xFFFF
+            diff = self._shift ^ FRAME_SYNC_WORD
+            if _POPCOUNT[diff >> 8] + _POPCOUNT[diff & 0xFF] <= self.sync_max_errors:
+                self.state = _HEADER
+                self._nbits = 0
+                self._idx = 0
+            return False
+        if self.state == _PAYLOAD and self._idx < self.length and self.fec is not None:
+            self.soft[8 * self._idx + self._nbits] = soft if soft >= 0 else (0xFF if bit else 0)
+        self._byte = (self._byte << 1) | bit
+        self._nbits += 1
+        if self._nbits < 8:
+            return False
+        byte = self._byte
+        self._byte = 0
+        self._nbits = 0
+        if self.state == _HEADER:
+            self.header[self._idx] = byte
+            self._idx += 1
+            if self._idx == FRAME_HEADER_SIZE:
+                return self._check_header()
+            return False
+        self.payload[self._idx] = byte
+        self._idx += 1
+        if self._idx == self.length + FRAME_CRC_SIZE:
+            return self._check_payload()
+        return False
+
+    def fec_bit(self) -> int:
+        """
+        Returns:
+            int: Index of the next payload bit of the FRAME_FLAG_FEC frame being received, -1 outside of one
+        """
+        if self.state != _PAYLOAD or not self.header[3] & FRAME_FLAG_FEC or self._idx >= self.length:
+            return -1
+        return 8 * self._idx + self._nbits
+
+    def _check_header(self) -> bool:
+        header = self.header
+        length = (header[0] << 8) | header[1]
+        if header[4] != crc16(self._header_fields) & 0xFF or length > self.max_payload:
+            self.frames_bad += 1
+            self.reset()
+            return False
+        self.length = length
+        self.state = _PAYLOAD
+        self._idx = 0
+        return False
+
+    def _check_payload(self) -> bool:
+        header = self.header
+        length = self.length
+        crc = crc16(self.payload_mv[0:length], crc16(header))
+        self.reset()
+        crc_ok = crc == (self.payload[length] << 8) | self.payload[length + 1]
+        if header[3] & FRAME_FLAG_FEC:
+            # Decoded in place, the hard-decision payload isn't needed any more
+            length = -1 if self.fec is None else self.fec.decode_into(self.soft_mv[0:8 * length], length, self.payload)
+            if length < 0:
+                self.frames_bad += 1
+                if self.fec is not None:
+                    self.fec.frames_failed += 1
+                return False
+            if not crc_ok:
+                self.fec.frames_fixed += 1
+            self.length = length
+        elif not crc_ok:
+            self.frames_bad += 1
+            return False
+        self.seq = header[2]
+        self.flags = header[3]
+        self.frames_ok += 1
+        return True
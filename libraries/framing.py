@@ -0,0 +1,104 @@
+from micropython import const
+import array
+
+# Frame layout on the wire:
+# | PREAMBLE (4) | SYNC (2) | LENGTH (2) | SEQ (1) | FLAGS (1) | HEADER CHECK (1) | PAYLOAD (LENGTH) | CRC16 (2) |
+# The preamble gives the receiver a run of alternating bits to settle on, and slack to resync if a corrupted
+#   frame made it overshoot into the next one. The sync word is found by sliding-window correlation, after which
+#   everything is byte-aligned. The header check byte guards the length, so a corrupted header can't make the
+#   receiver wait for a huge frame, and the CRC16 covers the header and payload. Frames are received by
+#   framedec.py
+FRAME_PREAMBLE = b'\x55\x55\x55\x55'
+FRAME_SYNC_WORD = const(0x2DD4)
+# Number of mismatched bits still accepted as a sync word match
+FRAME_SYNC_MAX_ERRORS = const(1)
+FRAME_HEADER_SIZE = const(5)
+FRAME_CRC_SIZE = const(2)
+# Preamble + sync + header, sent ahead of the payload
+FRAME_HEAD_SIZE = const(4 + 2 + FRAME_HEADER_SIZE)
+FRAME_MAX_PAYLOAD = const(256)
+
+# Header flags
+FRAME_FLAG_LAST = const(0x01)     # Final frame of a message
+FRAME_FLAG_TRAIN = const(0x02)    # Link training control frame, kept out of the inbox
+FRAME_FLAG_COMPRESSED = const(0x04)   # Payload is an LZSS block, see compression.py
+FRAME_FLAG_ACK = const(0x08)      # Reliable transfer acknowledgement, kept out of the inbox (see arq.py)
+FRAME_FLAG_POLL = const(0x10)     # Last frame of a reliable transfer burst, the sender waits for an acknowledgement
+FRAME_FLAG_FEC = const(0x20)      # Payload is convolutionally coded and interleaved, see fec.py
+FRAME_FLAG_MORE = const(0x40)     # More messages follow in the same session, see LindaLaser.transmit_queue()
+# Control frames are never compressed and never reach the inbox
+FRAME_CONTROL_FLAGS = const(FRAME_FLAG_TRAIN | FRAME_FLAG_ACK)
+
+
+def _build_crc16_table() -> array.array:
+    """
+    Precompute the CRC-16/CCITT (polynomial 0x1021) lookup table
+
+    Returns:
+        array.array: 256-entry table of 16-bit CRC remainders
+    """
+    table = array.array('H', (0 for _ in range(256)))
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+    return table
+
+_CRC16_TABLE = _build_crc16_table()
+
+
+def crc16(data, crc: int=0xFFFF) -> int:
+    """
+    Table-driven CRC-16/CCITT over a buffer, optionally continuing a previous CRC
+
+    Args:
+        data (_buffer_): Any buffer-protocol object to checksum
+        crc (int, optional): CRC of the preceding data. Defaults to 0xFFFF (start of a new CRC).
+
+    Returns:
+        int: 16-bit CRC
+    """
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+class FrameWriter:
+    def __init__(self) -> None:
+        """
+        Builds the head and CRC tail of outgoing frames in preallocated buffers, so the payload
+        can be transmitted straight from the outbox memory between them
+        """
+        self.head = bytearray(FRAME_HEAD_SIZE)
+        self.head[0:4] = FRAME_PREAMBLE
+        self.head[4] = FRAME_SYNC_WORD >> 8
+        self.head[5] = FRAME_SYNC_WORD & 0xFF
+        self._header = memoryview(self.head)[6:]
+        self._header_fields = self._header[0:4]
+        self.tail = bytearray(FRAME_CRC_SIZE)
+        self.seq = 0
+        # Flags of the frame last prepared
+        self.flags = 0
+
+    def prepare(self, payload_mv: memoryview, flags: int=0) -> None:
+        """
+        Fill in the header and CRC for the next frame and advance the sequence number
+
+        Args:
+            payload_mv (memoryview): Payload of the frame, at most FRAME_MAX_PAYLOAD bytes
+            flags (int, optional): FRAME_FLAG_* bits. Defaults to 0.
+        """
+        header = self._header
+        length = len(payload_mv)
+        header[0] = length >> 8
+        header[1] = length & 0xFF
+        header[2] = self.seq
+        header[3] = flags
+        self.flags = flags
+        header[4] = crc16(self._header_fields) & 0xFF
+        crc = crc16(payload_mv, crc16(header))
+        self.tail[0] = crc >> 8
+        self.tail[1] = crc & 0xFF
+        self.seq = (self.seq + 1) & 0xFF
@@ -0,0 +1,87 @@
+from encoding import HAMMING_CODES, HAMMING_TOTAL_SIZE, parity8, hamming_tables
+from hammingenc import HammingEncoder
+from hammingdec import HammingDecoder
+
+
+class HammingCode(HammingEncoder, HammingDecoder):
+    """
+    Runtime-selectable SECDED Hamming code (see HAMMING_CODES) with a bit-packed streaming encoder/decoder.
+    Codewords are packed back to back MSB first and are allowed to cross byte boundaries.
+
+    Each codeword is laid out as position 0 (total parity) followed by positions 1..n-1, with Hamming parity
+    bits in the 2^i positions and data bits everywhere else. The data bits are grouped into segments of at
+    most 8 bits so every lookup table stays at 256 entries and no intermediate value outgrows a small int.
+    """
+    def __init__(self, total_size: int=HAMMING_TOTAL_SIZE, chunk_size: int=64) -> None:
+        if total_size not in HAMMING_CODES:
+            raise ValueError(f"Unsupported Hamming block size {total_size}, choose from {tuple(HAMMING_CODES)}")
+        self.total_size = total_size
+        self.data_size, self.parity_size = HAMMING_CODES[total_size]
+        self.chunk_size = chunk_size
+        # Error counts from the last decode_iter() pass
+        self.corrected = 0
+        self.detected = 0
+        self._build_layout()
+        if total_size == 8:
+            # The byte-level codec's tables are built here rather than by the first chunk
+            hamming_tables()
+
+    def __repr__(self) -> str:
+        return f"Hamming({self.total_size - 1},{self.data_size})+parity"
+
+    def _build_layout(self) -> None:
+        """
+        Split the codeword into parity bits and data segments, and precompute per-segment tables
+        """
+        seg_start = []
+        seg_len = []
+        # Field order after the total parity bit: 0x80|i for parity bit 2^i, otherwise a segment index
+        ops = []
+        parity_idx = 0
+        pos = 1
+        while pos < self.total_size:
+            if pos & (pos - 1) == 0:
+                ops.append(0x80 | parity_idx)
+                parity_idx += 1
+                pos += 1
+                continue
+            # Run of data positions up to the next power of two, at most 8 bits per segment
+            run_end = pos
+            while run_end < self.total_size and run_end & (run_end - 1) and run_end - pos < 8:
+                run_end += 1
+            ops.append(len(seg_start))
+            seg_start.append(pos)
+            seg_len.append(run_end - pos)
+            pos = run_end
+        self._ops = bytes(ops)
+        self._seg_len = bytes(seg_len)
+        # Syndrome contribution (low bits) and parity (bit 7) of every value of every segment
+        self._seg_tab = []
+        # Position -> (segment index + 1, bit mask within the segment), 0 for parity positions
+        self._pos_seg = bytearray(self.total_size)
+        self._pos_mask = bytearray(self.total_size)
+        for seg, (start, length) in enumerate(zip(seg_start, seg_len)):
+            table = bytearray(1 << length)
+            for value in range(1 << length):
+                syndrome = 0
+                for i in range(length):
+                    if value & (1 << (length - 1 - i)):
+                        syndrome ^= start + i
+                table[value] = syndrome | (parity8(value) << 7)
+            self._seg_tab.append(table)
+            for i in range(length):
+                self._pos_seg[start + i] = seg + 1
+                self._pos_mask[start + i] = 1 << (length - 1 - i)
+
+    def encoded_len(self, data_len: int) -> int:
+        """
+        Number of encoded bytes produced for a message of data_len bytes, including padding
+
+        Args:
+            data_len (int): Length of the unencoded message in bytes
+
+        Returns:
+            int: Length of the encoded message in bytes
+        """
+        codewords = (data_len * 8 + self.data_size - 1) // self.data_size
+        return (codewords * self.total_size + 7) // 8
@@ -0,0 +1,130 @@
+from encoding import parity8, hamming_decode_into
+from hammingenc import BitPacker
+
+# Decoding half of HammingCode (see hammingcode.py)
+# Single-bit errors are corrected and double-bit errors counted per codeword, in HammingCode.corrected and
+#   HammingCode.detected
+
+
+class HammingDecoder:
+    def _correct_codeword(self, seg_val: bytearray, total_parity: int, rx_parity: int) -> None:
+        syndrome = rx_parity
+        parity = total_parity ^ parity8(rx_parity)
+        for seg, table in enumerate(self._seg_tab):
+            entry = table[seg_val[seg]]
+            syndrome ^= entry & 0x7F
+            parity ^= entry >> 7
+        if parity:
+            # Single error -- only data positions need fixing, parity bits are dropped anyway
+            seg = self._pos_seg[syndrome]
+            if seg:
+                seg_val[seg - 1] ^= self._pos_mask[syndrome]
+            self.corrected += 1
+        elif syndrome:
+            self.detected += 1
+
+    def _codeword_pairs(self, chunks, step: int):
+        """
+        Re-slice arbitrary encoded chunks into whole Hamming(7,4)+parity byte pairs of at most step bytes,
+        carrying a pair that is split across two chunks
+        """
+        pair = bytearray(2)
+        pair_mv = memoryview(pair)
+        split = False
+        for chunk in chunks:
+            chunk_mv = memoryview(chunk)
+            if split and len(chunk_mv):
+                pair[1] = chunk_mv[0]
+                chunk_mv = chunk_mv[1:]
+                split = False
+                yield pair_mv
+            end = len(chunk_mv) & ~1
+            for start in range(0, end, step):
+                yield chunk_mv[start : min(start+step, end)]
+            if end < len(chunk_mv):
+                pair[0] = chunk_mv[end]
+                split = True
+
+    def decode_iter(self, chunks, data_len: int=-1):
+        """
+        Decode a stream of encoded chunks, correcting single-bit and counting double-bit errors per codeword.
+        The yielded memoryview is reused, so consume it before advancing the generator
+
+        Args:
+            chunks (_iterable_): Iterable of buffer-protocol objects holding the encoded message
+            data_len (int, optional): Length of the original message, used to drop the trailing padding.
+                Defaults to -1, which yields every decoded byte.
+
+        Yields:
+            memoryview: The next decoded chunk
+        """
+        self.corrected = 0
+        self.detected = 0
+        remaining = data_len
+        if self.total_size == 8:
+            out = bytearray(self.chunk_size)
+            out_mv = memoryview(out)
+            step = self.chunk_size * 2
+            for piece in self._codeword_pairs(chunks, step):
+                corrected, detected = hamming_decode_into(piece, out)
+                self.corrected += corrected
+                self.detected += detected
+                count = len(piece) // 2
+                if remaining >= 0:
+                    count = min(count, remaining)
+                    remaining -= count
+                if count:
+                    yield out_mv[:count]
+            return
+        packer = BitPacker(self.chunk_size)
+        seg_len = self._seg_len
+        seg_val = bytearray(len(seg_len))
+        ops = self._ops
+        # Field -1 is the total parity bit, then one field per entry of self._ops
+        field = -1
+        total_parity = 0
+        rx_parity = 0
+        acc = 0
+        acc_bits = 0
+        for chunk in chunks:
+            for byte in chunk:
+                acc = (acc << 8) | byte
+                acc_bits += 8
+                while True:
+                    if field < 0:
+                        length = 1
+                    else:
+                        op = ops[field]
+                        length = 1 if op & 0x80 else seg_len[op]
+                    if acc_bits < length:
+                        break
+                    acc_bits -= length
+                    value = acc >> acc_bits
+                    acc &= (1 << acc_bits) - 1
+                    if field < 0:
+                        total_parity = value
+                    elif op & 0x80:
+                        rx_parity |= value << (op & 0x7F)
+                    else:
+                        seg_val[op] = value
+                    field += 1
+                    if field == len(ops):
+                        self._correct_codeword(seg_val, total_parity, rx_parity)
+                        for seg in range(len(seg_len)):
+                            packer.put(seg_val[seg], seg_len[seg])
+                        field = -1
+                        rx_parity = 0
+                        if packer.full():
+                            out = packer.take()
+                            if remaining >= 0:
+                                out = out[:remaining]
+                                remaining -= len(out)
+                            if len(out):
+                                yield out
+        # Leftover bits in the packer are codeword padding, only whole bytes are data
+        if packer.idx:
+            out = packer.take()
+            if remaining >= 0:
+                out = out[:remaining]
+            if len(out):
+                yield out
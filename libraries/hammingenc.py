@@ -0,0 +1,121 @@
+from encoding import parity8, hamming_encode_into
+
+# Encoding half of HammingCode (see hammingcode.py)
+# Codewords are packed back to back MSB first and are allowed to cross byte boundaries. The byte-aligned
+#   Hamming(7,4)+parity code goes through the table-driven codec of encoding.py instead
+
+
+class BitPacker:
+    """
+    Packs variable-width values MSB first into a fixed-size output buffer
+    """
+    def __init__(self, size_bytes: int) -> None:
+        # Leave headroom so a whole codeword always fits after the fill check
+        self.buf = bytearray(size_bytes + 8)
+        self.mv = memoryview(self.buf)
+        self.size = size_bytes
+        self.idx = 0
+        self.acc = 0
+        self.bits = 0
+
+    def put(self, value: int, nbits: int) -> None:
+        acc = (self.acc << nbits) | value
+        bits = self.bits + nbits
+        while bits >= 8:
+            bits -= 8
+            self.buf[self.idx] = acc >> bits
+            self.idx += 1
+            acc &= (1 << bits) - 1
+        self.acc = acc
+        self.bits = bits
+
+    def flush(self) -> None:
+        # Zero-pad any partial byte
+        if self.bits:
+            self.put(0, 8 - self.bits)
+
+    def full(self) -> bool:
+        return self.idx >= self.size
+
+    def take(self) -> memoryview:
+        count = self.idx
+        self.idx = 0
+        return self.mv[:count]
+
+
+class HammingEncoder:
+    def _emit_codeword(self, seg_val: bytearray, packer: BitPacker) -> None:
+        syndrome = 0
+        parity = 0
+        for seg, table in enumerate(self._seg_tab):
+            entry = table[seg_val[seg]]
+            syndrome ^= entry & 0x7F
+            parity ^= entry >> 7
+        # The parity bits are exactly the syndrome bits, which zeroes the syndrome of the whole codeword
+        packer.put(parity ^ parity8(syndrome), 1)
+        for op in self._ops:
+            if op & 0x80:
+                packer.put((syndrome >> (op & 0x7F)) & 1, 1)
+            else:
+                packer.put(seg_val[op], self._seg_len[op])
+
+    def encode_iter(self, chunks):
+        """
+        Encode a stream of data chunks, yielding encoded chunks of at most chunk_size bytes.
+        The yielded memoryview is reused, so consume it before advancing the generator
+
+        Args:
+            chunks (_iterable_): Iterable of buffer-protocol objects holding the message, e.g. iter_chunks(outbox)
+
+        Yields:
+            memoryview: The next encoded chunk
+        """
+        if self.total_size == 8:
+            # Byte-aligned code, use the table-driven codec directly
+            out = bytearray(self.chunk_size)
+            out_mv = memoryview(out)
+            step = self.chunk_size // 2
+            for chunk in chunks:
+                chunk_mv = memoryview(chunk)
+                for start in range(0, len(chunk_mv), step):
+                    count = hamming_encode_into(chunk_mv[start : start+step], out)
+                    yield out_mv[:count]
+            return
+        packer = BitPacker(self.chunk_size)
+        seg_len = self._seg_len
+        seg_val = bytearray(len(seg_len))
+        seg = 0
+        acc = 0
+        acc_bits = 0
+        for chunk in chunks:
+            for byte in chunk:
+                acc = (acc << 8) | byte
+                acc_bits += 8
+                while acc_bits >= seg_len[seg]:
+                    acc_bits -= seg_len[seg]
+                    seg_val[seg] = acc >> acc_bits
+                    acc &= (1 << acc_bits) - 1
+                    seg += 1
+                    if seg == len(seg_len):
+                        self._emit_codeword(seg_val, packer)
+                        seg = 0
+                        if packer.full():
+                            yield packer.take()
+        # Zero-pad the final partial codeword
+        if seg or acc_bits:
+            while seg < len(seg_len):
+                length = seg_len[seg]
+                if acc_bits >= length:
+                    acc_bits -= length
+                    seg_val[seg] = acc >> acc_bits
+                    acc &= (1 << acc_bits) - 1
+                else:
+                    seg_val[seg] = acc << (length - acc_bits)
+                    acc = 0
+                    acc_bits = 0
+                seg += 1
+            self._emit_codeword(seg_val, packer)
+        packer.flush()
+        if packer.idx:
+            yield packer.take()
+
@@ -0,0 +1,80 @@
+import array
+
+# Static canonical Huffman code of the literal bytes of compressed blocks, see compression.py
+#
+# Relative frequency of each character in English prose, every other byte value counts 1
+_TEXT_WEIGHTS = (
+    (' ', 1800), ('e', 1000), ('t', 720), ('a', 650), ('o', 610), ('n', 560), ('i', 560), ('s', 510),
+    ('h', 490), ('r', 480), ('d', 340), ('l', 320), ('u', 220), ('c', 220), ('m', 200), ('w', 190),
+    ('f', 180), ('g', 160), ('y', 160), ('p', 130), ('b', 120), (',', 100), ('.', 90), ('v', 80),
+    ('k', 60), ('\n', 40), ('I', 40), ('T', 30), ('"', 30), ("'", 30), ('A', 25), ('-', 20), ('S', 20),
+    ('H', 20), ('x', 15), ('W', 15), ('j', 10), ('q', 9), ('z', 7), (';', 8), (':', 8), ('!', 8),
+    ('?', 8), ('(', 4), (')', 4),
+)
+
+
+def _build_literal_code() -> tuple:
+    """
+    Build the static canonical Huffman code of the literal bytes
+
+    Returns:
+        tuple: (code of each byte, code length of each byte, symbols in canonical order,
+            number of codes of each length), the lengths index 1 to the longest code
+    """
+    weights = [1] * 256
+    for char, weight in _TEXT_WEIGHTS:
+        weights[ord(char)] = weight
+    for char in 'BCDEFGJKLMNOPQRUVXYZ0123456789':
+        weights[ord(char)] = 10
+    # Two-queue Huffman tree: leaves in weight order, internal nodes in the order they are made, which is
+    #   also weight order. Every node is merged into a parent with a higher index
+    leaves = sorted(range(256), key=lambda sym: weights[sym])
+    nodes = weights + [0] * 255
+    parent = [0] * 511
+    next_leaf = 0
+    next_inner = 256
+    for new in range(256, 511):
+        pair = []
+        for _ in range(2):
+            if next_leaf < 256 and (next_inner >= new or weights[leaves[next_leaf]] <= nodes[next_inner]):
+                pair.append(leaves[next_leaf])
+                next_leaf += 1
+            else:
+                pair.append(next_inner)
+                next_inner += 1
+        nodes[new] = nodes[pair[0]] + nodes[pair[1]]
+        parent[pair[0]] = new
+        parent[pair[1]] = new
+    depth = [0] * 511
+    for node in range(509, -1, -1):
+        depth[node] = depth[parent[node]] + 1
+    lengths = bytearray(depth[0:256])
+    max_len = max(lengths)
+    # Canonical codes, shorter codes first and in symbol order within a length
+    counts = bytearray(max_len + 1)
+    for length in lengths:
+        counts[length] += 1
+    symbols = bytearray(sorted(range(256), key=lambda sym: (lengths[sym], sym)))
+    codes = array.array('I', (0 for _ in range(256)))
+    code = 0
+    length = lengths[symbols[0]]
+    for sym in symbols:
+        code <<= lengths[sym] - length
+        length = lengths[sym]
+        codes[sym] = code
+        code += 1
+    return codes, lengths, symbols, counts
+
+# (codes, lengths, symbols, counts) of the literal code, built the first time it's needed so importing
+#   this module stays cheap
+_literal_code = None
+
+def literal_code() -> tuple:
+    """
+    Returns:
+        tuple: (codes, lengths, symbols, counts) of the literal code, see _build_literal_code()
+    """
+    global _literal_code
+    if _literal_code is None:
+        _literal_code = _build_literal_code()
+    return _literal_code
@@ -0,0 +1,79 @@
+from iic import LindaI2C, I2C_CMD_NONE, I2C_CMD_COMMIT, I2C_CMD_FETCH, I2C_CMD_RX_DONE, I2C_REG_STATUS, \
+    I2C_STATUS_TX_READY, I2C_STATUS_RX_READY, I2C_STATUS_INBOX, I2C_STATUS_BUSY
+
+# The AMSAT controller's side of Linda, mixed into it from linda.py: the I2C target (iic.py) and the commands
+#   the controller leaves in its register block
+
+
+class I2CHost:
+    def start_i2c(self) -> LindaI2C:
+        """
+        Bring up the AMSAT I2C target if it is enabled and isn't up yet
+
+        Returns:
+            LindaI2C: The target, None if it is disabled
+        """
+        if self.i2c_enabled and self.i2c is None:
+            self.i2c = LindaI2C(self.amsat_buff)
+        return self.i2c
+
+    def service_i2c(self, busy: bool=False) -> None:
+        """
+        Carry out the command the AMSAT controller left in the I2C register block and refresh the status
+        register. Commands that have to wait for the laser, or for the data window, stay pending
+
+        Args:
+            busy (bool, optional): A laser transfer is in progress. Defaults to False.
+        """
+        i2c = self.i2c
+        amsat = self.amsat_buff
+        status = i2c.regs[I2C_REG_STATUS]
+        command = i2c.command()
+        # A queueing outbox takes new messages while the laser is busy, the one on the wire has its own memory
+        if command == I2C_CMD_COMMIT and (not busy or self.laser.outbox.queueing):
+            length = i2c.tx_length()
+            if length > len(amsat._data) or status & I2C_STATUS_RX_READY:
+                i2c.complete(False)
+            else:
+                if status & I2C_STATUS_TX_READY:
+                    # The message is in the window, hand it over. Whatever doesn't fit in the transmit ring
+                    #   yet goes on a later call
+                    amsat._data_len = length
+                    amsat.received = False
+                    i2c.set_status(I2C_STATUS_TX_READY, False)
+                if not self._transfer_amsat_buffer_to_outbox():
+                    i2c.set_status(I2C_STATUS_TX_READY, True)
+                    i2c.complete(False)
+                elif len(amsat) == 0:
+                    i2c.set_status(I2C_STATUS_TX_READY, True)
+                    i2c.complete()
+        elif command == I2C_CMD_FETCH and not busy and status & I2C_STATUS_TX_READY:
+            amsat.clear()
+            self._transfer_inbox_to_amsat_buffer()
+            i2c.set_rx_length(len(amsat))
+            i2c.set_status(I2C_STATUS_TX_READY, False)
+            i2c.set_status(I2C_STATUS_RX_READY, True)
+            i2c.complete()
+        elif command == I2C_CMD_RX_DONE:
+            amsat.clear()
+            i2c.set_rx_length(0)
+            i2c.set_status(I2C_STATUS_RX_READY, False)
+            i2c.set_status(I2C_STATUS_TX_READY, True)
+            i2c.complete()
+        elif command not in (I2C_CMD_NONE, I2C_CMD_COMMIT, I2C_CMD_FETCH):
+            i2c.complete(False)
+        self.update_i2c_status(busy)
+
+    def update_i2c_status(self, busy: bool=False) -> None:
+        """
+        Refresh the I2C_STATUS_INBOX and I2C_STATUS_BUSY flags the AMSAT controller polls
+
+        Args:
+            busy (bool, optional): A laser transfer is in progress. Defaults to False.
+        """
+        i2c = self.i2c
+        if self.rx_ring is None:
+            i2c.set_status(I2C_STATUS_INBOX, len(self.laser.inbox) > 0 or self.laser.inbox.queued() > 0)
+        else:
+            i2c.set_status(I2C_STATUS_INBOX, len(self.rx_ring) > 0)
+        i2c.set_status(I2C_STATUS_BUSY, busy)
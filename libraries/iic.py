@@ -1,15 +1,122 @@
-from machine import Pin, I2C
+from machine import Pin
+from micropython import const
+import logging
+
+try:
+    from machine import I2CTarget
+except ImportError:
+    I2CTarget = None
+
 from gpio import QWIIC_SCL, QWIIC_SDA
-from memory import AmsatI2CBuffer
+from memory import AmsatI2CBuffer, AMSAT_REG_SIZE
+
+log = logging.getLogger('i2clinda')
+
+# AMSAT I2C target
+# LINDA is a memory-mapped I2C target: the controller writes a 16-bit big-endian memory address, then reads
+#   or writes data from there on, the address incrementing with every byte. The whole AmsatI2CBuffer memory
+#   is mapped, so block transfers run in the I2C driver at bus speed and land straight in the buffer:
+# | STATUS (1) | CONTROL (1) | TX_LEN (2) | RX_LEN (2) | WINDOW (2) | PRIORITY (1) | reserved (7) | DATA WINDOW (WINDOW) |
+#   STATUS    I2C_STATUS_* flags, read only
+#   CONTROL   The controller writes an I2C_CMD_* command here, LINDA sets it back to 0 once it is done
+#   TX_LEN    Length of the message the controller put in the data window, for I2C_CMD_COMMIT
+#   RX_LEN    Length of the received message LINDA put in the data window, after I2C_CMD_FETCH
+#   WINDOW    Size of the data window
+#   PRIORITY  Priority of the message for I2C_CMD_COMMIT when the outbox queues messages, higher goes first
+# Sending: wait for I2C_STATUS_TX_READY, write the message into the data window in chunks of any size, then
+#   I2C_CMD_COMMIT and TX_LEN in one write starting at CONTROL. Receiving: once I2C_STATUS_INBOX is set,
+#   write I2C_CMD_FETCH, wait for CONTROL to read 0, read RX_LEN bytes of the data window in chunks and
+#   write I2C_CMD_RX_DONE.
+#   A command that can't run yet, e.g. while the laser is busy, stays in CONTROL until it can, which is
+#   the backpressure: the controller only has to poll CONTROL and STATUS between messages
+I2C_TARGET_ID = const(0)
+I2C_TARGET_ADDR = const(0x42)
+I2C_REG_STATUS = const(0)
+I2C_REG_CONTROL = const(1)
+I2C_REG_TX_LEN = const(2)
+I2C_REG_RX_LEN = const(4)
+I2C_REG_WINDOW = const(6)
+I2C_REG_PRIORITY = const(8)
+I2C_DATA = const(AMSAT_REG_SIZE)
+# Status flags
+I2C_STATUS_TX_READY = const(0x01)   # The data window is free for a new message
+I2C_STATUS_RX_READY = const(0x02)   # The data window holds a received message of RX_LEN bytes
+I2C_STATUS_INBOX = const(0x04)      # The laser has received a message that wasn't fetched yet
+I2C_STATUS_BUSY = const(0x08)       # A laser transfer is in progress
+I2C_STATUS_ERROR = const(0x80)      # The last command was rejected, e.g. TX_LEN larger than the window
+# Commands
+I2C_CMD_NONE = const(0)
+I2C_CMD_COMMIT = const(1)       # Hand the TX_LEN bytes of the data window over to the laser outbox
+I2C_CMD_FETCH = const(2)        # Put the received message in the data window
+I2C_CMD_RX_DONE = const(3)      # The received message has been read, free the window and the inbox
+
 
 class LindaI2C:
-    def __init__(self, i2c_buffer: AmsatI2CBuffer) -> None:
-        self.i2c = I2C(0, scl=Pin(QWIIC_SCL), sda=Pin(QWIIC_SDA), freq=400_000)
-        self.i2c.scan()
-        
+    def __init__(self, i2c_buffer: AmsatI2CBuffer, addr: int=I2C_TARGET_ADDR) -> None:
+        """
+        Memory-mapped I2C target for the AMSAT controller, serving the register block and data window of
+        the AMSAT buffer. The IRQ handler only sets event, the commands themselves are carried out by
+        Linda.service_i2c() outside of interrupt context
+
+        Args:
+            i2c_buffer (AmsatI2CBuffer): Buffer whose memory the target serves
+            addr (int, optional): 7-bit target address. Defaults to I2C_TARGET_ADDR.
+        """
+        self.buffer = i2c_buffer
+        self.regs = i2c_buffer.regs
+        # Optional asyncio.ThreadSafeFlag set whenever the controller has written something
+        self.event = None
+        window = len(i2c_buffer._data)
+        self.regs[I2C_REG_WINDOW] = window >> 8
+        self.regs[I2C_REG_WINDOW + 1] = window & 0xFF
+        self.set_status(I2C_STATUS_TX_READY, True)
+        if window > 0xFFFF - I2C_DATA:
+            log.info("The AMSAT buffer is larger than the 16-bit address space, only its start is mapped")
+        if I2CTarget is None:
+            log.info("This firmware has no machine.I2CTarget, the AMSAT I2C target is disabled")
+            self.target = None
+            return
+        self.target = I2CTarget(I2C_TARGET_ID, addr, mem=i2c_buffer.mem, mem_addrsize=16,
+                                scl=Pin(QWIIC_SCL), sda=Pin(QWIIC_SDA))
+        self.target.irq(handler=self._irq, trigger=I2CTarget.IRQ_END_WRITE)
+
     def __repr__(self) -> str:
         return 'I2C'
 
     def __str__(self) -> str:
         return 'I2C'
-    
\ No newline at end of file
+
+    def _irq(self, target) -> None:
+        if self.event is not None:
+            self.event.set()
+
+    def command(self) -> int:
+        """
+        Returns:
+            int: The I2C_CMD_* command the controller is waiting on, I2C_CMD_NONE if none
+        """
+        return self.regs[I2C_REG_CONTROL]
+
+    def complete(self, ok: bool=True) -> None:
+        """
+        Finish the pending command, flagging I2C_STATUS_ERROR if it was rejected
+        """
+        self.set_status(I2C_STATUS_ERROR, not ok)
+        self.regs[I2C_REG_CONTROL] = I2C_CMD_NONE
+
+    def tx_length(self) -> int:
+        return (self.regs[I2C_REG_TX_LEN] << 8) | self.regs[I2C_REG_TX_LEN + 1]
+
+    def priority(self) -> int:
+        return self.regs[I2C_REG_PRIORITY]
+
+    def set_rx_length(self, length: int) -> None:
+        self.regs[I2C_REG_RX_LEN] = length >> 8
+        self.regs[I2C_REG_RX_LEN + 1] = length & 0xFF
+
+    def set_status(self, flag: int, value: bool) -> None:
+        self.regs[I2C_REG_STATUS] = (self.regs[I2C_REG_STATUS] | flag) if value else (self.regs[I2C_REG_STATUS] & ~flag)
+
+    def deinit(self) -> None:
+        if self.target is not None:
+            self.target.deinit()
@@ -1,24 +1,25 @@
-from machine import Pin, bitstream, time_pulse_us, disable_irq, enable_irq
-from utime import ticks_us, ticks_diff
-from micropython import schedule
-import gc
-import array
-import logging
-import sys
+from machine import Pin
 
+from arena import MemoryArena
 from memory import InboxBuffer, OutboxBuffer
-from gpio import LASER_PIN, DETECTOR_PIN, LED_PIN
-
-# Logging setup
-logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
-log = logging.getLogger('laserlinda')
-for handler in logging.getLogger().handlers:
-    handler.setFormatter(logging.Formatter("[%(levelname)s]:%(name)s:%(message)s")) # type: ignore
-log.info('Laser log configured!')
-
-led = Pin(LED_PIN, Pin.OUT)
-
-gc.disable()
+from framedec import FrameDecoder
+from gpio import LASER_PIN, DETECTOR_PIN
+from modulation import Modulation, chip_timing
+from compression import LZSSCompressor
+from huffman import literal_code
+from fec import FEC_DEPTH, FEC_DEPTHS
+from feccodec import FecCodec
+from classifier import PulseClassifier
+from metrics import Metrics
+from tracering import Trace
+from rxedge import EdgeReceiver, RX_MODE_EDGE
+from rxpulse import PulseReceiver
+from rxframe import FrameReceiver
+from receive import Receiver
+from txframe import FrameSender
+from transmit import Transmitter
+from txqueue import QueueSender
+from service import LaserService
 
 TEST_BITSTREAM = True
 # Timing of high-low pulse modulation in machine.bitstream in ns
@@ -30,18 +31,59 @@ BITSTREAM_TIMING = (1000000, 3000000, 4000000, 2000000)
 BITSTREAM_MAX_PULSE_US = int((BITSTREAM_TIMING[2] + BITSTREAM_TIMING[3]) / 1000)
 BITSTREAM_DUR_0 = BITSTREAM_TIMING[0]/1000
 BITSTREAM_DUR_1 = BITSTREAM_TIMING[2]/1000
-
-
-class LindaLaser(object):
+# The constants above describe the default timing. Each LindaLaser runs at its own timing (see set_timing()),
+#   which link training (training.py) tunes to the fastest rate the hardware on both ends can handle
+
+# The receive and transmit paths are split across modules, mixed into LindaLaser:
+#   rxedge.py   detector edges to bits in RX_MODE_EDGE
+#   rxpulse.py  pulses timed in the detector IRQ in the legacy RX_MODE_PULSE
+#   rxframe.py  frames to the inbox, with the link training, FEC and ARQ handling of received frames
+#   receive.py  receptions, start_rx() and friends
+#   txframe.py  messages to frames and pulses, with compression and FEC, and the interrupt budget
+#   transmit.py transmissions, transmit_data() and friends, abort and preemption
+#   txqueue.py  transmissions of the messages queued in the outbox
+#   service.py  the dual-core laser service, start() and stop()
+
+
+class LindaLaser(EdgeReceiver, PulseReceiver, FrameReceiver, Receiver, FrameSender, Transmitter, QueueSender,
+                 LaserService):
     def __init__(self, inbox: InboxBuffer, outbox: OutboxBuffer, 
-                 laser_pin: int=LASER_PIN, detector_pin: int=DETECTOR_PIN) -> None:
+                 laser_pin: int=LASER_PIN, detector_pin: int=DETECTOR_PIN, rx_mode: int=RX_MODE_EDGE,
+                 framed: bool=True, timing: tuple=BITSTREAM_TIMING, modulation: Modulation=None,
+                 arena: MemoryArena=None) -> None:
+        # Work buffers are carved from arena when given one, see Linda
         self.inbox = inbox
         self.outbox = outbox
         self.tx_toggle = True
-        self.rx_flag = False
-        self.rx_bits = array.array('i')
-        self.rx_chrs = []
-        self.tick_dur = 0
+        self.rx_mode = rx_mode
+        self._init_edge_rx()
+        self._init_pulse_rx()
+        # Framing layer between the buffers and the laser. Unframed links send and receive raw outbox bytes
+        self.framed = framed
+        self._init_frame_tx(arena)
+        # Forward error correction (see set_fec()). Coded frames are always decoded on receive
+        self.fec = FecCodec()
+        self.fec_enabled = False
+        self.frame_decoder = FrameDecoder(fec=self.fec)
+        # Optional pipeline.TxPipeline that framed transmissions go through
+        self.tx_pipeline = None
+        # Optional compression stage (see set_compression()). Compressed frames are always decompressed on receive
+        self.compressor = None
+        self._compressor = None
+        self._init_frame_rx(arena)
+        self._init_service(arena)
+        # Binary PWM pulses are classified against the widths learned during each reception (see set_adaptive())
+        self.classifier = PulseClassifier()
+        # Telemetry, shared with the buffers by the top-level controller
+        self.metrics = Metrics()
+        # Diagnostics, recorded as binary events instead of being logged (see trace.py)
+        self.trace = Trace()
+        self._rx_frames_ok = 0
+        self._rx_frames_bad = 0
+        self.modulation = None
+        self._init_transmit()
+        self.set_timing(timing)
+        self.set_modulation(modulation)
         # Init the laser and detector pins
         self._init_pins(laser_pin, detector_pin)
 
@@ -55,121 +97,103 @@ class LindaLaser(object):
         self.laser = Pin(laser_pin, Pin.OUT)
         # The laser sensor modules output LOW when it sees a laser and HIGH otherwise
         self.detector = Pin(detector_pin, Pin.IN, pull=Pin.PULL_UP)
-        self.detector.irq(handler=self._rx_bitstream, trigger=Pin.IRQ_FALLING)
+        self._init_rx_irq()
 
-    def _toggle_tx(self, tx_toggle: bool) -> None:
+    def _init_rx_irq(self) -> None:
+        if self.rx_mode == RX_MODE_EDGE:
+            self.detector.irq(handler=self._rx_edge, trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, hard=True)
+        else:
+            self.detector.irq(handler=self._rx_bitstream, trigger=Pin.IRQ_FALLING)
+
+    def set_timing(self, timing: tuple, rx_durations: tuple=None) -> None:
         """
-        Update the global LindaLaser state to toggle between Tx and Rx
+        Set the high-low pulse duration modulation timing used for both transmit and receive
 
         Args:
-            tx_toggle (bool): State toggle boolean. TRUE if Tx, FALSE if Rx
+            timing (tuple): (high_time_0, low_time_0, high_time_1, low_time_1) in ns, as for machine.bitstream()
+            rx_durations (tuple, optional): Measured (0, 1) pulse widths at the detector in us, which received
+                pulses are classified against. Defaults to None, the nominal high times.
         """
-        self.tx_toggle = tx_toggle
-        
-
-    def _rx_bitstream(self, irq):
+        self.timing = tuple(timing)
+        self.max_pulse_us = int((self.timing[2] + self.timing[3]) / 1000)
+        if rx_durations is None:
+            rx_durations = (self.timing[0] // 1000, self.timing[2] // 1000)
+        self.dur_0, self.dur_1 = rx_durations
+        self.classifier.reset(self.dur_0, self.dur_1)
+        self.metrics.set_pulse_range(self.max_pulse_us)
+        # The bit periods place the bits that never arrived as pulses, see EdgeReceiver._rx_bit_slots() in rxedge.py
+        self._periods = ((self.timing[0] + self.timing[1]) // 1000, (self.timing[2] + self.timing[3]) // 1000)
+        # Chip-based modulations use the shortest pulse of the binary timing as their chip period
+        self.chip_timing = chip_timing(self.timing[0])
+        self.set_irq_budget(self.irq_budget_us)
+
+    def set_compression(self, enabled: bool) -> None:
         """
-        Callback function triggered on laser detector interrupt. 
-        If receiving, time the incoming tick and save its duration to the rx_byte array
+        Turn the LZSS compression stage between the outbox and the laser on or off. Worth it for text and
+        other redundant data, while data that doesn't compress costs about 1/8 more airtime
+
+        The compressor's tables and the literal code are built here the first time, not by the first
+        transmit, and kept when compression is turned off and on again
 
         Args:
-            irq (irq): Default single-argument of micropython interrupt callbacks
+            enabled (bool): Compress framed messages before sending them
         """
-        if self.rx_flag:
-            self.tick_dur = time_pulse_us(self.detector, 0, BITSTREAM_MAX_PULSE_US)
-            schedule(self.rx_bits.append, (0 if (abs(self.tick_dur - BITSTREAM_DUR_0) < abs(self.tick_dur - BITSTREAM_DUR_1)) else 1))
-            # self.rx_bits.append(0 if (abs(self.tick_dur - BITSTREAM_DUR_0) < abs(self.tick_dur - BITSTREAM_DUR_1)) else 1)
+        if enabled and self._compressor is None:
+            self._compressor = LZSSCompressor()
+            literal_code()
+        self.compressor = self._compressor if enabled else None
 
-    def _transmit_buffer(self, outbox_mv: memoryview, start_idx: int=0, end_idx: int=32) -> None:
+    def set_fec(self, enabled: bool, depth: int=FEC_DEPTH) -> None:
         """
-        Transmits data in the given memoryview by bit-banging the laser module output using machine.bitstream()
-        Uses high-low pulse duration modulation, defined in the global four-tuple BITSTREAM_TIMING
+        Turn forward error correction of framed messages on or off. Each frame then carries at most
+        FEC_MAX_DATA bytes in twice the airtime, in exchange for surviving bursts of up to depth bits
+        and scattered errors without a retransmission
 
         Args:
-            outbox_mv (memoryview): Memoryview of a bytearray() containing data to transmit
-            start_idx (int): Index of memoryview byte to begin transmitting
-            end_idx (int): Index of memoryview bytes to end transmitting
+            enabled (bool): Encode framed messages before sending them
+            depth (int, optional): Interleaver rows, one of FEC_DEPTHS, both ends of the link have to use the same.
+                Defaults to FEC_DEPTH.
         """
-        state = disable_irq()
-        bitstream(self.laser, 0, BITSTREAM_TIMING, outbox_mv[start_idx:end_idx])
-        enable_irq(state)
-        gc.collect()
-        self.laser.off()
+        if depth not in FEC_DEPTHS:
+            raise ValueError(f"Unsupported FEC depth {depth}, choose from {FEC_DEPTHS}")
+        self.fec_enabled = enabled
+        self.fec.depth = depth
 
-    def transmit_outbox(self, msg_len: int=-1) -> None:
+    def set_adaptive(self, enabled: bool) -> None:
         """
-        Transmit the contents of the outbox, optionally choosing the amount of data to transmit.
-        If no length argument is given, transmit the entire message
+        Turn the adaptive binary PWM classifier on or off. Each reception starts from the expected pulse widths
+        either way, and with it on the decision threshold then follows the widths actually received, so
+        detector asymmetry and drift don't have to be left for in the timing
 
         Args:
-            msg_len (int, optional): The length in bytes of the message to send. Defaults to -1,
-                which indicates transmission of the entire outbox message.
+            enabled (bool): Learn and track the pulse widths while receiving
         """
-        if msg_len == 0:
-            log.info('No message to transmit')
-        # Get the length of the outbox message
-        elif msg_len == -1:
-            log.info(f"Transmitting entire outbox ({len(self.outbox)} bytes)")
-            self._transmit_buffer(self.outbox._data, end_idx=len(self.outbox))
-        else:
-            log.info(f"Transmitting {msg_len} bytes")
-            self._transmit_buffer(self.outbox._data, end_idx=msg_len)
-
+        self.classifier.tracking = enabled
 
-    def start_rx(self, duration: int=5):
+    def set_modulation(self, modulation: Modulation=None) -> None:
         """
-        Receives laser detector input as data for a given duration. Converts incoming bits to byte integers
-        and writes to inbox memory buffer
-    
+        Choose how frames are put on the laser. Modulated links need RX_MODE_EDGE and framing. The modulation's
+        chip buffers are laid out for the interrupt budget (see set_irq_budget()), so make any transmit pipeline
+        after this
+
         Args:
-            duration (int, optional): Duration to listen, in seconds. Defaults to 5.
-        """
-        # Sometimes junk data gets in the rx_byte before we start the Rx transaction
-        # If that's true, reset self.rx_bits
-        if len(self.rx_bits) != 0:
-            log.info('Resetting rx_bits')
-            self.rx_bits = array.array('i')
-        # Reset 
-        start = ticks_us()
-        self.rx_flag = True
-        gc.enable()
-        while ticks_diff(ticks_us(), start) < (duration*1000000):
-            # Stay in this loop until the Rx transaction has lasted the given duration
-            pass
-        gc.disable()
-        self.rx_flag = False
-        gc.collect()
-        if len(self.rx_bits) > 0:
-            self.decom_rx_bits()
-        else:
-            log.info("No data was received during Rx period")
+            modulation (Modulation, optional): A multi-bit-per-symbol modulation from chipmodes.py.
+                Defaults to None, binary pulse-width modulation straight from machine.bitstream().
 
-    def decom_rx_bits(self):
-        """
-        Take an array of 1's and 0's, and turn them to an ASCII string to read to the inbox
+        Raises:
+            ValueError: The interrupt budget is too short for one byte of the modulation between its markers
         """
-        log.info("Rx complete, starting decom...")
-        rx_str = self.rx_bits_to_str()
-        log.info(rx_str)
-        gc.collect()
-        self.inbox._read_ascii(rx_str)
-        self.rx_bits = array.array('i')
-        log.info("Rx successful!")
-            
-    def rx_bits_to_str(self):
+        if modulation is not None:
+            modulation.set_slice(self.irq_budget_us // (8 * ((self.chip_timing[1] + 999) // 1000)))
+        self.modulation = modulation
+        # Bound once, so demodulating doesn't allocate a bound method per pulse
+        self._rx_push = self._rx_push_bit
+
+    def _toggle_tx(self, tx_toggle: bool) -> None:
         """
-        Converts an array of 1's and 0's to 8-bit chars, then combine into a string to return
+        Update the global LindaLaser state to toggle between Tx and Rx
 
-        Returns:
-            _type_: _description_
+        Args:
+            tx_toggle (bool): State toggle boolean. TRUE if Tx, FALSE if Rx
         """
-        byte_string = ""
-        for bit in self.rx_bits:
-            byte_string += str(bit)
-            if len(byte_string) == 8:
-                byte_int = int(byte_string, 2)
-                self.rx_chrs.append(chr(byte_int))
-                byte_string = ""
-        return ("".join(self.rx_chrs))
-                    
-tl = LindaLaser(InboxBuffer(1024), OutboxBuffer(1024))
\ No newline at end of file
+        self.tx_toggle = tx_toggle
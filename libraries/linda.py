@@ -1,35 +1,170 @@
+from micropython import const
 import _thread
 
-from encoding import HammingData
 from laser import LindaLaser
-from iic import LindaI2C
-from memory import AmsatI2CBuffer, InboxBuffer, OutboxBuffer
+from i2chost import I2CHost
+from metrics import M_AMSAT_IN_BYTES, M_AMSAT_OUT_BYTES
+from arena import MemoryArena
+from memory import AMSAT_REG_SIZE, AmsatI2CBuffer, InboxBuffer, OutboxBuffer
+from ring import RingBuffer
+from pipeline import TxPipeline
+from training import load_timing
 
-class Linda():
-    def __init__(self) -> None:
+# Default sizes of the memory arena regions in bytes
+LINDA_INBOX_SIZE = const(64000)
+LINDA_OUTBOX_SIZE = const(64000)
+LINDA_AMSAT_SIZE = const(32000)
+# Work buffers of the laser and the transmit pipeline: FEC and compression buffers and the pipeline slots
+LINDA_SCRATCH_SIZE = const(4096)
+
+class Linda(I2CHost):
+    def __init__(self, i2c: bool=False, inbox_size: int=LINDA_INBOX_SIZE, outbox_size: int=LINDA_OUTBOX_SIZE,
+                 amsat_size: int=LINDA_AMSAT_SIZE, scratch_size: int=LINDA_SCRATCH_SIZE) -> None:
+        """
+        Every long-lived buffer is carved from one memory arena allocated up front: inbox, outbox, AMSAT
+        buffer and the scratch region the laser and the transmit pipeline take their work buffers from.
+        The heap then only holds small objects, and the transfer loops don't allocate, so automatic garbage
+        collection can stay on
+
+        Args:
+            i2c (bool, optional): Serve the AMSAT buffer to the AMSAT controller as an I2C target, see iic.py,
+                once start_i2c() is called. Defaults to False.
+            inbox_size (int, optional): Size of the laser inbox. Defaults to LINDA_INBOX_SIZE.
+            outbox_size (int, optional): Size of the laser outbox. Defaults to LINDA_OUTBOX_SIZE.
+            amsat_size (int, optional): Message size of the AMSAT buffer. Defaults to LINDA_AMSAT_SIZE.
+            scratch_size (int, optional): Size of the scratch region. Defaults to LINDA_SCRATCH_SIZE.
+        """
         print("New LINDA top-level controller")
-        # Allocate initial buffers
-        inbox = InboxBuffer(64000)
-        outbox = OutboxBuffer(64000)
-        amsat_buff = AmsatI2CBuffer(32000)
-        self.laser = LindaLaser(inbox, outbox)
-        # self.i2c = LindaI2C(amsat_buff)
+        # Allocate the arena and carve the buffers out of it
+        self.arena = MemoryArena(inbox_size + outbox_size + AMSAT_REG_SIZE + amsat_size + scratch_size)
+        inbox = InboxBuffer(inbox_size, self.arena)
+        outbox = OutboxBuffer(outbox_size, self.arena)
+        self.amsat_buff = AmsatI2CBuffer(amsat_size, self.arena)
+        self.scratch = self.arena.sub_arena(scratch_size)
+        self.laser = LindaLaser(inbox, outbox, arena=self.scratch)
+        # One set of telemetry counters for the whole controller, see metrics.py
+        self.metrics = self.laser.metrics
+        for buffer in (inbox, outbox, self.amsat_buff):
+            buffer.metrics = self.metrics
+        # And one binary event trace, see trace.py
+        self.trace = self.laser.trace
+        # Reuse the timing found by the last link training
+        stored_timing = load_timing()
+        if stored_timing is not None:
+            self.laser.set_timing(*stored_timing)
+        # Frames are prepared on core 1 while core 0 transmits
+        self.laser.tx_pipeline = TxPipeline(self.laser, arena=self.scratch)
+        # The I2C target comes up in start_i2c(), off the path to receiving
+        self.i2c_enabled = i2c
+        self.i2c = None
+        # Dual-core mode rings between the host side and the laser service, see start()
+        self.tx_ring = None
+        self.rx_ring = None
 
-    def _transfer_amsat_buffer_to_outbox(self) -> None:
+    def _transfer_amsat_buffer_to_outbox(self) -> bool:
         """
-        Copy data from the I2C buffer from the AMSAT to the Laser outbox
+        Copy data from the I2C buffer from the AMSAT to the Laser outbox.
+        In dual-core mode the data is queued in the transmit ring instead, and whatever doesn't fit yet
+        stays at the start of the AMSAT buffer for the next call. So does a message for a queueing outbox
+        that is full, until sending the queue makes room for it, and one for a plain outbox while the laser
+        is transmitting the outbox message. A queued message goes into free memory, never over the message
+        on the wire. Does nothing unless the host has put a message in the AMSAT buffer
+
+        Returns:
+            bool: False if the message was dropped because it can never fit in the outbox queue
         """
-        pass
+        amsat = self.amsat_buff
+        if len(amsat) == 0 or amsat.received:
+            return True
+        outbox = self.laser.outbox
+        if self.tx_ring is None:
+            if outbox.queueing:
+                if not outbox.fits(len(amsat)):
+                    if len(amsat) <= len(outbox._mem):
+                        return True
+                    amsat.clear()
+                    return False
+                priority = self.i2c.priority() if self.i2c is not None else 0
+                outbox.enqueue(amsat.view(), priority)
+                count = len(amsat)
+                # A more urgent message interrupts the one on the wire
+                self.laser.preempt_tx(priority)
+            elif self.laser.transmitting:
+                return True
+            else:
+                count = outbox.write(amsat.view())
+            amsat.clear()
+        else:
+            count = self.tx_ring.write(amsat.view())
+            amsat.write(amsat.view(count))
+        self.metrics.add(M_AMSAT_IN_BYTES, count)
+        return True
 
     def _transfer_inbox_to_amsat_buffer(self) -> None:
         """
-        Copy data form the Laser inbox to the AMSAT I2C buffer
+        Copy data form the Laser inbox to the AMSAT I2C buffer, and empty the inbox.
+        When the inbox queues messages, only the next one is moved.
+        In dual-core mode, append whatever the laser service has received since the last call.
+        Does nothing while a reception is filling the inbox, or while the AMSAT buffer holds a message from
+        the host that hasn't gone to the laser yet
+        """
+        amsat = self.amsat_buff
+        inbox = self.laser.inbox
+        if len(amsat) > 0 and not amsat.received:
+            return
+        if self.rx_ring is None:
+            if self.laser.rx_flag:
+                return
+            slot = inbox.peek()
+            if slot >= 0:
+                count = amsat.write(inbox.message(slot))
+                inbox.pop(slot)
+            elif len(inbox) > 0:
+                count = amsat.write(inbox.view())
+                inbox.clear()
+            else:
+                return
+        else:
+            count = self.rx_ring.readinto(amsat._data[len(amsat):])
+            amsat._data_len += count
+        amsat.received = len(amsat) > 0
+        self.metrics.add(M_AMSAT_OUT_BYTES, count)
+
+    def set_queueing(self, enabled: bool) -> None:
+        """
+        Queue messages in the laser inbox and outbox, see msgqueue.QueueBuffer: the AMSAT controller can commit
+        several messages with a priority each before they go out, all sent in one session highest priority
+        first, and a session of several messages lands in the inbox as separate messages, fetched one by
+        one. Empties both buffers. Not for dual-core mode, whose rings take over their memory
+
+        Args:
+            enabled (bool): Queue messages
         """
-        pass
+        self.laser.inbox.set_queueing(enabled)
+        self.laser.outbox.set_queueing(enabled)
 
-    def start(self):
-        # Start the laser listener loop in its own thread
-        # _thread.start_new_thread(self.laser.start, ())
-        # Start the Amsat i2c listener 
-        # _thread.start_new_thread(self.i2c.start, ())
-        pass
+    def start(self) -> None:
+        """
+        Dual-core mode. The laser RX/TX service takes over core 1 and the laser inbox and outbox memory,
+        which become the lock-free rings it exchanges data through with the host side (AMSAT I2C and the
+        main loop) on core 0
+        """
+        self.tx_ring = RingBuffer(self.laser.outbox)
+        self.rx_ring = RingBuffer(self.laser.inbox)
+        self.laser.tx_ring = self.tx_ring
+        self.laser.rx_ring = self.rx_ring
+        # Core 1 belongs to the laser service now, it prepares its own frames
+        self.laser.tx_pipeline = None
+        _thread.start_new_thread(self.laser.start, ())
+
+    def stop(self) -> None:
+        """
+        Leave dual-core mode once the laser service has finished
+        """
+        self.laser.stop()
+        while self.laser.serving:
+            pass
+        self.tx_ring = None
+        self.rx_ring = None
+        self.laser.tx_ring = None
+        self.laser.rx_ring = None
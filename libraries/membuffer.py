@@ -0,0 +1,167 @@
+from sys import stdout
+import logging
+
+from arena import MemoryArena, arena_buffer
+from metrics import M_BUFFER_TRUNCATED
+
+log = logging.getLogger('memorylinda')
+
+# Message buffers
+# A MemoryBuffer holds one message in a fixed region of memory, written and read in bulk copies of any
+#   buffer-protocol object. The inbox, outbox and AMSAT buffers in memory.py build on it
+
+
+class MemoryBuffer:
+    def __init__(self, size_bytes, arena: MemoryArena=None) -> None:
+        """
+        Args:
+            size_bytes (int): Size of the buffer
+            arena (MemoryArena, optional): Arena to carve the memory from. Defaults to None, allocating it
+                on the heap.
+        """
+        # Initialize the memory off of the heap, or in a region of the arena
+        data = arena_buffer(arena, size_bytes)
+        # Create a memoryview to it, so we can sub-view the memory in the derived classes
+        self._data = memoryview(data)
+        self._data_len = 0
+        # Optional metrics.Metrics counting the bytes that didn't fit
+        self.metrics = None
+
+    def __str__(self) -> str:
+        return "Memory buffer"
+
+    def __repr__(self) -> str:
+        return "Memory buffer"
+
+    def __len__(self) -> int:
+        # Length of the message held in the buffer
+        return self._data_len
+
+    def write(self, src) -> int:
+        """
+        Replace the contents of the buffer with src in a single copy
+
+        Args:
+            src (_buffer_): Any buffer-protocol object (bytes, bytearray, memoryview, array)
+
+        Returns:
+            int: Number of bytes written, less than len(src) if the buffer is too small
+        """
+        self._data_len = 0
+        return self.write_at(0, src)
+
+    def write_at(self, offset: int, src) -> int:
+        """
+        Copy src into the buffer at offset, extending the message to cover it
+
+        Args:
+            offset (int): Byte index to write at
+            src (_buffer_): Any buffer-protocol object
+
+        Returns:
+            int: Number of bytes written, less than len(src) if it runs past the end of the buffer
+        """
+        count = max(min(len(src), len(self._data) - offset), 0)
+        if count > 0:
+            self._data[offset:offset + count] = src[:count]
+            # Nothing written past the end, so the message never outgrows the buffer
+            self._data_len = min(max(self._data_len, offset + count), len(self._data))
+        if count < len(src) and self.metrics is not None:
+            self.metrics.add(M_BUFFER_TRUNCATED, len(src) - count)
+        return count
+
+    def append(self, src) -> int:
+        """
+        Add src to the end of the message
+
+        Args:
+            src (_buffer_): Any buffer-protocol object
+
+        Returns:
+            int: Number of bytes appended, less than len(src) if the buffer fills up
+        """
+        return self.write_at(self._data_len, src)
+
+    def readinto(self, dst, start: int=0) -> int:
+        """
+        Copy message bytes into dst
+
+        Args:
+            dst (_buffer_): Writable buffer to fill from the start
+            start (int, optional): First message byte to copy. Defaults to 0.
+
+        Returns:
+            int: Number of bytes copied
+        """
+        count = max(min(len(dst), self._data_len - start), 0)
+        dst[0:count] = self._data[start:start + count]
+        return count
+
+    def view(self, start: int=0, end: int=-1) -> memoryview:
+        """
+        Zero-copy view of the message
+
+        Args:
+            start (int, optional): First byte of the view. Defaults to 0.
+            end (int, optional): End of the view, exclusive. Defaults to -1, the end of the message.
+
+        Returns:
+            memoryview: View into the buffer memory, valid until the buffer is next written
+        """
+        if end < 0:
+            end = self._data_len
+        return self._data[start:end]
+
+    def clear(self) -> None:
+        self._data_len = 0
+    
+    def _memoryview_int(self, mem: memoryview) -> int:
+        """
+        Given a memoryview, cast its entirety to a big-endiant int and return
+
+        Args:
+            mem (memoryview): The memoryview to cast to an int. Typically a self variable
+
+        Returns:
+            int: Integer representation of the total contents of the given memoryview
+        """
+        return int.from_bytes(mem, 'big')
+    
+    def _print_data_ascii(self, chunk_size: int=64, print_len: int=-1, encoding: str='ascii') -> str:
+        """
+        Print the contents of the memoryview. Iterates over given chunk size, decodes, and prints to limit 
+            memory usage during printing
+
+        Args:
+            chunk_size (int, optional): The size of chunks to decode and print. Defaults to 64.
+            print_len (int, optional): The length of the outbox to print If -1, prints whole message. Defaults to -1.
+
+        Returns:
+            str: Empty string to signal end of ASCII text and provide newline
+        """
+        decoded_chunk = ''
+        if self._data_len == 0:
+            print("This MemoryBuffer is empty!")
+        else:
+            if print_len == -1:
+                print_len = self._data_len
+            start = 0
+            while start < print_len:
+                chunk = self._data[start: start+chunk_size]
+                decoded_chunk = bytes(chunk).decode(encoding)
+                stdout.write(decoded_chunk)
+                start += chunk_size
+        return ''
+    
+    def _read_ascii(self, _msg: str) -> None:
+        """
+        Write an ASCII string to the memory buffer. 
+
+        Args:
+            _msg (str): ASCII string to save to outbox message buffer
+        """
+        if len(_msg) > len(self._data):
+            log.info(f"Your message ({len(_msg)} bytes) is larger than the message buffer ({len(self._data)} bytes)\n"\
+                  "The message will be truncated.")
+        self.write(_msg.encode('ascii'))
+        
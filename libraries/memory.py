@@ -1,96 +1,42 @@
 # Header sizes in bytes
-import gc
-import logging
-import sys
-from sys import stdout
+from micropython import const
 
-# Logging setup
-logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
-log = logging.getLogger('memorylinda')
-for handler in logging.getLogger().handlers:
-    handler.setFormatter(logging.Formatter("[%(levelname)s]:%(name)s:%(message)s")) # type: ignore
-log.info("Memory log configured!")
+from arena import MemoryArena
+from membuffer import MemoryBuffer
+from msgqueue import QueueBuffer
 
-class MemoryBuffer:
-    def __init__(self, size_bytes) -> None:
-        # Initialize the memory off of the heap
-        data = bytearray(size_bytes)
-        # Create a memoryview to it, so we can sub-view the memory in the derived classes
-        self._data = memoryview(data)
-        self._data_len = 0
-
-    def __str__(self) -> str:
-        return "Memory buffer"
-
-    def __repr__(self) -> str:
-        return "Memory buffer"
-    
-    def _memoryview_int(self, mem: memoryview) -> int:
-        """
-        Given a memoryview, cast its entirety to a big-endiant int and return
+# The buffers of the controller: the laser inbox and outbox, and the AMSAT I2C buffer. The buffer classes they
+#   build on are in membuffer.py and msgqueue.py, the arena they are carved from in arena.py
+#
+# Bytes of the AMSAT I2C register block ahead of the AmsatI2CBuffer message, see iic.py
+AMSAT_REG_SIZE = const(16)
 
-        Args:
-            mem (memoryview): The memoryview to cast to an int. Typically a self variable
 
-        Returns:
-            int: Integer representation of the total contents of the given memoryview
-        """
-        return int.from_bytes(mem, 'big')
-    
-    def _print_data_ascii(self, chunk_size: int=64, print_len: int=-1, encoding: str='ascii') -> str:
+class AmsatI2CBuffer(MemoryBuffer):
+    def __init__(self, size_bytes, arena: MemoryArena=None) -> None:
         """
-        Print the contents of the memoryview. Iterates over given chunk size, decodes, and prints to limit 
-            memory usage during printing
+        Message buffer shared with the AMSAT I2C controller. Its memory starts with the AMSAT_REG_SIZE bytes of
+        the I2C register block, followed by the message, so the I2C target can serve the whole of it as one
+        memory map (see iic.py) and block transfers land straight in the message
 
         Args:
-            chunk_size (int, optional): The size of chunks to decode and print. Defaults to 64.
-            print_len (int, optional): The length of the outbox to print If -1, prints whole message. Defaults to -1.
-
-        Returns:
-            str: Empty string to signal end of ASCII text and provide newline
+            size_bytes (int): Size of the message area
+            arena (MemoryArena, optional): Arena to carve the memory from. Defaults to None.
         """
-        gc.enable()
-        decoded_chunk = ''
-        if self._data_len == 0:
-            print("This MemoryBuffer is empty!")
-        else:
-            if print_len == -1:
-                print_len = self._data_len
-            start = 0
-            while start < print_len:
-                chunk = self._data[start: start+chunk_size]
-                decoded_chunk = bytes(chunk).decode(encoding)
-                stdout.write(decoded_chunk)
-                start += chunk_size
-        gc.disable()
-        return ''
-    
-    def _read_ascii(self, _msg: str) -> None:
-        """
-        Write an ASCII string to the memory buffer. 
-
-        Args:
-            _msg (str): ASCII string to save to outbox message buffer
-'        """
-        gc.collect()
-        if len(_msg) > len(self._data):
-            log.info(f"Your message ({len(_msg)} bytes) is larger than the message buffer ({len(self._data)} bytes)\n"\
-                  "The message will be truncated.")
-        # Set the message length
-        self._data_len = len(_msg)
-        for i, char in enumerate(_msg):
-            if i+1 >= len(self._data):
-                break
-            self._data[i] = ord(char)
-        gc.collect()
-        
-class AmsatI2CBuffer(MemoryBuffer):
-    def __init__(self, size_bytes) -> None:
-        super().__init__(size_bytes)
+        super().__init__(AMSAT_REG_SIZE + size_bytes, arena)
+        self.mem = self._data
+        self.regs = self.mem[0:AMSAT_REG_SIZE]
+        self._data = self.mem[AMSAT_REG_SIZE:]
+        # The message is received data for the host rather than one from it, until the host clears it
+        self.received = False
+
+    def clear(self) -> None:
+        self._data_len = 0
+        self.received = False
 
-class OutboxBuffer(MemoryBuffer):
-    def __init__(self, size_bytes) -> None:
-        super().__init__(size_bytes)
+class OutboxBuffer(QueueBuffer):
+    def __init__(self, size_bytes, arena: MemoryArena=None) -> None:
+        super().__init__(size_bytes, arena)
         self.msg_ready = False
 
     def __str__(self) -> str:
@@ -103,10 +49,6 @@ class OutboxBuffer(MemoryBuffer):
     
     def __bool__(self) -> bool:
         return self.msg_ready
-    
-    def __len__(self) -> int:
-        # Return the length of the message
-        return self._data_len
 
     def _set_msg_ready(self, ready:bool=True) -> None:
         """
@@ -117,9 +59,9 @@ class OutboxBuffer(MemoryBuffer):
         """
         self.msg_ready = ready
 
-class InboxBuffer(MemoryBuffer):
-    def __init__(self, size_bytes) -> None:
-        super().__init__(size_bytes)
+class InboxBuffer(QueueBuffer):
+    def __init__(self, size_bytes, arena: MemoryArena=None) -> None:
+        super().__init__(size_bytes, arena)
         self.recording = False
 
     def __str__(self) -> str:
@@ -128,9 +70,6 @@ class InboxBuffer(MemoryBuffer):
     def __repr__(self) -> str:
         return super().__repr__()
     
-    def __len__(self) -> int:
-        return self._data_len
-    
     def set_recording(self, recording:bool=True) -> None:
         """
         Set the recording flag
@@ -0,0 +1,148 @@
+from micropython import const
+from utime import ticks_us, ticks_diff
+import array
+import gc
+
+# Link and runtime telemetry
+# Every counter is a slot of one preallocated array, so recording never allocates, and the whole set dumps
+#   as one binary snapshot (see Metrics.dump_into()), little-endian:
+# | VERSION (1) | COUNTERS (1) | PULSE BUCKETS (1) | LATENCY BUCKETS (1) | COUNTERS (4 each) | PULSE HISTOGRAM (4 each) | LATENCY HISTOGRAM (4 each) |
+#   The pulse-width histogram has METRICS_PULSE_BUCKETS buckets of M_PULSE_BUCKET_US each, the last one
+#   also counting every longer pulse. Bucket i of the latency histogram counts latencies below 2^i us
+#   (and at least 2^(i-1) us), the last one every longer latency
+METRICS_VERSION = const(3)
+# Counter slots
+M_TX_WIRE_BYTES = const(0)      # Bytes clocked out to the laser, framing and modulation included
+M_TX_BYTES = const(1)           # Message bytes sent
+M_TX_FRAMES = const(2)
+M_TX_LAST_BPS = const(3)        # Message throughput of the last transmission
+M_RX_BITS = const(4)            # Bits decoded from pulses
+M_RX_BYTES = const(5)           # Message bytes received
+M_RX_FRAMES_OK = const(6)
+M_RX_FRAMES_BAD = const(7)
+M_RX_LAST_BPS = const(8)        # Message throughput of the last reception, from its first to its last pulse
+M_CODE_CORRECTED = const(9)     # Frames the FEC decoder repaired
+M_CODE_UNCORRECTED = const(10)  # Coded frames the FEC decoder couldn't repair
+M_RX_OVERFLOWS = const(11)      # Edges lost because the capture ring was full
+M_SCHEDULE_OVERFLOWS = const(12)  # Bits lost because the micropython.schedule() queue was full
+M_RX_INVALID = const(13)        # Pulses that weren't a bit
+M_BUFFER_TRUNCATED = const(14)  # Bytes that didn't fit in a MemoryBuffer or RingBuffer
+M_GC_COUNT = const(15)
+M_GC_US = const(16)             # Time spent in gc.collect()
+M_IRQ_OFF_US = const(17)        # Time spent with interrupts disabled
+M_IRQ_OFF_MAX_US = const(18)    # Longest single stretch with interrupts disabled, the worst-case interrupt latency
+M_AMSAT_IN_BYTES = const(19)    # Bytes moved between the AMSAT I2C buffer and the laser buffers
+M_AMSAT_OUT_BYTES = const(20)
+M_PULSE_BUCKET_US = const(21)   # Width of a pulse histogram bucket
+M_BOOT_MS = const(22)           # Time from reset to ready to receive
+M_TX_ABORTED = const(23)        # Transmissions cut short by an abort or a higher-priority message
+METRICS_COUNTERS = const(24)
+METRICS_PULSE_BUCKETS = const(16)
+METRICS_LATENCY_BUCKETS = const(16)
+METRICS_HEADER_SIZE = const(4)
+METRICS_SIZE = const(METRICS_HEADER_SIZE + 4 * (METRICS_COUNTERS + METRICS_PULSE_BUCKETS + METRICS_LATENCY_BUCKETS))
+
+# Names of the counters in the one-line snapshot, in slot order
+METRICS_NAMES = ('tx_wire_bytes', 'tx_bytes', 'tx_frames', 'tx_bps', 'rx_bits', 'rx_bytes', 'rx_frames_ok',
+                 'rx_frames_bad', 'rx_bps', 'fec_fixed', 'fec_failed', 'rx_overflows', 'schedule_overflows',
+                 'rx_invalid', 'truncated', 'gc_count', 'gc_us', 'irq_off_us', 'irq_off_max_us', 'amsat_in',
+                 'amsat_out', 'pulse_bucket_us', 'boot_ms', 'tx_aborted')
+
+assert len(METRICS_NAMES) == METRICS_COUNTERS
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        Fixed-size telemetry counters and histograms, shared by the laser, the buffers and the top-level
+        controller. Counters wrap around at 2^32
+        """
+        self.counters = array.array('I', (0 for _ in range(METRICS_COUNTERS)))
+        self.pulse_hist = array.array('I', (0 for _ in range(METRICS_PULSE_BUCKETS)))
+        self.latency_hist = array.array('I', (0 for _ in range(METRICS_LATENCY_BUCKETS)))
+        self.counters[M_PULSE_BUCKET_US] = 1
+
+    def reset(self) -> None:
+        """
+        Zero every counter and histogram, keeping the pulse histogram's bucket width
+        """
+        bucket_us = self.counters[M_PULSE_BUCKET_US]
+        for table in (self.counters, self.pulse_hist, self.latency_hist):
+            for idx in range(len(table)):
+                table[idx] = 0
+        self.counters[M_PULSE_BUCKET_US] = bucket_us
+
+    def add(self, slot: int, count: int=1) -> None:
+        self.counters[slot] = (self.counters[slot] + count) & 0xFFFFFFFF
+
+    def set_pulse_range(self, max_width_us: int) -> None:
+        """
+        Spread the pulse histogram over widths up to max_width_us, clearing it
+        """
+        self.counters[M_PULSE_BUCKET_US] = max(max_width_us // METRICS_PULSE_BUCKETS, 1)
+        for idx in range(METRICS_PULSE_BUCKETS):
+            self.pulse_hist[idx] = 0
+
+    def pulse(self, width_us: int) -> None:
+        self.pulse_hist[min(width_us // self.counters[M_PULSE_BUCKET_US], METRICS_PULSE_BUCKETS - 1)] += 1
+
+    def latency(self, latency_us: int) -> None:
+        bucket = 0
+        while latency_us and bucket < METRICS_LATENCY_BUCKETS - 1:
+            latency_us >>= 1
+            bucket += 1
+        self.latency_hist[bucket] += 1
+
+    def irq_off(self, elapsed_us: int) -> None:
+        self.add(M_IRQ_OFF_US, elapsed_us)
+        if elapsed_us > self.counters[M_IRQ_OFF_MAX_US]:
+            self.counters[M_IRQ_OFF_MAX_US] = elapsed_us
+
+    def transfer(self, slot: int, nbytes: int, elapsed_ms: int) -> None:
+        """
+        Record the throughput of a transmission (M_TX_LAST_BPS) or a reception (M_RX_LAST_BPS)
+        """
+        if elapsed_ms > 0:
+            self.counters[slot] = 8000 * nbytes // elapsed_ms
+
+    def collect(self) -> None:
+        """
+        gc.collect(), timed
+        """
+        start = ticks_us()
+        gc.collect()
+        self.add(M_GC_US, ticks_diff(ticks_us(), start))
+        self.add(M_GC_COUNT)
+
+    def dump_into(self, buf: bytearray) -> int:
+        """
+        Write the binary snapshot, e.g. for an I2C read
+
+        Args:
+            buf (bytearray): Output buffer of at least METRICS_SIZE bytes
+
+        Returns:
+            int: Number of bytes written
+        """
+        buf[0] = METRICS_VERSION
+        buf[1] = METRICS_COUNTERS
+        buf[2] = METRICS_PULSE_BUCKETS
+        buf[3] = METRICS_LATENCY_BUCKETS
+        idx = METRICS_HEADER_SIZE
+        for table in (self.counters, self.pulse_hist, self.latency_hist):
+            for value in table:
+                buf[idx] = value & 0xFF
+                buf[idx + 1] = (value >> 8) & 0xFF
+                buf[idx + 2] = (value >> 16) & 0xFF
+                buf[idx + 3] = value >> 24
+                idx += 4
+        return idx
+
+    def snapshot(self) -> str:
+        """
+        Returns:
+            str: Every counter and both histograms on one line, for the REPL or a log
+        """
+        fields = ' '.join(f"{name}={value}" for name, value in zip(METRICS_NAMES, self.counters))
+        return f"{fields} pulse_hist={','.join(str(n) for n in self.pulse_hist)} "\
+               f"latency_hist={','.join(str(n) for n in self.latency_hist)}"
@@ -0,0 +1,188 @@
+from micropython import const
+import array
+
+from framing import FRAME_HEAD_SIZE, FRAME_MAX_PAYLOAD, FRAME_CRC_SIZE
+
+# Multi-bit-per-symbol modulation modes
+# machine.bitstream() can only send two pulse shapes, so these modes are built from chips: every bit of
+#   a chip buffer is one chip period T, lit or dark, sent with the timing (0, T, T, 0). T is the shortest
+#   pulse the link handles, i.e. the high time of a 0 in the binary PWM timing, which link training tunes.
+#   The zero-length high and low times only produce a glitch of a few CPU cycles, far too short for the
+#   detector to see, so consecutive lit chips form one pulse.
+# The modes themselves are in chipmodes.py, this is the chip buffer layout they share
+# A chip buffer goes out in slices with interrupts back on in between (see set_slice()). The pause between two
+#   slices lengthens whatever dark run it falls in, which PulsePosition4 and Manchester read symbols from, so
+#   every slice ends with the stop marker and dark chips and the next starts over with the start marker, the
+#   same idle the receiver sees between two buffers
+#
+# Largest buffer a modulation is asked to send at once, a whole frame
+MOD_MAX_BYTES = const(FRAME_HEAD_SIZE + FRAME_MAX_PAYLOAD + FRAME_CRC_SIZE)
+
+
+class _ChipWriter:
+    """
+    Packs chip runs MSB first into a fixed chip buffer
+    """
+    def __init__(self, size_bytes: int) -> None:
+        self.size = size_bytes
+        self.buf = bytearray(size_bytes)
+        self.out = self.buf
+        self.idx = 0
+        self.acc = 0
+        self.bits = 0
+
+    def reset(self, out: bytearray=None) -> None:
+        # Write into out instead of the writer's own buffer, e.g. a transmit pipeline slot
+        self.out = self.buf if out is None else out
+        self.idx = 0
+        self.acc = 0
+        self.bits = 0
+
+    def put(self, value: int, nbits: int) -> None:
+        acc = (self.acc << nbits) | value
+        bits = self.bits + nbits
+        while bits >= 8:
+            bits -= 8
+            self.out[self.idx] = acc >> bits
+            self.idx += 1
+            acc &= (1 << bits) - 1
+        self.acc = acc
+        self.bits = bits
+
+    def chips(self) -> int:
+        return 8 * self.idx + self.bits
+
+    def pad(self, chips: int) -> None:
+        # Dark chips up to chips, a whole number of bytes
+        if self.bits:
+            self.put(0, 8 - self.bits)
+        end = chips >> 3
+        while self.idx < end:
+            self.out[self.idx] = 0
+            self.idx += 1
+
+    def flush(self) -> memoryview:
+        # Trailing dark chips just lengthen the gap after the last pulse
+        if self.bits:
+            self.put(0, 8 - self.bits)
+        return memoryview(self.out)[:self.idx]
+
+
+class Modulation:
+    # Chips needed for one byte at most, for the start and stop markers of a buffer, and for the stop marker alone
+    MAX_CHIPS_PER_BYTE = 8
+    MARKER_CHIPS = 0
+    STOP_CHIPS = 0
+
+    def __init__(self, max_bytes: int=MOD_MAX_BYTES) -> None:
+        """
+        Base class of the chip-based modulations. A subclass sets the class constants above and provides:
+            _byte_chips(byte) -> tuple: (chips, count) of one byte value, MSB first, called here for every
+                byte value to fill the chip tables
+            demodulate(width, gap, push_bit) -> bool: Classifies one received pulse, width and the gap since
+                the previous pulse in us (gap 0 for the first pulse of a reception), into symbol slots with
+                _slots() and calls push_bit() with every bit it carries. False if the pulse does not fit
+        and overrides _start() and _stop() if its buffers need start and stop markers
+
+        Args:
+            max_bytes (int, optional): Largest buffer modulate() is given. Defaults to MOD_MAX_BYTES.
+        """
+        self.max_bytes = max_bytes
+        # Size in bytes of the chip buffer modulate() needs
+        self.chip_buffer_size = (max_bytes * self.MAX_CHIPS_PER_BYTE + self.MARKER_CHIPS + 7) // 8
+        self._writer = _ChipWriter(self.chip_buffer_size)
+        self.slice_bytes = 0
+        # Chips of every byte value and their count, MSB first
+        self._chips = array.array('I', (0 for _ in range(256)))
+        self._nchips = bytearray(256)
+        for byte in range(256):
+            self._chips[byte], self._nchips[byte] = self._byte_chips(byte)
+        self.unit = 1
+
+    def _start(self, writer: _ChipWriter) -> None:
+        pass
+
+    def _stop(self, writer: _ChipWriter) -> None:
+        pass
+
+    def set_slice(self, slice_bytes: int) -> None:
+        """
+        Lay chip buffers out in slices of slice_bytes bytes, each sent with interrupts disabled. A slice holds
+        as many whole bytes as fit between the start and the stop marker, and is padded with dark chips to
+        its end. Grows the chip buffer if slices need more room than the buffer has, so make any transmit
+        pipeline after this
+
+        Args:
+            slice_bytes (int): Chip buffer bytes per slice, at least enough for one byte between the markers.
+                0 sends a chip buffer in one piece
+        """
+        if slice_bytes:
+            min_bytes = (self.MARKER_CHIPS + self.MAX_CHIPS_PER_BYTE + 7) // 8
+            if slice_bytes < min_bytes:
+                raise ValueError(f"Slice of {slice_bytes} bytes too short, {type(self).__name__} needs {min_bytes}")
+            per_slice = (8 * slice_bytes - self.MARKER_CHIPS) // self.MAX_CHIPS_PER_BYTE
+            size = (self.max_bytes + per_slice - 1) // per_slice * slice_bytes
+            if size > self.chip_buffer_size:
+                self.chip_buffer_size = size
+                self._writer = _ChipWriter(size)
+        self.slice_bytes = slice_bytes
+
+    def modulate(self, segments, out: bytearray=None) -> memoryview:
+        """
+        Turn the bytes of one or more buffers into a single chip buffer, laid out in slices (see set_slice())
+
+        Args:
+            segments (iterable): Buffers to send back to back
+            out (bytearray, optional): Chip buffer of at least chip_buffer_size bytes to write into.
+                Defaults to None, the modulation's own buffer.
+
+        Returns:
+            memoryview: The chips to send with the timing from chip_timing()
+        """
+        writer = self._writer
+        writer.reset(out)
+        self._start(writer)
+        chips = self._chips
+        nchips = self._nchips
+        slice_chips = 8 * self.slice_bytes
+        if not slice_chips:
+            for segment in segments:
+                for byte in segment:
+                    writer.put(chips[byte], nchips[byte])
+            self._stop(writer)
+            return writer.flush()
+        slice_end = slice_chips
+        # Room kept for the stop marker at the end of every slice
+        reserve = self.STOP_CHIPS
+        for segment in segments:
+            for byte in segment:
+                count = nchips[byte]
+                if writer.chips() + count + reserve > slice_end:
+                    self._stop(writer)
+                    writer.pad(slice_end)
+                    slice_end += slice_chips
+                    self._start(writer)
+                writer.put(chips[byte], count)
+        self._stop(writer)
+        return writer.flush()
+
+    def reset(self, unit_us: int) -> None:
+        """
+        Get ready for a new reception
+
+        Args:
+            unit_us (int): Chip period T as seen at the detector, in us
+        """
+        self.unit = max(unit_us, 1)
+
+    def _slots(self, duration: int) -> int:
+        # Nearest whole number of chip periods
+        return (duration + (self.unit >> 1)) // self.unit
+
+
+def chip_timing(chip_ns: int) -> tuple:
+    """
+    Returns:
+        tuple: machine.bitstream() timing that sends each bit of a chip buffer as one chip period, lit for a 1
+    """
+    return (0, chip_ns, chip_ns, 0)
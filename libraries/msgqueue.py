@@ -0,0 +1,182 @@
+from micropython import const
+import array
+
+from arena import MemoryArena
+from membuffer import MemoryBuffer
+from metrics import M_BUFFER_TRUNCATED
+
+# Message queues of the inbox and outbox, see Linda.set_queueing()
+#
+# Most messages a QueueBuffer holds at once
+QUEUE_SLOTS = const(32)
+
+
+class QueueBuffer(MemoryBuffer):
+    def __init__(self, size_bytes, arena: MemoryArena=None) -> None:
+        """
+        Message buffer that can also hold a queue of messages (see set_queueing()), packed back to back in
+        its memory in arrival order, wrapping around to the start once they reach the end. Every message
+        stays in one piece, so it is handed out as a memoryview without a copy. A compact index of slots,
+        oldest first, holds the offset, length and priority of each. Taking a message out only marks its
+        slot free, and its memory is reused once every older message is gone too, so nothing is ever moved
+
+        Without queueing the buffer holds the one message of MemoryBuffer. With it, that message is the
+        window the next message is written into, the largest free stretch of memory, which commit() adds
+        to the queue
+
+        Args:
+            size_bytes (int): Size of the buffer
+            arena (MemoryArena, optional): Arena to carve the memory from. Defaults to None.
+        """
+        super().__init__(size_bytes, arena)
+        self._mem = self._data
+        self.queueing = False
+        self._offsets = array.array('I', (0 for _ in range(QUEUE_SLOTS)))
+        self._lengths = array.array('I', (0 for _ in range(QUEUE_SLOTS)))
+        self._priorities = bytearray(QUEUE_SLOTS)
+        # 1 for the slots of messages still in the queue
+        self._pending = bytearray(QUEUE_SLOTS)
+        # Oldest slot, and slots from there on holding memory, taken messages not yet reclaimed included
+        self._first = 0
+        self._slots = 0
+        self._queued = 0
+        self._window = 0
+
+    def set_queueing(self, enabled: bool) -> None:
+        """
+        Turn the message queue on or off, emptying the buffer
+        """
+        self.queueing = enabled
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Empty the buffer, queued messages included
+        """
+        self._first = 0
+        self._slots = 0
+        self._queued = 0
+        for slot in range(QUEUE_SLOTS):
+            self._pending[slot] = 0
+        self._data = self._mem
+        self._window = 0
+        self._data_len = 0
+        if self.queueing:
+            self._open_window()
+
+    def queued(self) -> int:
+        """
+        Returns:
+            int: Number of messages in the queue
+        """
+        return self._queued
+
+    def _free_region(self) -> tuple:
+        """
+        Returns:
+            tuple: (start, end) of the free memory a new message goes into, the larger of the two stretches
+                after the newest message and before the oldest until the memory wraps around, and the one
+                between them after
+        """
+        if self._slots == 0:
+            return 0, len(self._mem)
+        if self._slots == QUEUE_SLOTS:
+            return 0, 0
+        oldest = self._first
+        newest = (self._first + self._slots - 1) % QUEUE_SLOTS
+        head = self._offsets[newest] + self._lengths[newest]
+        tail = self._offsets[oldest]
+        if self._offsets[newest] < tail:
+            return head, tail
+        if len(self._mem) - head >= tail:
+            return head, len(self._mem)
+        return 0, tail
+
+    def _open_window(self) -> None:
+        start, end = self._free_region()
+        self._window = start
+        self._data = self._mem[start:end]
+        self._data_len = 0
+
+    def _add(self, offset: int, length: int, priority: int) -> None:
+        slot = (self._first + self._slots) % QUEUE_SLOTS
+        self._offsets[slot] = offset
+        self._lengths[slot] = length
+        self._priorities[slot] = priority
+        self._pending[slot] = 1
+        self._slots += 1
+        self._queued += 1
+
+    def fits(self, length: int) -> bool:
+        """
+        Returns:
+            bool: True if a message of length bytes can be queued now. Sending the queued messages frees
+                room, up to the size of the whole buffer
+        """
+        return self.queueing and 0 < length <= len(self._data) and self._slots < QUEUE_SLOTS
+
+    def enqueue(self, src, priority: int=0) -> bool:
+        """
+        Copy a message into the queue, replacing whatever was written into the window
+
+        Args:
+            src (_buffer_): Any buffer-protocol object
+            priority (int, optional): 0-255, higher priority messages are taken out first. Defaults to 0.
+
+        Returns:
+            bool: False without queueing, or if there isn't room for it, in memory or in the index
+        """
+        if not self.fits(len(src)):
+            if self.metrics is not None:
+                self.metrics.add(M_BUFFER_TRUNCATED, len(src))
+            return False
+        self.write(src)
+        return self.commit(priority)
+
+    def commit(self, priority: int=0) -> bool:
+        """
+        Add the message written into the window to the queue, and open a new window after it
+
+        Returns:
+            bool: False if there is no message in the window, or no free slot in the index
+        """
+        if self._data_len == 0 or self._slots == QUEUE_SLOTS:
+            return False
+        self._add(self._window, self._data_len, priority)
+        self._open_window()
+        return True
+
+    def peek(self) -> int:
+        """
+        Returns:
+            int: Slot of the next message out of the queue, the oldest of the highest priority, -1 if the
+                queue is empty
+        """
+        best = -1
+        for idx in range(self._slots):
+            slot = (self._first + idx) % QUEUE_SLOTS
+            if self._pending[slot] and (best < 0 or self._priorities[slot] > self._priorities[best]):
+                best = slot
+        return best
+
+    def message(self, slot: int) -> memoryview:
+        """
+        Zero-copy view of a queued message, valid until the message is popped
+        """
+        offset = self._offsets[slot]
+        return self._mem[offset:offset + self._lengths[slot]]
+
+    def pop(self, slot: int) -> None:
+        """
+        Take a message out of the queue, reclaiming the memory of every message older than the oldest one
+        left
+        """
+        if not self._pending[slot]:
+            return
+        self._pending[slot] = 0
+        self._queued -= 1
+        while self._slots and not self._pending[self._first]:
+            self._first = (self._first + 1) % QUEUE_SLOTS
+            self._slots -= 1
+        if self.queueing and self._data_len == 0:
+            self._open_window()
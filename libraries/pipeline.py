@@ -0,0 +1,142 @@
+import array
+import uasyncio as asyncio
+
+from framing import FrameWriter, FRAME_HEAD_SIZE, FRAME_CRC_SIZE, FRAME_MAX_PAYLOAD
+from laser import LindaLaser
+from txframe import TX_SLICE_BYTES
+from metrics import M_TX_FRAMES
+from arena import MemoryArena, arena_buffer
+from pipeprod import FrameProducer, TX_PIPELINE_SLOTS
+
+
+class TxPipeline(FrameProducer):
+    def __init__(self, laser: LindaLaser, encode=None, chunk_size: int=FRAME_MAX_PAYLOAD,
+                 arena: MemoryArena=None) -> None:
+        """
+        Streaming double-buffered transmit. Core 1 prepares frame N+1 (encoding, framing, CRC and
+        modulation) into one ping-pong buffer while core 0 clocks frame N out of the other, so the first
+        pulse goes out after one frame's worth of preparation whatever the message size, and the cost
+        of encoding hides behind the transmission. Without _thread the frames are prepared inline
+
+        The buffers are sized for the laser's modulation at construction, so make a new pipeline after
+        LindaLaser.set_modulation(). The laser's compressor and FEC setting are used as they are at transmit time
+
+        Args:
+            laser (LindaLaser): The laser to transmit with
+            encode (function, optional): encode(data_mv, out) -> int, writes the encoded form of a chunk into out
+                and returns its length, e.g. encoding.hamming_encode_into. Defaults to None, sending the data as is.
+            chunk_size (int, optional): Message bytes per frame, or compressed bytes per frame with compression,
+                the encoded chunk must fit in FRAME_MAX_PAYLOAD, or FEC_MAX_DATA with FEC. Defaults to FRAME_MAX_PAYLOAD.
+            arena (MemoryArena, optional): Arena to carve the buffers from. Regions are never given back, so the
+                arena has to allow for every pipeline made from it. Defaults to None, allocating them on the heap.
+        """
+        self.laser = laser
+        self.encode = encode
+        self.chunk_size = chunk_size
+        self.modulation = laser.modulation
+        self.writer = FrameWriter()
+        self._head_mv = memoryview(self.writer.head)
+        self._tail_mv = memoryview(self.writer.tail)
+        self._encoded = arena_buffer(arena, FRAME_MAX_PAYLOAD if encode is not None else 0)
+        self._encoded_mv = memoryview(self._encoded)
+        self._packed = arena_buffer(arena, chunk_size)
+        self._packed_mv = memoryview(self._packed)
+        self._coded = arena_buffer(arena, FRAME_MAX_PAYLOAD)
+        self._coded_mv = memoryview(self._coded)
+        slot_size = FRAME_HEAD_SIZE + FRAME_MAX_PAYLOAD + FRAME_CRC_SIZE
+        if self.modulation is not None:
+            slot_size = self.modulation.chip_buffer_size
+        self._slots = [arena_buffer(arena, slot_size) for _ in range(TX_PIPELINE_SLOTS)]
+        self._slot_mvs = [memoryview(slot) for slot in self._slots]
+        # Handshake between the cores, each flag is only ever set by one side and cleared by the other
+        self._ready = bytearray(TX_PIPELINE_SLOTS)
+        self._last = bytearray(TX_PIPELINE_SLOTS)
+        self._lengths = array.array('H', (0 for _ in range(TX_PIPELINE_SLOTS)))
+        self._producing = False
+
+    def _segments(self, wire_mv: memoryview):
+        # Binary PWM goes out like LindaLaser._tx_frame(), the head and then TX_SLICE_BYTES slices of the payload,
+        #   which LindaLaser._transmit_segment() cuts into IRQ-off slices. A modulated frame is one chip buffer,
+        #   which it sends in the slices the modulation laid it out in
+        if self.modulation is not None:
+            yield wire_mv
+            return
+        yield wire_mv[0:FRAME_HEAD_SIZE]
+        for idx in range(FRAME_HEAD_SIZE, len(wire_mv), TX_SLICE_BYTES):
+            yield wire_mv[idx : idx+TX_SLICE_BYTES]
+
+    def transmit(self, data_mv: memoryview, flags: int=0) -> bool:
+        """
+        Transmit a buffer as a sequence of frames through the pipeline
+
+        Args:
+            data_mv (memoryview): The message to send
+            flags (int, optional): Extra FRAME_FLAG_* bits set on every frame. Defaults to 0.
+
+        Returns:
+            bool: False if LindaLaser.abort_tx() stopped it before the last frame
+        """
+        data_mv = memoryview(data_mv)
+        # Without core 1, each frame is prepared just before it is sent
+        chunks = None if self._start(data_mv, flags) else self._chunks(data_mv, flags)
+        slot = 0
+        # With compression the frame count is only known once the last frame has been prepared
+        last = len(data_mv) == 0
+        while not last:
+            if chunks is not None:
+                self._prepare(slot, *next(chunks))
+            while not self._ready[slot] and not self.laser._tx_abort:
+                pass
+            if self.laser._tx_abort:
+                break
+            for segment_mv in self._segments(self._slot_mvs[slot][:self._lengths[slot]]):
+                self.laser._transmit_segment(segment_mv)
+            # Counted here on core 0, the metrics aren't safe to update from core 1
+            self.laser.metrics.add(M_TX_FRAMES)
+            last = self._last[slot]
+            self._ready[slot] = 0
+            slot = (slot + 1) % TX_PIPELINE_SLOTS
+        self.laser.laser.off()
+        # Leave core 1 free for the next message
+        while self._producing:
+            pass
+        self.laser.metrics.collect()
+        return last
+
+    async def transmit_async(self, data_mv: memoryview, flags: int=0) -> bool:
+        """
+        Cooperative version of transmit(), yielding to the other asyncio tasks between slices and
+        while waiting for core 1
+
+        Args:
+            data_mv (memoryview): The message to send
+            flags (int, optional): Extra FRAME_FLAG_* bits set on every frame. Defaults to 0.
+
+        Returns:
+            bool: False if LindaLaser.abort_tx() stopped it before the last frame
+        """
+        data_mv = memoryview(data_mv)
+        # Without core 1, each frame is prepared just before it is sent
+        chunks = None if self._start(data_mv, flags) else self._chunks(data_mv, flags)
+        slot = 0
+        # With compression the frame count is only known once the last frame has been prepared
+        last = len(data_mv) == 0
+        while not last:
+            if chunks is not None:
+                self._prepare(slot, *next(chunks))
+            while not self._ready[slot] and not self.laser._tx_abort:
+                await asyncio.sleep_ms(0)
+            if self.laser._tx_abort:
+                break
+            for segment_mv in self._segments(self._slot_mvs[slot][:self._lengths[slot]]):
+                self.laser._transmit_segment(segment_mv)
+                await asyncio.sleep_ms(0)
+            # Counted here on core 0, the metrics aren't safe to update from core 1
+            self.laser.metrics.add(M_TX_FRAMES)
+            last = self._last[slot]
+            self._ready[slot] = 0
+            slot = (slot + 1) % TX_PIPELINE_SLOTS
+        self.laser.laser.off()
+        while self._producing:
+            await asyncio.sleep_ms(0)
+        return last
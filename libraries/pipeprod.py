@@ -0,0 +1,94 @@
+from micropython import const
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+from framing import FRAME_HEAD_SIZE, FRAME_CRC_SIZE, FRAME_FLAG_LAST, FRAME_FLAG_COMPRESSED, FRAME_FLAG_FEC, \
+    FRAME_CONTROL_FLAGS
+from fec import FEC_MAX_DATA
+
+# Producer side of the transmit pipeline (see pipeline.py), run on core 1 when _thread is available. Frames
+#   are prepared into the ping-pong slots in turn, each as soon as core 0 has sent what the slot held
+#
+# Number of ping-pong buffers between the preparing and the transmitting core
+TX_PIPELINE_SLOTS = const(2)
+
+
+class FrameProducer:
+    def _prepare(self, slot: int, chunk_mv: memoryview, flags: int) -> None:
+        """
+        Build the complete on-wire image of one frame in a slot
+        """
+        payload_mv = chunk_mv
+        if self.encode is not None:
+            payload_mv = self._encoded_mv[:self.encode(chunk_mv, self._encoded)]
+        fec = self.laser._tx_fec(flags)
+        if fec is not None:
+            payload_mv = self._coded_mv[:fec.encode_into(payload_mv, self._coded)]
+            flags |= FRAME_FLAG_FEC
+        self.writer.prepare(payload_mv, flags)
+        out = self._slots[slot]
+        if self.modulation is not None:
+            length = len(self.modulation.modulate((self._head_mv, payload_mv, self._tail_mv), out))
+        else:
+            end = FRAME_HEAD_SIZE + len(payload_mv)
+            out[0:FRAME_HEAD_SIZE] = self.writer.head
+            out[FRAME_HEAD_SIZE:end] = payload_mv
+            out[end:end + FRAME_CRC_SIZE] = self.writer.tail
+            length = end + FRAME_CRC_SIZE
+        self._lengths[slot] = length
+        self._last[slot] = flags & FRAME_FLAG_LAST
+        self._ready[slot] = 1
+
+    def _chunks(self, data_mv: memoryview, flags: int):
+        # Yields the message chunk, or compressed block, and header flags of every frame
+        self.writer.seq = 0
+        # Control frames always go out as they are
+        compressor = None if flags & FRAME_CONTROL_FLAGS else self.laser.compressor
+        if compressor is not None:
+            compressor.reset_stats()
+            flags |= FRAME_FLAG_COMPRESSED
+        room = self.chunk_size if self.laser._tx_fec(flags) is None else min(self.chunk_size, FEC_MAX_DATA)
+        msg_len = len(data_mv)
+        start = 0
+        while start < msg_len:
+            if compressor is not None:
+                consumed, length = compressor.compress(data_mv, start, self._packed_mv[:room])
+                end = start + consumed
+                chunk_mv = self._packed_mv[:length]
+            else:
+                end = min(start + room, msg_len)
+                chunk_mv = data_mv[start:end]
+            yield chunk_mv, flags | (FRAME_FLAG_LAST if end == msg_len else 0)
+            start = end
+
+    def _produce(self, data_mv: memoryview, flags: int) -> None:
+        """
+        Producer side, fills the slots in turn as the transmitting side frees them
+        """
+        laser = self.laser
+        slot = 0
+        for chunk_mv, frame_flags in self._chunks(data_mv, flags):
+            while self._ready[slot] and not laser._tx_abort:
+                pass
+            if laser._tx_abort:
+                break
+            self._prepare(slot, chunk_mv, frame_flags)
+            slot = (slot + 1) % TX_PIPELINE_SLOTS
+        self._producing = False
+
+    def _start(self, data_mv: memoryview, flags: int) -> bool:
+        for idx in range(TX_PIPELINE_SLOTS):
+            self._ready[idx] = 0
+        if _thread is None:
+            return False
+        self._producing = True
+        try:
+            _thread.start_new_thread(self._produce, (data_mv, flags))
+        except OSError:
+            # Core 1 is busy
+            self._producing = False
+            return False
+        return True
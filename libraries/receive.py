@@ -0,0 +1,191 @@
+from utime import ticks_ms, ticks_diff
+from micropython import const
+import logging
+import uasyncio as asyncio
+
+from huffman import literal_code
+from rxedge import RX_MODE_EDGE
+from metrics import M_RX_BITS, M_RX_BYTES, M_RX_FRAMES_OK, M_RX_FRAMES_BAD, M_RX_LAST_BPS, M_CODE_CORRECTED, \
+    M_CODE_UNCORRECTED, M_RX_OVERFLOWS, M_RX_INVALID
+from trace import TRACE_INFO, TR_RX_FRAMES, TR_RX_INCOMPLETE, TR_RX_ERRORS, TR_RX_PULSES, TR_RX_SPREAD, TR_RX_FEC, \
+    TR_RX_DECOMPRESSED, TR_RX_DONE, TR_RX_NONE
+
+log = logging.getLogger('laserlinda')
+
+# Receptions of the laser link
+# A reception starts from a clean slate (see _reset_edge_rx()) and, in RX_MODE_EDGE, drains the capture ring
+#   (rxedge.py) until the last frame of a message arrives or the link has been quiet for the timeout. What it
+#   got is then added to the metrics and traced
+#
+# How often the async receive loop drains the capture ring, the ring must cover this many ms of edges
+RX_POLL_MS = const(20)
+
+
+class Receiver:
+    def start_rx(self, timeout: int=5):
+        """
+        Receives laser detector input as data and writes it to the inbox memory buffer.
+        In RX_MODE_EDGE, reception finishes as soon as the last frame of a message arrives, or after
+        the link has been quiet for the timeout. RX_MODE_PULSE always listens for the whole timeout
+    
+        Args:
+            timeout (int, optional): Time to wait without any incoming pulses, in seconds. Defaults to 5.
+        """
+        if self.rx_mode == RX_MODE_EDGE:
+            self._start_rx_edges(timeout)
+            return
+        self._start_rx_pulses(timeout)
+
+    def _start_rx_edges(self, timeout: int) -> None:
+        """
+        RX_MODE_EDGE receive loop. The detector IRQ fills the capture ring while this loop drains it
+        into the inbox, so the ring only has to cover the edges arriving between two drains
+
+        Args:
+            timeout (int): Time to wait without any incoming pulses, in seconds
+        """
+        self._begin_edge_rx()
+        while self._edge_rx_active(timeout):
+            self._drain_edges()
+        self._end_edge_rx()
+
+    async def start_rx_async(self, timeout: int=5) -> None:
+        """
+        Cooperative version of start_rx() for RX_MODE_EDGE. Drains the capture ring every RX_POLL_MS
+        and sleeps in between, so other asyncio tasks keep running during a long receive
+
+        Args:
+            timeout (int, optional): Time to wait without any incoming pulses, in seconds. Defaults to 5.
+        """
+        if self.rx_mode != RX_MODE_EDGE:
+            self.start_rx(timeout)
+            return
+        self._begin_edge_rx()
+        while self._edge_rx_active(timeout):
+            self._drain_edges()
+            await asyncio.sleep_ms(RX_POLL_MS)
+        self._end_edge_rx()
+
+    async def capture_pulses_async(self, pulse_sink, timeout: int, quiet_ms: int) -> None:
+        """
+        Hand every received pulse to pulse_sink(width_us, gap_us) instead of decoding it, e.g. to measure
+        the pulse-width distributions during link training. Needs RX_MODE_EDGE
+
+        Args:
+            pulse_sink (function): Called with each pulse width and the gap since the previous pulse, in us
+            timeout (int): Time to wait for the first pulse, in seconds
+            quiet_ms (int): Once pulses have arrived, stop after the link has been quiet this long, in ms
+        """
+        if self.rx_mode != RX_MODE_EDGE:
+            log.info("Pulse capture needs RX_MODE_EDGE")
+            return
+        self._begin_edge_rx()
+        self.pulse_sink = pulse_sink
+        seen = False
+        while True:
+            if self._edge_head != self._edge_tail:
+                seen = True
+            self._drain_edges()
+            idle = ticks_diff(ticks_ms(), self._rx_activity)
+            if idle >= (quiet_ms if seen else timeout*1000):
+                break
+            await asyncio.sleep_ms(RX_POLL_MS)
+        self.pulse_sink = None
+        self.rx_flag = False
+        self.metrics.collect()
+
+    def _reset_edge_rx(self) -> None:
+        """
+        Clear the capture ring, pulse decoding state and error counters before a new reception
+        """
+        self._edge_tail = self._edge_head
+        self._have_fall = False
+        self._bit_period = 0
+        self._rx_erasing = False
+        self._rx_byte = 0
+        self.rx_bit_count = 0
+        self.rx_overflows = 0
+        self.rx_invalid = 0
+        self.rx_truncated = 0
+        self.rx_frames_missing = 0
+        self.rx_queued_bytes = 0
+        self._rx_message_missing = 0
+        self.rx_packed_bytes = 0
+        self.rx_unpacked_bytes = 0
+        self.fec.frames_fixed = 0
+        self.fec.frames_failed = 0
+        self._rx_frames_ok = self.frame_decoder.frames_ok
+        self._rx_frames_bad = self.frame_decoder.frames_bad
+        self.rx_done = False
+        self.rx_train_pending = False
+        self.rx_ack_pending = False
+        self.rx_last_block = -1
+        self._rx_seq = 0
+        self._rx_block_floor = self.rx_block_base
+        self._have_rise = False
+        self.classifier.reset(self.dur_0, self.dur_1)
+        if self.modulation is not None:
+            self.modulation.reset(self.dur_0)
+        self.frame_decoder.reset()
+        self.inbox._data_len = 0
+
+    def _begin_edge_rx(self) -> None:
+        self._reset_edge_rx()
+        self._rx_activity = ticks_ms()
+        # Build the literal code now rather than when the first compressed frame arrives
+        literal_code()
+        self.rx_flag = True
+
+    def _edge_rx_active(self, timeout: int) -> bool:
+        return not self.rx_done and ticks_diff(ticks_ms(), self._rx_activity) < timeout*1000
+
+    def _end_edge_rx(self) -> None:
+        self.rx_flag = False
+        self._drain_edges()
+        self.metrics.collect()
+        self._record_rx()
+        trace = self.trace
+        if self.framed:
+            trace.emit(TRACE_INFO, TR_RX_FRAMES, self.frame_decoder.frames_ok, self.frame_decoder.frames_bad,
+                       self.rx_frames_missing)
+            if not self.rx_done:
+                trace.emit(TRACE_INFO, TR_RX_INCOMPLETE)
+        if self.rx_overflows or self.rx_invalid or self.rx_truncated:
+            trace.emit(TRACE_INFO, TR_RX_ERRORS, self.rx_overflows, self.rx_invalid, self.rx_truncated)
+        if self.modulation is None and self.classifier.tracking and self.rx_bit_count > 0:
+            self._trace_classifier()
+        if self.fec.frames_fixed:
+            trace.emit(TRACE_INFO, TR_RX_FEC, self.fec.frames_fixed)
+        if self.rx_packed_bytes:
+            trace.emit(TRACE_INFO, TR_RX_DECOMPRESSED, self.rx_packed_bytes, self.rx_unpacked_bytes)
+        if self.rx_bit_count > 0:
+            trace.emit(TRACE_INFO, TR_RX_DONE, len(self.inbox) + self.rx_queued_bytes)
+        else:
+            trace.emit(TRACE_INFO, TR_RX_NONE)
+
+    def _record_rx(self) -> None:
+        """
+        Add the reception that just finished to the metrics
+        """
+        metrics = self.metrics
+        metrics.add(M_RX_BITS, self.rx_bit_count)
+        metrics.add(M_RX_FRAMES_OK, self.frame_decoder.frames_ok - self._rx_frames_ok)
+        metrics.add(M_RX_FRAMES_BAD, self.frame_decoder.frames_bad - self._rx_frames_bad)
+        metrics.add(M_CODE_CORRECTED, self.fec.frames_fixed)
+        metrics.add(M_CODE_UNCORRECTED, self.fec.frames_failed)
+        metrics.add(M_RX_OVERFLOWS, self.rx_overflows)
+        metrics.add(M_RX_INVALID, self.rx_invalid)
+        if not self.serving:
+            rx_bytes = len(self.inbox) + self.rx_queued_bytes
+            metrics.add(M_RX_BYTES, rx_bytes)
+            if self._have_rise:
+                metrics.transfer(M_RX_LAST_BPS, rx_bytes, ticks_diff(self._rise_tick, self._rx_first_tick) // 1000)
+
+    def _trace_classifier(self) -> None:
+        classifier = self.classifier
+        if self.trace.level > TRACE_INFO:
+            return
+        centroid_0, centroid_1 = classifier.centroids()
+        spread_0, spread_1 = classifier.spread()
+        self.trace.emit(TRACE_INFO, TR_RX_PULSES, centroid_0, centroid_1, classifier.threshold())
+        self.trace.emit(TRACE_INFO, TR_RX_SPREAD, round(spread_0), round(spread_1), round(10 * classifier.quality()))
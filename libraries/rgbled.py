@@ -11,8 +11,10 @@ class WS2812:
         Args:
             pin_num (int, optional): The GPIO pin connected to the WS2812 data line. Defaults to 16.
         """
-        self.p = Pin(pin_num, pull=Pin.PULL_DOWN)
-        self.np = neopixel.NeoPixel(self.p, 1) # type: ignore
+        # The pin and driver are set up by the first set_color(), so constructing this costs nothing at boot
+        self.pin_num = pin_num
+        self.p = None
+        self.np = None
         self.brightness = brightness
         self.color_wheel_angle = 0
         self.color_wheel_rad = 0
@@ -21,6 +23,9 @@ class WS2812:
         self.b_wheel = 0
 
     def set_color(self, r, g, b):
+        if self.np is None:
+            self.p = Pin(self.pin_num, pull=Pin.PULL_DOWN)
+            self.np = neopixel.NeoPixel(self.p, 1) # type: ignore
         self.np[0] = (r%self.brightness, g%self.brightness, b%self.brightness) # type: ignore
         self.np.write()
 
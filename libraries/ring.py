@@ -0,0 +1,70 @@
+from membuffer import MemoryBuffer
+
+# Byte ring between the two cores, see LindaLaser.start() in service.py
+
+
+class RingBuffer:
+    def __init__(self, buffer: MemoryBuffer) -> None:
+        """
+        Lock-free single-producer/single-consumer byte ring over the storage of a MemoryBuffer, for passing
+        data between the two cores. Only the producer moves head and only the consumer moves tail, each
+        after its copy is complete, so neither side ever waits on a lock. Data is copied in at most two
+        slices per call, never byte by byte
+
+        Args:
+            buffer (MemoryBuffer): Buffer whose memory the ring takes over
+        """
+        self._data = buffer._data
+        self.size = len(self._data)
+        self.head = 0   # Next index to write, producer side
+        self.tail = 0   # Next index to read, consumer side
+
+    def __len__(self) -> int:
+        return (self.head - self.tail) % self.size
+
+    def free(self) -> int:
+        """
+        Returns:
+            int: Bytes that can be written without overwriting unread data
+        """
+        # One byte always stays empty, so a full ring can be told apart from an empty one
+        return self.size - 1 - len(self)
+
+    def write(self, src) -> int:
+        """
+        Producer side. Copy as much of src into the ring as fits
+
+        Args:
+            src (_buffer_): Data to append
+
+        Returns:
+            int: Number of bytes written
+        """
+        count = min(len(src), self.free())
+        head = self.head
+        first = min(count, self.size - head)
+        self._data[head:head + first] = src[:first]
+        if count > first:
+            self._data[0:count - first] = src[first:count]
+        # Publish only once the data is in place
+        self.head = (head + count) % self.size
+        return count
+
+    def readinto(self, dst) -> int:
+        """
+        Consumer side. Move as much data out of the ring as fits in dst
+
+        Args:
+            dst (_buffer_): Buffer to fill from the start
+
+        Returns:
+            int: Number of bytes read
+        """
+        count = min(len(dst), len(self))
+        tail = self.tail
+        first = min(count, self.size - tail)
+        dst[0:first] = self._data[tail:tail + first]
+        if count > first:
+            dst[first:count] = self._data[0:count - first]
+        self.tail = (tail + count) % self.size
+        return count
@@ -0,0 +1,180 @@
+from machine import Pin
+from micropython import const
+from utime import ticks_ms
+import logging
+import uasyncio as asyncio
+
+from linda import Linda
+from rgbled import WS2812
+from transfers import TransferTasks
+from metrics import M_BOOT_MS
+from iic import I2C_CMD_NONE
+
+log = logging.getLogger('runtimelinda')
+
+# Period of the status LED animation and the alignment indicator
+STATUS_STEP_MS = const(20)
+# After a button press, how long the other button has to join it to start link training
+BUTTON_CHORD_MS = const(100)
+# In dual-core mode, how often data is moved between the AMSAT buffer and the laser service rings
+I2C_POLL_MS = const(50)
+
+# Button press bits, set from the IRQs and consumed by the input task
+_BUTTON_R = const(0x01)
+_BUTTON_B = const(0x02)
+
+
+class LindaRuntime(TransferTasks):
+    def __init__(self, linda: Linda, ws: WS2812, led: Pin, switch: Pin, button_B: Pin, button_R: Pin,
+                 reliable: bool=False, message=None) -> None:
+        """
+        Cooperative uasyncio runtime for LINDA. Transmit, receive, status LED, button handling and the
+        AMSAT I2C service each run as their own task, so a long transfer never starves the others and
+        idle time is spent asleep in the scheduler instead of spinning
+
+        Args:
+            linda (Linda): Top-level LINDA controller
+            ws (WS2812): Status Neopixel
+            led (Pin): Alignment indicator LED
+            switch (Pin): Idle/active toggle switch
+            button_B (Pin): Blue button, starts a receive
+            button_R (Pin): Red button, transmits the outbox, or aborts the transmission in progress. Pressing both
+                buttons together starts link training
+            reliable (bool, optional): Transfer with selective-repeat ARQ, see arq.py. Both ends have to agree.
+                Defaults to False.
+            message (function, optional): Returns the text to send when a transmit finds the outbox empty, so
+                a demo message is only loaded once it is needed. Defaults to None.
+        """
+        self.linda = linda
+        self.laser = linda.laser
+        self.ws = ws
+        self.led = led
+        self.switch = switch
+        self.reliable = reliable
+        self.message = message
+        self.idle = bool(switch.value())
+        self.busy = False
+        # Work requests for the transfer tasks
+        self.tx_request = asyncio.Event()
+        self.rx_request = asyncio.Event()
+        self.train_request = asyncio.Event()
+        # Set from IRQ context, so these have to be ThreadSafeFlags
+        self.input_flag = asyncio.ThreadSafeFlag()
+        self.i2c_flag = asyncio.ThreadSafeFlag()
+        self._pressed = 0
+        button_R.irq(handler=self._irq_button_R, trigger=Pin.IRQ_RISING)
+        button_B.irq(handler=self._irq_button_B, trigger=Pin.IRQ_RISING)
+        switch.irq(handler=self._irq_switch, trigger=(Pin.IRQ_FALLING|Pin.IRQ_RISING))
+
+    def _irq_button_R(self, pin: Pin) -> None:
+        # Stops a transmission in progress at its next slice, even one that doesn't yield to the tasks
+        self.laser.abort_tx()
+        self._pressed |= _BUTTON_R
+        self.input_flag.set()
+
+    def _irq_button_B(self, pin: Pin) -> None:
+        self._pressed |= _BUTTON_B
+        self.input_flag.set()
+
+    def _irq_switch(self, pin: Pin) -> None:
+        self.input_flag.set()
+
+    def _set_busy(self, busy: bool) -> None:
+        self.busy = busy
+        # The AMSAT controller sees the laser state, i2c_task runs the commands left waiting for it
+        if self.linda.i2c is not None:
+            self.linda.update_i2c_status(busy)
+
+    def _apply_idle(self) -> None:
+        """
+        Idle turns the laser on as an alignment aid, active mode keeps it off until a transfer
+        """
+        self.idle = bool(self.switch.value())
+        if self.busy:
+            return
+        if self.idle:
+            self.laser.laser.on()
+        else:
+            self.laser.laser.off()
+            self.led.off()
+
+    async def input_task(self) -> None:
+        """
+        Handle the switch and button IRQs. Red button press requests a transmit, Blue a receive,
+        and both together link training
+        """
+        while True:
+            await self.input_flag.wait()
+            if self._pressed and self._pressed != _BUTTON_R | _BUTTON_B:
+                await asyncio.sleep_ms(BUTTON_CHORD_MS)
+            pressed = self._pressed
+            self._pressed = 0
+            self._apply_idle()
+            if self.idle or not pressed:
+                continue
+            if self.busy:
+                log.info("Transfer in progress, ignoring button press")
+            elif self.laser.serving:
+                log.info("The laser service on core 1 owns the link, ignoring button press")
+            elif pressed == _BUTTON_R | _BUTTON_B:
+                self.train_request.set()
+            elif pressed & _BUTTON_R:
+                self.laser._toggle_tx(True)
+                self.tx_request.set()
+            else:
+                self.laser._toggle_tx(False)
+                self.rx_request.set()
+
+    async def status_task(self) -> None:
+        """
+        Cycle the Neopixel through pretty colors unless a transfer owns it. While idle, the alignment
+        LED lights when the detector sees the laser
+        """
+        while True:
+            if not self.busy:
+                self.ws.rgb_loop_step()
+            if self.idle:
+                self.led.value(not self.laser.detector.value())
+            self.linda.metrics.collect()
+            await asyncio.sleep_ms(STATUS_STEP_MS)
+
+    async def i2c_task(self) -> None:
+        """
+        AMSAT I2C service, woken through i2c_flag to carry out the AMSAT controller's commands. A command that
+        has to wait for the laser is retried every I2C_POLL_MS until it runs. In dual-core mode data streams
+        in continuously, so it polls instead, and without the I2C target it moves data between the AMSAT
+        buffer the host side fills and empties and the laser service rings. Single-core without the I2C
+        target there is nothing to serve. The I2C target itself is only brought up here, once the runtime is
+        ready to receive
+        """
+        i2c = self.linda.start_i2c()
+        if i2c is not None:
+            i2c.event = self.i2c_flag
+        elif not self.laser.serving:
+            return
+        while True:
+            if i2c is not None:
+                self.linda.service_i2c(self.busy)
+            else:
+                self.linda._transfer_amsat_buffer_to_outbox()
+                self.linda._transfer_inbox_to_amsat_buffer()
+            if self.laser.serving or (i2c is not None and i2c.command() != I2C_CMD_NONE):
+                await asyncio.sleep_ms(I2C_POLL_MS)
+            else:
+                await self.i2c_flag.wait()
+
+    async def run(self) -> None:
+        self._apply_idle()
+        # The laser and its detector IRQ are up, everything else comes up in the tasks. ticks_ms() counts
+        #   from reset on the RP2040, so this is the whole boot
+        boot_ms = ticks_ms()
+        self.linda.metrics.counters[M_BOOT_MS] = boot_ms
+        log.info(f"Ready to receive {boot_ms} ms after reset")
+        await asyncio.gather(
+            self.input_task(),
+            self.tx_task(),
+            self.rx_task(),
+            self.train_task(),
+            self.status_task(),
+            self.i2c_task(),
+        )
@@ -0,0 +1,179 @@
+from utime import ticks_us, ticks_ms, ticks_diff
+from micropython import const
+import array
+
+from fec import FEC_SOFT_ERASED
+from txframe import TX_SLICE_BYTES
+
+# Receive side of the laser link, from detector edges to bits
+# The detector IRQ only timestamps both edges into a preallocated ring, which is drained outside of interrupt
+#   context into pulse widths. Binary PWM pulses are classified into soft bits and placed among the bit periods
+#   of an FEC frame payload, the bits that never arrived as pulses taking their place as erasures, while a
+#   modulation from chipmodes.py demodulates the pulses itself. The bits then go to the frame decoder, see
+#   rxframe.py, or straight into the inbox on an unframed link
+#
+# Receive modes
+# RX_MODE_PULSE: legacy, time each pulse with time_pulse_us inside the falling-edge IRQ, see rxpulse.py
+# RX_MODE_EDGE: the IRQ only timestamps both edges into a preallocated ring, bits are derived outside the IRQ
+RX_MODE_PULSE = const(0)
+RX_MODE_EDGE = const(1)
+# Number of edge timestamps the capture ring holds, must be a power of two
+RX_EDGE_RING_SIZE = const(1024)
+RX_EDGE_RING_MASK = const(RX_EDGE_RING_SIZE - 1)
+# Most bits erased between two pulses, a longer silence isn't part of the same frame
+RX_MAX_ERASED_BITS = const(32)
+
+
+class EdgeReceiver:
+    def _init_edge_rx(self) -> None:
+        """
+        Edge capture and pulse decoding half of LindaLaser's receiver
+        """
+        self.rx_flag = False
+        # Edge capture ring, written only by the detector IRQ (head) and drained outside of it (tail)
+        self._edge_ticks = array.array('i', (0 for _ in range(RX_EDGE_RING_SIZE)))
+        self._edge_level = bytearray(RX_EDGE_RING_SIZE)
+        self._edge_head = 0
+        self._edge_tail = 0
+        # Pulse decoding state while draining the ring
+        self._fall_tick = 0
+        self._have_fall = False
+        # Start and bit period of the last pulse decoded as a bit (0 before the first), and whether over-long
+        #   pulses came after it
+        self._bit_tick = 0
+        self._bit_period = 0
+        self._rx_erasing = False
+        self._rx_byte = 0
+        self.rx_bit_count = 0
+        # Receive error counters
+        self.rx_overflows = 0   # Edges dropped because the capture ring was full
+        self.rx_invalid = 0     # Pulses too long to be a bit, e.g. alignment light or a missed edge
+        self.rx_truncated = 0   # Bits dropped because the inbox was full
+        self._rx_activity = 0
+        # When set, every received pulse is handed to pulse_sink(width_us, gap_us) instead of being decoded
+        self.pulse_sink = None
+        self._rise_tick = 0
+        self._have_rise = False
+        self._rx_first_tick = 0
+
+    def _rx_edge(self, pin):
+        """
+        Hard IRQ callback for both detector edges in RX_MODE_EDGE.
+        Only records the edge timestamp and level into the capture ring -- no blocking and no allocation
+
+        Args:
+            pin (Pin): The detector pin that triggered the interrupt
+        """
+        if self.rx_flag:
+            head = self._edge_head
+            next_head = (head + 1) & RX_EDGE_RING_MASK
+            if next_head == self._edge_tail:
+                self.rx_overflows += 1
+                return
+            self._edge_ticks[head] = ticks_us()
+            self._edge_level[head] = pin.value()
+            self._edge_head = next_head
+
+    def _drain_edges(self) -> None:
+        """
+        Turn the edges captured since the last call into pulse widths and bits, packing the bits
+        MSB first straight into the inbox memory. Runs outside of interrupt context
+        """
+        tail = self._edge_tail
+        # Snapshot the head once, the IRQ may keep appending behind us
+        head = self._edge_head
+        if tail != head:
+            # How long the oldest edge waited between its IRQ and being handled here
+            self.metrics.latency(ticks_diff(ticks_us(), self._edge_ticks[tail]))
+        while tail != head:
+            tick = self._edge_ticks[tail]
+            # The detector outputs LOW while it sees the laser, so a pulse runs from a falling to a rising edge
+            if self._edge_level[tail] == 0:
+                self._fall_tick = tick
+                self._have_fall = True
+            elif self._have_fall:
+                self._have_fall = False
+                width = ticks_diff(tick, self._fall_tick)
+                # Gap since the previous pulse, 0 for the first pulse of a reception
+                gap = ticks_diff(self._fall_tick, self._rise_tick) if self._have_rise else 0
+                if not self._have_rise:
+                    self._rx_first_tick = self._fall_tick
+                self.metrics.pulse(width)
+                if self.pulse_sink is not None:
+                    self.pulse_sink(width, gap)
+                elif self.modulation is not None:
+                    if not self.modulation.demodulate(width, gap, self._rx_push):
+                        self.rx_invalid += 1
+                elif width > self.max_pulse_us:
+                    # Stray light merged pulses into this one, the bits it covered are erased below
+                    self.rx_invalid += 1
+                    self._rx_erasing = True
+                elif self._rx_bit_slots():
+                    soft = self.classifier.classify(width)
+                    bit = 1 if soft >= FEC_SOFT_ERASED else 0
+                    self._rx_push_bit(bit, soft)
+                    self._bit_tick = self._fall_tick
+                    self._bit_period = self._periods[bit]
+                else:
+                    self.rx_invalid += 1
+                self._rise_tick = tick
+                self._have_rise = True
+            tail = (tail + 1) & RX_EDGE_RING_MASK
+        if tail != self._edge_tail:
+            self._rx_activity = ticks_ms()
+        self._edge_tail = tail
+
+    def _rx_bit_slots(self) -> bool:
+        """
+        Place the pulse that just ended among the bit periods of an FEC frame payload. Binary PWM starts a
+        pulse every bit period, so the time since the last bit's pulse tells how many bits were lost in
+        between: pulses that vanished, or that stray light merged into an over-long one. Those bits are
+        pushed as erasures, keeping the rest of the frame in place for the FEC decoder, and a pulse too
+        early to start a bit is stray light itself. Transmitters may pause between slices of TX_SLICE_BYTES
+        payload bytes, so a long gap there only counts after an over-long pulse
+
+        Returns:
+            bool: False if the pulse is to be ignored
+        """
+        erasing = self._rx_erasing
+        self._rx_erasing = False
+        bit_idx = self.frame_decoder.fec_bit()
+        if bit_idx < 0 or not self._bit_period:
+            return True
+        elapsed = ticks_diff(self._fall_tick, self._bit_tick)
+        if elapsed < self._bit_period // 2:
+            return False
+        extra = elapsed - self._bit_period
+        if extra < 3 * self._periods[0] // 4 or (bit_idx % (8 * TX_SLICE_BYTES) == 0 and not erasing):
+            return True
+        mean = (self._periods[0] + self._periods[1]) // 2
+        lost = max((extra + mean // 2) // mean, 1)
+        if lost <= RX_MAX_ERASED_BITS:
+            for _ in range(lost):
+                self._rx_push_bit(1, FEC_SOFT_ERASED)
+        return True
+
+    def _rx_push_bit(self, bit: int, soft: int=-1) -> None:
+        """
+        Hand a received bit to the frame decoder, or pack it MSB first straight into the inbox memory
+        on an unframed link
+
+        Args:
+            bit (int): The received bit
+            soft (int, optional): Confidence in the bit for the FEC decoder, from 0 for a sure 0 to
+                FEC_SOFT_MAX for a sure 1. Defaults to -1, a hard decision.
+        """
+        self.rx_bit_count += 1
+        if self.framed:
+            if self.frame_decoder.push_bit(bit, soft):
+                self._rx_frame()
+            return
+        byte_idx = (self.rx_bit_count - 1) >> 3
+        if byte_idx >= len(self.inbox._data):
+            self.rx_truncated += 1
+            return
+        self._rx_byte = (self._rx_byte << 1) | bit
+        if self.rx_bit_count & 7 == 0:
+            self.inbox._data[byte_idx] = self._rx_byte
+            self.inbox._data_len = byte_idx + 1
+            self._rx_byte = 0
@@ -0,0 +1,153 @@
+from micropython import const
+
+from arena import MemoryArena, arena_buffer
+from framing import FRAME_MAX_PAYLOAD, FRAME_FLAG_LAST, FRAME_FLAG_TRAIN, FRAME_FLAG_COMPRESSED, FRAME_FLAG_ACK, \
+    FRAME_FLAG_POLL, FRAME_FLAG_FEC, FRAME_FLAG_MORE
+from compression import COMPRESS_MAX_BLOCK
+from decompress import decompress_block, decompress_frame
+from fec import FEC_MAX_DATA
+from metrics import M_BUFFER_TRUNCATED
+from trace import TRACE_DEBUG, TR_RX_FRAME, TR_RX_GAP
+
+# Receive side of the laser link, from frames to the inbox
+# Every frame the decoder passes (see framing.py) arrives here decoded, FEC and all. Link training frames
+#   (training.py) and reliable transfer acknowledgements (arq.py) are kept out of the inbox, every other payload
+#   is stored at the offset its sequence number gives, or decompressed into place, so a lost frame leaves a gap
+#   rather than shifting the rest of the message. A queueing inbox takes each message of a session as it ends
+#
+# Largest acknowledgement payload kept from a FRAME_FLAG_ACK frame, see arq.py
+RX_ACK_SIZE = const(16)
+# Frame sequence numbers are unwrapped into block numbers at most this far behind the newest block received,
+#   and up to 255 - RX_BLOCK_BEHIND ahead of it
+RX_BLOCK_BEHIND = const(128)
+
+
+class FrameReceiver:
+    def _init_frame_rx(self, arena: MemoryArena=None) -> None:
+        """
+        Frame reassembly half of LindaLaser's receiver
+
+        Args:
+            arena (MemoryArena, optional): Arena to carve the decompression buffer from. Defaults to None.
+        """
+        self._rx_unpacked = arena_buffer(arena, COMPRESS_MAX_BLOCK)
+        self._rx_unpacked_mv = memoryview(self._rx_unpacked)
+        self.rx_packed_bytes = 0    # Compressed payload bytes received, and the message bytes they held
+        self.rx_unpacked_bytes = 0
+        self.rx_done = False
+        self.rx_frames_missing = 0  # Frames skipped in the sequence, i.e. dropped as corrupt or never seen
+        self._rx_seq = 0
+        # With a queueing inbox: bytes of the messages queued this reception, and frames missing before the
+        #   one being received
+        self.rx_queued_bytes = 0
+        self._rx_message_missing = 0
+        # Link training control frames are kept out of the inbox
+        self.rx_train = bytearray(2)
+        self.rx_train_pending = False
+        # Reliable transfers (arq.py): acknowledgements are kept out of the inbox too, sequence numbers are
+        #   unwrapped into block numbers from rx_block_base at the start of a reception, and each stored block
+        #   is marked in the rx_blocks bitmap when it is set. rx_last_block is the block that carried
+        #   FRAME_FLAG_LAST
+        self.rx_ack = bytearray(RX_ACK_SIZE)
+        self.rx_ack_len = 0
+        self.rx_ack_pending = False
+        self.rx_block_base = 0
+        # Lowest block number the next sequence number unwraps to, follows the blocks as they arrive
+        self._rx_block_floor = 0
+        self.rx_blocks = None
+        self.rx_last_block = -1
+
+    def _rx_frame(self) -> None:
+        """
+        Copy the payload of a valid frame into the inbox. Every frame but the last carries FRAME_MAX_PAYLOAD
+        bytes, so the sequence number gives the payload's offset and a dropped frame leaves a gap
+        instead of shifting everything after it. FEC frames arrive decoded, with FEC_MAX_DATA bytes in every
+        frame but the last, and a compressed frame carries its own offset
+        """
+        decoder = self.frame_decoder
+        if decoder.flags & FRAME_FLAG_TRAIN:
+            # Link training control frame, see training.py
+            count = min(decoder.length, len(self.rx_train))
+            self.rx_train[0:count] = decoder.payload_mv[0:count]
+            self.rx_train_pending = True
+            self.rx_done = True
+            return
+        if decoder.flags & FRAME_FLAG_ACK:
+            self.rx_ack_len = min(decoder.length, RX_ACK_SIZE)
+            self.rx_ack[0:self.rx_ack_len] = decoder.payload_mv[0:self.rx_ack_len]
+            self.rx_ack_pending = True
+            self.rx_done = True
+            return
+        self.trace.emit(TRACE_DEBUG, TR_RX_FRAME, decoder.seq, decoder.flags, decoder.length)
+        if decoder.seq == 0 and self._rx_seq != 0 and self.inbox.queueing and not self.serving:
+            # The sender gave up on the message for a more urgent one, which starts over at sequence number 0
+            self.inbox._data_len = 0
+            self._rx_seq = 0
+            self._rx_block_floor = 0
+            self._rx_message_missing = self.rx_frames_missing
+        if decoder.seq != self._rx_seq:
+            self.trace.emit(TRACE_DEBUG, TR_RX_GAP, self._rx_seq, (decoder.seq - 1) & 0xFF)
+            self.rx_frames_missing += (decoder.seq - self._rx_seq) & 0xFF
+        self._rx_seq = (decoder.seq + 1) & 0xFF
+        # Sequence numbers wrap around every 256 frames, block numbers don't
+        block = self._rx_block_floor + ((decoder.seq - self._rx_block_floor) & 0xFF)
+        self._rx_block_floor = max(self._rx_block_floor, block - RX_BLOCK_BEHIND)
+        if decoder.flags & FRAME_FLAG_COMPRESSED:
+            self._rx_compressed_frame()
+        elif self.serving:
+            # Streaming to the other core, which has to keep up or lose the overflow
+            written = self.rx_ring.write(decoder.payload_mv[0:decoder.length])
+            self.rx_truncated += 8 * (decoder.length - written)
+            self.metrics.add(M_BUFFER_TRUNCATED, decoder.length - written)
+        else:
+            frame_data = FEC_MAX_DATA if decoder.flags & FRAME_FLAG_FEC else FRAME_MAX_PAYLOAD
+            written = self.inbox.write_at(block * frame_data, decoder.payload_mv[0:decoder.length])
+            self.rx_truncated += 8 * (decoder.length - written)
+        if self.rx_blocks is not None and block >> 3 < len(self.rx_blocks):
+            self.rx_blocks[block >> 3] |= 0x80 >> (block & 7)
+        if decoder.flags & FRAME_FLAG_LAST:
+            self.rx_last_block = block
+            if self.inbox.queueing and not self.serving:
+                self._rx_message_done()
+                if decoder.flags & FRAME_FLAG_MORE:
+                    return
+        # A poll ends the reception so the sender gets its acknowledgement
+        if decoder.flags & (FRAME_FLAG_LAST | FRAME_FLAG_POLL) and not self.serving:
+            self.rx_done = True
+
+    def _rx_message_done(self) -> None:
+        """
+        Queue the message that just arrived in the inbox, and receive the next one of the session after it
+        """
+        length = len(self.inbox)
+        if self.rx_frames_missing == self._rx_message_missing and self.inbox.commit():
+            self.rx_queued_bytes += length
+        else:
+            # Frames of it are missing, or there is no slot left for it
+            self.metrics.add(M_BUFFER_TRUNCATED, length)
+            self.inbox._data_len = 0
+        # Every message starts over at sequence number 0, and block 0
+        self._rx_seq = 0
+        self._rx_block_floor = 0
+        self._rx_message_missing = self.rx_frames_missing
+
+    def _rx_compressed_frame(self) -> None:
+        """
+        Decompress an LZSS frame payload into its place in the inbox, or into the receive ring when serving
+        """
+        decoder = self.frame_decoder
+        payload_mv = decoder.payload_mv[0:decoder.length]
+        if self.serving:
+            unpacked_mv = self._rx_unpacked_mv
+            count = decompress_block(payload_mv, unpacked_mv)
+            written = self.rx_ring.write(unpacked_mv[0:count])
+            self.rx_truncated += 8 * (count - written)
+            self.metrics.add(M_BUFFER_TRUNCATED, count - written)
+        else:
+            offset, count = decompress_frame(payload_mv, self.inbox._data)
+            if count:
+                self.inbox._data_len = max(self.inbox._data_len, offset + count)
+            else:
+                self.rx_truncated += 8 * decoder.length
+        self.rx_packed_bytes += decoder.length
+        self.rx_unpacked_bytes += count
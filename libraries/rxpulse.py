@@ -0,0 +1,93 @@
+from utime import ticks_us, ticks_diff
+from machine import time_pulse_us
+from micropython import schedule
+import array
+import logging
+
+from fec import FEC_SOFT_ERASED
+from metrics import M_RX_BITS, M_RX_BYTES, M_SCHEDULE_OVERFLOWS
+from trace import TRACE_INFO, TR_RX_DONE, TR_RX_NONE
+
+log = logging.getLogger('laserlinda')
+
+# Legacy RX_MODE_PULSE receive side of the laser link
+# The falling-edge IRQ times each pulse with time_pulse_us and schedules its bit into rx_bits, which are packed
+#   into the inbox once the reception is over. Receptions always last the whole timeout and are never framed
+
+
+class PulseReceiver:
+    def _init_pulse_rx(self) -> None:
+        """
+        RX_MODE_PULSE half of LindaLaser's receiver
+        """
+        self.rx_bits = array.array('i')
+        self.tick_dur = 0
+
+    def _rx_bitstream(self, irq):
+        """
+        Callback function triggered on laser detector interrupt. 
+        If receiving, time the incoming tick and save its duration to the rx_byte array
+
+        Args:
+            irq (irq): Default single-argument of micropython interrupt callbacks
+        """
+        if self.rx_flag:
+            self.tick_dur = time_pulse_us(self.detector, 0, self.max_pulse_us)
+            if self.tick_dur < 0:
+                # time_pulse_us timed out, the pulse was longer than any bit
+                return
+            self.metrics.pulse(self.tick_dur)
+            try:
+                schedule(self.rx_bits.append, 1 if self.classifier.classify(self.tick_dur) >= FEC_SOFT_ERASED else 0)
+            except RuntimeError:
+                self.metrics.add(M_SCHEDULE_OVERFLOWS)
+            # self.rx_bits.append(0 if (abs(self.tick_dur - BITSTREAM_DUR_0) < abs(self.tick_dur - BITSTREAM_DUR_1)) else 1)
+
+    def _start_rx_pulses(self, timeout: int) -> None:
+        """
+        RX_MODE_PULSE reception, listens for the whole timeout and then packs the bits into the inbox
+
+        Args:
+            timeout (int): How long to listen, in seconds
+        """
+        duration = timeout
+        # Sometimes junk data gets in the rx_byte before we start the Rx transaction
+        # If that's true, reset self.rx_bits
+        if len(self.rx_bits) != 0:
+            log.info('Resetting rx_bits')
+            self.rx_bits = array.array('i')
+        # Reset 
+        self.classifier.reset(self.dur_0, self.dur_1)
+        start = ticks_us()
+        self.rx_flag = True
+        while ticks_diff(ticks_us(), start) < (duration*1000000):
+            # Stay in this loop until the Rx transaction has lasted the given duration
+            pass
+        self.rx_flag = False
+        self.metrics.collect()
+        self.metrics.add(M_RX_BITS, len(self.rx_bits))
+        if len(self.rx_bits) > 0:
+            if self.classifier.tracking:
+                self._trace_classifier()
+            self.decom_rx_bits()
+        else:
+            self.trace.emit(TRACE_INFO, TR_RX_NONE)
+
+    def decom_rx_bits(self):
+        """
+        Pack the received array of 1's and 0's MSB first straight into the inbox
+        """
+        rx_bits = self.rx_bits
+        data = self.inbox._data
+        count = min(len(rx_bits) >> 3, len(data))
+        bit_idx = 0
+        for byte_idx in range(count):
+            byte = 0
+            for bit in rx_bits[bit_idx:bit_idx + 8]:
+                byte = (byte << 1) | bit
+            data[byte_idx] = byte
+            bit_idx += 8
+        self.inbox._data_len = count
+        self.metrics.add(M_RX_BYTES, count)
+        self.rx_bits = array.array('i')
+        self.trace.emit(TRACE_INFO, TR_RX_DONE, count)
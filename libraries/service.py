@@ -0,0 +1,64 @@
+from utime import ticks_ms, ticks_diff, sleep_us
+from micropython import const
+import logging
+
+from arena import MemoryArena, arena_buffer
+from framing import FRAME_MAX_PAYLOAD
+from rxedge import RX_MODE_EDGE
+
+log = logging.getLogger('laserlinda')
+
+# Dual-core laser service
+# Run on core 1, the laser receives continuously and sends what core 0 puts in tx_ring whenever the link is
+#   quiet, while core 0 only moves messages between the rings and the buffers (see Linda)
+#
+# Only start transmitting once the detector has been quiet this long (the link is half-duplex), and how long to
+#   sleep when there is nothing to do, short enough that the capture ring can't fill up
+SERVICE_RX_QUIET_MS = const(50)
+SERVICE_IDLE_US = const(500)
+
+
+class LaserService:
+    def _init_service(self, arena: MemoryArena=None) -> None:
+        """
+        Dual-core service state of LindaLaser, the rings to and from the other core (see start())
+        """
+        self.tx_ring = None
+        self.rx_ring = None
+        self.serving = False
+        self._stop_request = False
+        self._tx_chunk = arena_buffer(arena, FRAME_MAX_PAYLOAD)
+
+    def start(self) -> None:
+        """
+        Dual-core laser service, run on core 1 with _thread.start_new_thread() once tx_ring and rx_ring are set.
+        Receives continuously, streaming the payload of every valid frame into rx_ring, and sends whatever
+        the other core puts in tx_ring as frames whenever the link is quiet. Runs until stop()
+        """
+        if self.rx_mode != RX_MODE_EDGE or self.tx_ring is None or self.rx_ring is None:
+            log.info("The laser service needs RX_MODE_EDGE, tx_ring and rx_ring")
+            return
+        # Re-register the detector IRQ from this core
+        self._init_rx_irq()
+        self.serving = True
+        self._begin_edge_rx()
+        tx_mv = memoryview(self._tx_chunk)
+        while not self._stop_request:
+            self._drain_edges()
+            if len(self.tx_ring) and ticks_diff(ticks_ms(), self._rx_activity) >= SERVICE_RX_QUIET_MS:
+                count = self.tx_ring.readinto(tx_mv)
+                # Sequence numbers carry on across chunks, so the receiver can count lost frames
+                for segment_mv in self._tx_segments(tx_mv[:count], 0, self.frame_writer.seq):
+                    self._transmit_segment(segment_mv)
+                self.laser.off()
+            elif self._edge_head == self._edge_tail:
+                sleep_us(SERVICE_IDLE_US)
+        self._end_edge_rx()
+        self._stop_request = False
+        self.serving = False
+
+    def stop(self) -> None:
+        """
+        Ask the dual-core laser service to finish, from the other core
+        """
+        self._stop_request = True
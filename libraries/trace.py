@@ -0,0 +1,136 @@
+from micropython import const
+
+# Binary event trace
+# Diagnostics are recorded as fixed-size binary entries in a preallocated ring instead of formatted log lines,
+#   so an event costs a level check and a few byte stores, never a string, and tracing can stay on while
+#   receiving. The ring (see Trace in tracering.py) keeps the last TRACE_ENTRIES events, and renders them later
+#   on the REPL (see Trace.lines()) or on a host from a dump (see Trace.save() and tools/tracedump.py),
+#   little-endian:
+# | VERSION (1) | ENTRY SIZE (1) | COUNT (2) | ENTRIES (ENTRY SIZE each, oldest first) |
+# Each entry:
+# | TICKS_US (4) | EVENT (1) | LEVEL (1) | SEQ (2) | A (4) | B (4) | C (4) |
+#   SEQ counts every recorded event modulo 2^16, so a dump shows how many were overwritten before it. A, B and
+#   C are the unsigned arguments of the event, rendered through its entry in TRACE_FORMATS
+TRACE_VERSION = const(1)
+TRACE_ENTRY_SIZE = const(20)
+TRACE_HEADER_SIZE = const(4)
+TRACE_ENTRIES = const(64)
+TRACE_FILE = 'linda_trace.bin'
+# Levels, the same numbers as the logging module's
+TRACE_DEBUG = const(10)
+TRACE_INFO = const(20)
+TRACE_WARNING = const(30)
+TRACE_ERROR = const(40)
+# Above every level, records or echoes nothing
+TRACE_OFF = const(100)
+
+# Events
+TR_TX_EMPTY = const(0)
+TR_TX_FRAMES = const(1)
+TR_TX_COMPRESSED = const(2)
+TR_TX_RAW = const(3)
+TR_TX_COMPRESSION = const(4)
+TR_RX_FRAMES = const(5)
+TR_RX_INCOMPLETE = const(6)
+TR_RX_ERRORS = const(7)
+TR_RX_PULSES = const(8)
+TR_RX_SPREAD = const(9)
+TR_RX_FEC = const(10)
+TR_RX_DECOMPRESSED = const(11)
+TR_RX_DONE = const(12)
+TR_RX_NONE = const(13)
+TR_RX_FRAME = const(14)
+TR_RX_GAP = const(15)
+TR_TX_ABORTED = const(16)
+TR_ARQ_START = const(17)
+TR_ARQ_ABORTED = const(18)
+TR_ARQ_FAILED = const(19)
+TR_ARQ_DONE = const(20)
+TR_ARQ_RATE = const(21)
+TR_ARQ_RECEIVED = const(22)
+TR_ARQ_INCOMPLETE = const(23)
+TR_TRAIN_RESULT = const(24)
+TR_TRAIN_BER = const(25)
+TR_TRAIN_PULSES = const(26)
+TR_TRAIN_SPREAD = const(27)
+TR_TRAIN_NO_REPLY = const(28)
+TR_TRAIN_UNUSABLE = const(29)
+TR_TRAIN_DONE = const(30)
+TR_FILE_SEND = const(31)
+TR_FILE_DROPPED = const(32)
+TR_FILE_RECEIVED = const(33)
+TR_FILE_INCOMPLETE = const(34)
+
+# Message of every event, in event order, formatted with (A, B, C)
+TRACE_FORMATS = (
+    "No message to transmit",
+    "Transmitting {0} bytes in {1} frames",
+    "Transmitting {0} bytes compressed",
+    "Transmitting {0} bytes",
+    "Compressed {0} bytes to {1}, {2} bps effective",
+    "Rx frames: {0} good, {1} dropped, {2} missing",
+    "Rx ended before the last frame arrived",
+    "Rx errors: {0} ring overflows, {1} invalid pulses, {2} bits truncated",
+    "Rx pulses: 0 at {0}us, 1 at {1}us, threshold {2}us",
+    "Rx pulse spread: 0 +-{0}us, 1 +-{1}us, quality {2}/10",
+    "FEC recovered {0} frames",
+    "Decompressed {0} bytes to {1}",
+    "Rx successful! {0} bytes received",
+    "No data was received during Rx period",
+    "Rx frame {0}: flags 0x{1:02x}, {2} bytes",
+    "Rx frames {0} to {1} missing",
+    "Transmission of {0} bytes aborted",
+    "Reliable transfer of {0} bytes",
+    "Reliable transfer aborted at block {0}",
+    "Reliable transfer failed, no progress in {0} rounds at block {1}",
+    "Reliable transfer complete: {0} bytes in {1} blocks, {2} resent",
+    "Reliable transfer took {0} rounds, {1} bps goodput",
+    "Reliable transfer received: {0} bytes in {1} blocks",
+    "Reliable transfer incomplete, {0} bytes received up to block {1}",
+    "Training candidate {0}: {1} pulses, {2} bit errors",
+    "Training candidate {0}: estimated BER at most 1e-{1}",
+    "Training candidate {0}: 0 at {1}us, 1 at {2}us",
+    "Training candidate {0}: 0 +-{1}us, 1 +-{2}us",
+    "No training reply, keeping the current timing",
+    "No candidate timing was usable, keeping the current timing",
+    "Link trained to candidate {0}, receiving 0/1 at {1}/{2}us",
+    "Sending file: {0} of {1} bytes in blocks of {2}",
+    "Block dropped, the file continues from {0}",
+    "Received file: {0} bytes",
+    "File transfer incomplete, the file holds {0} bytes",
+)
+
+TRACE_LEVEL_NAMES = {TRACE_DEBUG: 'DEBUG', TRACE_INFO: 'INFO', TRACE_WARNING: 'WARNING', TRACE_ERROR: 'ERROR'}
+
+
+def _unpack32(buf, idx: int) -> int:
+    return buf[idx] | (buf[idx + 1] << 8) | (buf[idx + 2] << 16) | (buf[idx + 3] << 24)
+
+def decode(dump) -> list:
+    """
+    Unpack a binary trace dump
+
+    Args:
+        dump (_buffer_): Output of Trace.dump_into() or the contents of a Trace.save() file
+
+    Returns:
+        list: (ticks_us, event, level, seq, a, b, c) of every entry, oldest first
+    """
+    if len(dump) < TRACE_HEADER_SIZE or dump[0] != TRACE_VERSION:
+        raise ValueError(f"Not a version {TRACE_VERSION} trace dump")
+    entry_size = dump[1]
+    count = dump[2] | (dump[3] << 8)
+    entries = []
+    for idx in range(TRACE_HEADER_SIZE, TRACE_HEADER_SIZE + count * entry_size, entry_size):
+        entries.append((_unpack32(dump, idx), dump[idx + 4], dump[idx + 5], dump[idx + 6] | (dump[idx + 7] << 8),
+                        _unpack32(dump, idx + 8), _unpack32(dump, idx + 12), _unpack32(dump, idx + 16)))
+    return entries
+
+def render(event: int, a: int=0, b: int=0, c: int=0) -> str:
+    """
+    Returns:
+        str: The message of an event
+    """
+    if event >= len(TRACE_FORMATS):
+        return f"Unknown event {event} ({a}, {b}, {c})"
+    return TRACE_FORMATS[event].format(a, b, c)
@@ -0,0 +1,131 @@
+from utime import ticks_us
+import logging
+
+from trace import TRACE_VERSION, TRACE_ENTRY_SIZE, TRACE_HEADER_SIZE, TRACE_ENTRIES, TRACE_FILE, TRACE_INFO, \
+    TRACE_OFF, TRACE_LEVEL_NAMES, decode, render
+
+log = logging.getLogger('tracelinda')
+
+# The ring of binary trace events, in the entry layout described in trace.py
+
+
+def _pack32(buf, idx: int, value: int) -> None:
+    buf[idx] = value & 0xFF
+    buf[idx + 1] = (value >> 8) & 0xFF
+    buf[idx + 2] = (value >> 16) & 0xFF
+    buf[idx + 3] = (value >> 24) & 0xFF
+
+
+class Trace:
+    def __init__(self, entries: int=TRACE_ENTRIES, level: int=TRACE_INFO) -> None:
+        """
+        Ring of the last binary trace events. Events below the level are dropped before anything is
+        recorded, and recording one never allocates
+
+        Args:
+            entries (int, optional): Number of events the ring keeps. Defaults to TRACE_ENTRIES.
+            level (int, optional): Lowest TRACE_* level recorded. Defaults to TRACE_INFO.
+        """
+        self.ring = bytearray(entries * TRACE_ENTRY_SIZE)
+        self.entries = entries
+        self.level = level
+        # Events at or above this level also go to the log as they are recorded, formatted
+        self.echo = TRACE_OFF
+        # Index of the next entry to write, number of entries in use and sequence number of the next event
+        self._head = 0
+        self._count = 0
+        self.seq = 0
+
+    def set_level(self, level: int) -> None:
+        self.level = level
+
+    def set_echo(self, level: int) -> None:
+        """
+        Also log the events at or above level as they are recorded, which formats them on the spot.
+        TRACE_OFF stops it
+        """
+        self.echo = level
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+
+    def emit(self, level: int, event: int, a: int=0, b: int=0, c: int=0) -> None:
+        """
+        Record an event
+
+        Args:
+            level (int): TRACE_* level of the event
+            event (int): TR_* event
+            a (int, optional): First argument of the event's message. Defaults to 0.
+            b (int, optional): Second argument. Defaults to 0.
+            c (int, optional): Third argument. Defaults to 0.
+        """
+        if level < self.level:
+            return
+        ring = self.ring
+        idx = self._head * TRACE_ENTRY_SIZE
+        _pack32(ring, idx, ticks_us())
+        ring[idx + 4] = event
+        ring[idx + 5] = level
+        ring[idx + 6] = self.seq & 0xFF
+        ring[idx + 7] = self.seq >> 8
+        _pack32(ring, idx + 8, a)
+        _pack32(ring, idx + 12, b)
+        _pack32(ring, idx + 16, c)
+        self._head = (self._head + 1) % self.entries
+        self._count = min(self._count + 1, self.entries)
+        self.seq = (self.seq + 1) & 0xFFFF
+        if level >= self.echo:
+            log.log(level, render(event, a, b, c))
+
+    def count(self) -> int:
+        """
+        Returns:
+            int: Number of events in the ring
+        """
+        return self._count
+
+    def dump_size(self) -> int:
+        return TRACE_HEADER_SIZE + self.count() * TRACE_ENTRY_SIZE
+
+    def dump_into(self, buf: bytearray) -> int:
+        """
+        Write the binary dump, oldest event first
+
+        Args:
+            buf (bytearray): Output buffer of at least dump_size() bytes
+
+        Returns:
+            int: Number of bytes written
+        """
+        count = self.count()
+        buf[0] = TRACE_VERSION
+        buf[1] = TRACE_ENTRY_SIZE
+        buf[2] = count & 0xFF
+        buf[3] = count >> 8
+        first = (self._head - count) % self.entries
+        idx = TRACE_HEADER_SIZE
+        for entry in range(first, first + count):
+            start = (entry % self.entries) * TRACE_ENTRY_SIZE
+            buf[idx:idx + TRACE_ENTRY_SIZE] = memoryview(self.ring)[start:start + TRACE_ENTRY_SIZE]
+            idx += TRACE_ENTRY_SIZE
+        return idx
+
+    def save(self, path: str=TRACE_FILE) -> None:
+        """
+        Write the binary dump to a file, e.g. to copy off the flash and read with tools/tracedump.py
+        """
+        buf = bytearray(self.dump_size())
+        self.dump_into(buf)
+        with open(path, 'wb') as f:
+            f.write(buf)
+
+    def lines(self):
+        """
+        Yields the events in the ring as log lines, oldest first, for the REPL
+        """
+        buf = bytearray(self.dump_size())
+        self.dump_into(buf)
+        for tick, event, level, seq, a, b, c in decode(buf):
+            yield f"{tick:>10} {seq:>5} {TRACE_LEVEL_NAMES.get(level, level):<7} {render(event, a, b, c)}"
@@ -0,0 +1,148 @@
+from micropython import const
+from math import exp, log10, sqrt
+import array
+
+from laser import BITSTREAM_TIMING
+from trace import TRACE_INFO, TR_TRAIN_RESULT, TR_TRAIN_BER, TR_TRAIN_PULSES, TR_TRAIN_SPREAD
+from tracering import Trace
+
+# Responder side measurements of link training (see training.py)
+# The pulse widths of every candidate block of the sweep are compared against the known pattern, and the bit
+#   error rate each candidate would run at is estimated from their distributions
+#
+# Candidate pulse timings as a percentage of BITSTREAM_TIMING, slowest first
+TRAIN_SCALES = (100, 60, 40, 25, 15, 10, 6)
+TRAIN_TIMINGS = tuple(tuple(t * scale // 100 for t in BITSTREAM_TIMING) for scale in TRAIN_SCALES)
+TRAIN_PATTERN_BYTES = const(32)
+TRAIN_PATTERN_BITS = const(TRAIN_PATTERN_BYTES * 8)
+# Highest bit error rate accepted for a candidate timing. The pattern is too short to observe it directly,
+#   so it is estimated from the measured pulse-width distributions
+TRAIN_TARGET_BER = 1e-6
+# Pulse-width spread assumed at least, ticks_us has a resolution of 1us
+TRAIN_MIN_SIGMA_US = const(2)
+# Gap between pulses that the responder takes as the start of a new candidate block
+TRAIN_BLOCK_GAP_US = const(15000)
+# Reply choice when no candidate is usable
+TRAIN_NO_CHOICE = const(0xFF)
+
+
+def _build_pattern() -> bytearray:
+    """
+    PRBS-7 (x^7 + x^6 + 1) training pattern, a balanced mix of 0s and 1s and of runs of each
+
+    Returns:
+        bytearray: TRAIN_PATTERN_BYTES of pattern
+    """
+    pattern = bytearray(TRAIN_PATTERN_BYTES)
+    state = 0x7F
+    for idx in range(TRAIN_PATTERN_BITS):
+        bit = ((state >> 6) ^ (state >> 5)) & 1
+        state = ((state << 1) | bit) & 0x7F
+        pattern[idx >> 3] |= bit << (7 - (idx & 7))
+    return pattern
+
+TRAIN_PATTERN = _build_pattern()
+
+
+def _q(x: float) -> float:
+    """
+    Gaussian tail probability Q(x), using the Karagiannidis-Lioumpas approximation since
+    math.erfc is not available on every MicroPython port
+    """
+    if x <= 0:
+        return 0.5
+    return (1 - exp(-1.4 * x)) * exp(-x * x / 2) / (1.135 * sqrt(2 * 3.141592653589793) * x)
+
+
+class TrainingAnalyzer:
+    def __init__(self, timings: tuple=TRAIN_TIMINGS) -> None:
+        """
+        Collects the pulse widths received during a training sweep, one block per candidate timing,
+        and works out how reliably each candidate can be received
+
+        Args:
+            timings (tuple, optional): Candidate timings in the order they are sent. Defaults to TRAIN_TIMINGS.
+        """
+        self.timings = timings
+        self.widths = array.array('H', (0 for _ in range(TRAIN_PATTERN_BITS * len(timings))))
+        self.counts = array.array('H', (0 for _ in range(len(timings))))
+        self.block = -1
+        # Per candidate: (pulses, bit errors, estimated BER, mean width 0, sigma 0, mean width 1, sigma 1)
+        self.results = []
+
+    def push(self, width: int, gap: int) -> None:
+        """
+        Pulse sink for LindaLaser.capture_pulses_async()
+
+        Args:
+            width (int): Pulse width in us
+            gap (int): Time since the previous pulse ended in us
+        """
+        if self.block < 0 or (gap > TRAIN_BLOCK_GAP_US and self.block + 1 < len(self.timings)):
+            self.block += 1
+        count = self.counts[self.block]
+        if count < TRAIN_PATTERN_BITS:
+            self.widths[self.block * TRAIN_PATTERN_BITS + count] = min(width, 0xFFFF)
+        if count < 0xFFFF:
+            self.counts[self.block] = count + 1
+
+    def _analyse_block(self, block: int) -> tuple:
+        pulses = self.counts[block]
+        if pulses != TRAIN_PATTERN_BITS:
+            # Lost or extra pulses, every later bit of the block would be misaligned
+            return (pulses, abs(pulses - TRAIN_PATTERN_BITS), 1.0, 0, 0, 0, 0)
+        sums = [0, 0]
+        squares = [0, 0]
+        counts = [0, 0]
+        base = block * TRAIN_PATTERN_BITS
+        for idx in range(TRAIN_PATTERN_BITS):
+            bit = (TRAIN_PATTERN[idx >> 3] >> (7 - (idx & 7))) & 1
+            width = self.widths[base + idx]
+            sums[bit] += width
+            squares[bit] += width * width
+            counts[bit] += 1
+        mean_0 = sums[0] / counts[0]
+        mean_1 = sums[1] / counts[1]
+        sigma_0 = max(sqrt(max(squares[0] / counts[0] - mean_0 * mean_0, 0)), TRAIN_MIN_SIGMA_US)
+        sigma_1 = max(sqrt(max(squares[1] / counts[1] - mean_1 * mean_1, 0)), TRAIN_MIN_SIGMA_US)
+        # The receiver classifies against the measured means, so the decision threshold sits halfway
+        threshold = (mean_0 + mean_1) / 2
+        errors = 0
+        for idx in range(TRAIN_PATTERN_BITS):
+            bit = (TRAIN_PATTERN[idx >> 3] >> (7 - (idx & 7))) & 1
+            if (self.widths[base + idx] > threshold) != bit:
+                errors += 1
+        ber = 0.5 * (_q((threshold - mean_0) / sigma_0) + _q((mean_1 - threshold) / sigma_1))
+        return (pulses, errors, ber, mean_0, sigma_0, mean_1, sigma_1)
+
+    def analyse(self, trace: Trace=None) -> int:
+        """
+        Work out the results for every candidate and pick the fastest usable one
+
+        Args:
+            trace (Trace, optional): Trace to record the results of every candidate in. Defaults to None.
+
+        Returns:
+            int: Index of the fastest candidate without observed errors and within TRAIN_TARGET_BER,
+                or TRAIN_NO_CHOICE if none qualifies
+        """
+        self.results = [self._analyse_block(block) for block in range(len(self.timings))]
+        choice = TRAIN_NO_CHOICE
+        for idx, (pulses, errors, ber, mean_0, sigma_0, mean_1, sigma_1) in enumerate(self.results):
+            if trace is not None:
+                trace.emit(TRACE_INFO, TR_TRAIN_RESULT, idx, pulses, errors)
+                # As the power of ten it stays below
+                trace.emit(TRACE_INFO, TR_TRAIN_BER, idx, min(int(-log10(ber)), 99) if ber > 0 else 99)
+                trace.emit(TRACE_INFO, TR_TRAIN_PULSES, idx, int(mean_0), int(mean_1))
+                trace.emit(TRACE_INFO, TR_TRAIN_SPREAD, idx, int(sigma_0), int(sigma_1))
+            if errors == 0 and ber <= TRAIN_TARGET_BER:
+                choice = idx
+        return choice
+
+    def rx_durations(self, idx: int) -> tuple:
+        """
+        Returns:
+            tuple: Measured mean (0, 1) pulse widths of a candidate in us, for LindaLaser.set_timing()
+        """
+        result = self.results[idx]
+        return (int(result[3]), int(result[5]))
@@ -0,0 +1,156 @@
+from micropython import const
+import json
+import uasyncio as asyncio
+
+from framing import FRAME_FLAG_TRAIN
+from laser import LindaLaser
+from txframe import TX_SLICE_BYTES
+from trace import TRACE_INFO, TR_TRAIN_NO_REPLY, TR_TRAIN_UNUSABLE, TR_TRAIN_DONE
+from trainanalyzer import TrainingAnalyzer, TRAIN_TIMINGS, TRAIN_PATTERN, TRAIN_PATTERN_BYTES, TRAIN_NO_CHOICE
+
+# Link training
+# The initiator announces training with a control frame, then sends the same known pattern at each of
+#   TRAIN_TIMINGS in turn, from the slowest to the fastest, separated by gaps of darkness. The responder
+#   measures the pulse-width distributions its detector actually produces for every candidate, picks the
+#   fastest one that still meets TRAIN_TARGET_BER, and replies with its index. Both ends then switch to it
+#   and store it in TIMING_FILE, which is loaded again on boot.
+# Control frames are sent at the link's current timing, so both ends must agree on it before training,
+#   e.g. both freshly booted without a TIMING_FILE. The responder's measurements are in trainanalyzer.py
+#
+# Darkness between the candidate blocks, longer than the gap that the responder takes as the start of a new block
+TRAIN_GAP_MS = const(30)
+# Pause before the sweep and before the reply, so the other end has switched over to listening
+TRAIN_SETTLE_MS = const(100)
+# The sweep is over once the link has been quiet this long
+TRAIN_END_MS = const(250)
+TRAIN_TIMEOUT_S = const(5)
+# Control frame payloads are (kind, candidate index)
+TRAIN_ANNOUNCE = const(0x01)
+TRAIN_REPLY = const(0x02)
+
+TIMING_FILE = 'linda_timing.json'
+
+
+def save_timing(timing: tuple, rx_durations: tuple=None) -> None:
+    """
+    Store a trained timing in TIMING_FILE
+
+    Args:
+        timing (tuple): Pulse timing in ns, as for machine.bitstream()
+        rx_durations (tuple, optional): Measured (0, 1) pulse widths at this end's detector in us. Defaults to None.
+    """
+    with open(TIMING_FILE, 'w') as timing_file:
+        json.dump({'timing': list(timing), 'rx_durations': None if rx_durations is None else list(rx_durations)},
+                  timing_file)
+
+def load_timing():
+    """
+    Load the timing stored by the last link training
+
+    Returns:
+        tuple: (timing, rx_durations) for LindaLaser.set_timing(), or None if nothing valid is stored
+    """
+    try:
+        with open(TIMING_FILE) as timing_file:
+            stored = json.load(timing_file)
+        timing = tuple(stored['timing'])
+        rx_durations = stored['rx_durations']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if len(timing) != 4:
+        return None
+    return (timing, None if rx_durations is None else tuple(rx_durations))
+
+
+async def send_training(laser: LindaLaser) -> None:
+    """
+    Initiator side of link training: announce it, then send the pattern at every candidate timing
+
+    Args:
+        laser (LindaLaser): Laser of the initiating node
+    """
+    await laser.transmit_data_async(bytearray((TRAIN_ANNOUNCE, len(TRAIN_TIMINGS))), FRAME_FLAG_TRAIN)
+    await asyncio.sleep_ms(TRAIN_SETTLE_MS)
+    timing = laser.timing
+    rx_durations = (laser.dur_0, laser.dur_1)
+    # The sweep measures plain binary pulse widths, whatever modulation the link otherwise uses
+    modulation = laser.modulation
+    laser.set_modulation(None)
+    pattern_mv = memoryview(TRAIN_PATTERN)
+    for candidate in TRAIN_TIMINGS:
+        laser.set_timing(candidate)
+        for idx in range(0, TRAIN_PATTERN_BYTES, TX_SLICE_BYTES):
+            laser._transmit_segment(pattern_mv[idx : idx+TX_SLICE_BYTES])
+            await asyncio.sleep_ms(0)
+        laser.laser.off()
+        await asyncio.sleep_ms(TRAIN_GAP_MS)
+    laser.set_timing(timing, rx_durations)
+    laser.set_modulation(modulation)
+
+async def finish_training(laser: LindaLaser, timeout: int=TRAIN_TIMEOUT_S, save: bool=True) -> bool:
+    """
+    Initiator side of link training: wait for the responder's choice and switch to it
+
+    Args:
+        laser (LindaLaser): Laser of the initiating node
+        timeout (int, optional): Time to wait for the reply, in seconds. Defaults to TRAIN_TIMEOUT_S.
+        save (bool, optional): Store the new timing in TIMING_FILE. Defaults to True.
+
+    Returns:
+        bool: True if the link switched to a new timing
+    """
+    await laser.start_rx_async(timeout)
+    if not laser.rx_train_pending or laser.rx_train[0] != TRAIN_REPLY:
+        laser.trace.emit(TRACE_INFO, TR_TRAIN_NO_REPLY)
+        return False
+    choice = laser.rx_train[1]
+    if choice >= len(TRAIN_TIMINGS):
+        laser.trace.emit(TRACE_INFO, TR_TRAIN_UNUSABLE)
+        return False
+    laser.set_timing(TRAIN_TIMINGS[choice])
+    if save:
+        save_timing(laser.timing)
+    laser.trace.emit(TRACE_INFO, TR_TRAIN_DONE, choice, laser.dur_0, laser.dur_1)
+    return True
+
+async def train_link(laser: LindaLaser, timeout: int=TRAIN_TIMEOUT_S, save: bool=True) -> bool:
+    """
+    Run link training as the initiator
+
+    Args:
+        laser (LindaLaser): Laser of the initiating node
+        timeout (int, optional): Time to wait for the reply, in seconds. Defaults to TRAIN_TIMEOUT_S.
+        save (bool, optional): Store the new timing in TIMING_FILE. Defaults to True.
+
+    Returns:
+        bool: True if the link switched to a new timing
+    """
+    await send_training(laser)
+    return await finish_training(laser, timeout, save)
+
+async def answer_training(laser: LindaLaser, timeout: int=TRAIN_TIMEOUT_S, save: bool=True) -> bool:
+    """
+    Responder side of link training, to run as soon as a TRAIN_ANNOUNCE frame has been received:
+    measure the sweep, reply with the fastest usable timing and switch to it
+
+    Args:
+        laser (LindaLaser): Laser of the responding node
+        timeout (int, optional): Time to wait for the sweep, in seconds. Defaults to TRAIN_TIMEOUT_S.
+        save (bool, optional): Store the new timing in TIMING_FILE. Defaults to True.
+
+    Returns:
+        bool: True if the link switched to a new timing
+    """
+    analyzer = TrainingAnalyzer()
+    await laser.capture_pulses_async(analyzer.push, timeout, TRAIN_END_MS)
+    choice = analyzer.analyse(laser.trace)
+    await asyncio.sleep_ms(TRAIN_SETTLE_MS)
+    await laser.transmit_data_async(bytearray((TRAIN_REPLY, choice)), FRAME_FLAG_TRAIN)
+    if choice == TRAIN_NO_CHOICE:
+        laser.trace.emit(TRACE_INFO, TR_TRAIN_UNUSABLE)
+        return False
+    laser.set_timing(TRAIN_TIMINGS[choice], analyzer.rx_durations(choice))
+    if save:
+        save_timing(laser.timing, analyzer.rx_durations(choice))
+    laser.trace.emit(TRACE_INFO, TR_TRAIN_DONE, choice, laser.dur_0, laser.dur_1)
+    return True
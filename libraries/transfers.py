@@ -0,0 +1,76 @@
+from micropython import const
+import logging
+
+from training import train_link, answer_training, TRAIN_ANNOUNCE
+from arq import send_reliable, send_queue_reliable
+from arqrx import receive_reliable
+
+log = logging.getLogger('runtimelinda')
+
+# Transfer tasks of LindaRuntime, mixed into it from runtime.py. Each waits for its request from the input
+#   task and owns the laser and the status Neopixel until the transfer is over
+#
+# Time to wait for incoming pulses before giving up on a receive, in seconds
+RX_TIMEOUT_S = const(5)
+
+
+class TransferTasks:
+    async def tx_task(self) -> None:
+        while True:
+            await self.tx_request.wait()
+            self.tx_request.clear()
+            self._set_busy(True)
+            log.info("Transmit begin")
+            self.ws.set_color(255,0,0)
+            outbox = self.laser.outbox
+            if len(outbox) == 0 and outbox.queued() == 0 and self.message is not None:
+                outbox._read_ascii(self.message())
+                if outbox.queueing:
+                    outbox.commit()
+            if self.reliable and outbox.queueing:
+                await send_queue_reliable(self.laser)
+            elif self.reliable:
+                await send_reliable(self.laser)
+            elif outbox.queueing:
+                await self.laser.transmit_queue_async()
+            else:
+                await self.laser.transmit_outbox_async()
+            log.info("Transmit aborted" if self.laser.tx_aborted else "Transmit complete")
+            log.debug(f"Metrics: {self.linda.metrics.snapshot()}")
+            self.laser._toggle_tx(False)
+            self._set_busy(False)
+            self._apply_idle()
+
+    async def rx_task(self) -> None:
+        while True:
+            await self.rx_request.wait()
+            self.rx_request.clear()
+            self._set_busy(True)
+            log.info("Rx begin")
+            self.ws.set_color(0,0,255)
+            if self.reliable:
+                await receive_reliable(self.laser, RX_TIMEOUT_S)
+            else:
+                await self.laser.start_rx_async(RX_TIMEOUT_S)
+            if self.laser.rx_train_pending and self.laser.rx_train[0] == TRAIN_ANNOUNCE:
+                log.info("Link training requested by the other end")
+                self.ws.set_color(255,0,255)
+                await answer_training(self.laser)
+            log.info("Rx complete")
+            log.debug(f"Metrics: {self.linda.metrics.snapshot()}")
+            self._set_busy(False)
+            self._apply_idle()
+
+    async def train_task(self) -> None:
+        while True:
+            await self.train_request.wait()
+            self.train_request.clear()
+            self._set_busy(True)
+            log.info("Link training begin")
+            self.ws.set_color(255,0,255)
+            self.laser._toggle_tx(True)
+            await train_link(self.laser)
+            self.laser._toggle_tx(False)
+            log.info("Link training complete")
+            self._set_busy(False)
+            self._apply_idle()
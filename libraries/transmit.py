@@ -0,0 +1,182 @@
+from utime import ticks_ms, ticks_diff
+import uasyncio as asyncio
+
+from metrics import M_TX_BYTES, M_TX_LAST_BPS, M_TX_ABORTED
+from trace import TRACE_INFO, TR_TX_EMPTY, TR_TX_FRAMES, TR_TX_COMPRESSED, TR_TX_RAW, TR_TX_COMPRESSION, \
+    TR_TX_ABORTED
+
+# Transmissions of the laser link: a buffer or the outbox message, and the messages queued in the outbox
+#   through txqueue.py
+# One transmission is in progress at a time. abort_tx() stops it at the end of the frame on the wire, and
+#   preempt_tx() stops a queued message for a more urgent one. Nested transmissions, e.g. the transmit_data()
+#   of each message of transmit_queue(), leave the abort request to the outermost one
+
+
+class Transmitter:
+    def _init_transmit(self) -> None:
+        """
+        Transmission state of LindaLaser, a request from an IRQ or another task to stop the transmission in
+        progress (see abort_tx()) and the priority of the queued message being sent (see preempt_tx())
+        """
+        self.transmitting = False
+        self.tx_priority = -1
+        self.tx_aborted = False
+        self._tx_abort = False
+        self._tx_preempted = False
+
+    def abort_tx(self) -> None:
+        """
+        Stop the transmission in progress, the rest of the message isn't sent. Framed messages stop at the
+        end of the frame on the wire, a frame cut short would have the receiver take the start of the next
+        one for the rest of it. Safe to call from an IRQ handler
+        """
+        if self.transmitting:
+            self._tx_abort = True
+
+    def preempt_tx(self, priority: int) -> None:
+        """
+        Stop the queued message being sent (see transmit_queue()) if a message of a higher priority has
+        been queued. The interrupted message stays in the queue and is sent again after it
+        """
+        if self.transmitting and priority > self.tx_priority >= 0:
+            self._tx_preempted = True
+            self._tx_abort = True
+
+    def _tx_begin(self) -> bool:
+        """
+        Returns:
+            bool: True for the outermost transmission, e.g. transmit_queue() rather than the transmit_data()
+                of each of its messages, which owns the abort request
+        """
+        if self.transmitting:
+            return False
+        self.transmitting = True
+        self._tx_abort = False
+        self._tx_preempted = False
+        return True
+
+    def _tx_end(self, outer: bool) -> None:
+        if outer:
+            self.transmitting = False
+            self._tx_abort = False
+
+    def transmit_data(self, data_mv: memoryview, flags: int=0) -> None:
+        """
+        Transmit an arbitrary buffer as a sequence of frames
+
+        Args:
+            data_mv (memoryview): The message to send
+            flags (int, optional): Extra FRAME_FLAG_* bits set on every frame. Defaults to 0.
+        """
+        outer = self._tx_begin()
+        start = ticks_ms()
+        aborted = False
+        if self.tx_pipeline is not None:
+            aborted = not self.tx_pipeline.transmit(data_mv, flags)
+        else:
+            for segment_mv in self._tx_segments(memoryview(data_mv), flags):
+                self._transmit_segment(segment_mv)
+                if self._tx_abort and self._tx_stop_point(segment_mv):
+                    aborted = True
+                    break
+            self.laser.off()
+            self.metrics.collect()
+        self._tx_done(len(data_mv), ticks_diff(ticks_ms(), start), aborted)
+        self._tx_end(outer)
+
+    async def transmit_data_async(self, data_mv: memoryview, flags: int=0) -> None:
+        """
+        Cooperative version of transmit_data(), yielding to the other asyncio tasks between slices
+
+        Args:
+            data_mv (memoryview): The message to send
+            flags (int, optional): Extra FRAME_FLAG_* bits set on every frame. Defaults to 0.
+        """
+        outer = self._tx_begin()
+        start = ticks_ms()
+        aborted = False
+        if self.tx_pipeline is not None:
+            aborted = not await self.tx_pipeline.transmit_async(data_mv, flags)
+        else:
+            for segment_mv in self._tx_segments(memoryview(data_mv), flags):
+                self._transmit_segment(segment_mv)
+                if self._tx_abort and self._tx_stop_point(segment_mv):
+                    aborted = True
+                    break
+                await asyncio.sleep_ms(0)
+            self.laser.off()
+        self._tx_done(len(data_mv), ticks_diff(ticks_ms(), start), aborted)
+        self._tx_end(outer)
+
+    def _tx_done(self, msg_len: int, elapsed_ms: int, aborted: bool=False) -> None:
+        self.tx_aborted = aborted
+        if aborted:
+            self.metrics.add(M_TX_ABORTED)
+            self.trace.emit(TRACE_INFO, TR_TX_ABORTED, msg_len)
+            return
+        self.metrics.add(M_TX_BYTES, msg_len)
+        self.metrics.transfer(M_TX_LAST_BPS, msg_len, elapsed_ms)
+        self._log_compression(elapsed_ms)
+
+    def _log_compression(self, elapsed_ms: int) -> None:
+        """
+        Report what the compression stage gained on the message just sent: the ratio, and the message
+        bits per second against the payload bits per second that actually went over the link
+        """
+        compressor = self.compressor
+        if compressor is None or not compressor.packed_bytes or elapsed_ms <= 0:
+            return
+        self.trace.emit(TRACE_INFO, TR_TX_COMPRESSION, compressor.raw_bytes, compressor.packed_bytes,
+                        8000 * compressor.raw_bytes // elapsed_ms)
+
+    def transmit_outbox(self, msg_len: int=-1) -> None:
+        """
+        Transmit the contents of the outbox, optionally choosing the amount of data to transmit.
+        If no length argument is given, transmit the entire message
+
+        Args:
+            msg_len (int, optional): The length in bytes of the message to send. Defaults to -1,
+                which indicates transmission of the entire outbox message.
+        """
+        # Get the length of the outbox message
+        if msg_len == -1:
+            msg_len = len(self.outbox)
+        if msg_len == 0:
+            self.trace.emit(TRACE_INFO, TR_TX_EMPTY)
+        elif self.framed:
+            self._trace_tx(msg_len)
+            self.transmit_data(self.outbox.view(0, msg_len))
+        else:
+            self.trace.emit(TRACE_INFO, TR_TX_RAW, msg_len)
+            outer = self._tx_begin()
+            start = ticks_ms()
+            aborted = not self._transmit_buffer(self.outbox._data, end_idx=msg_len)
+            self._tx_done(msg_len, ticks_diff(ticks_ms(), start), aborted)
+            self._tx_end(outer)
+
+    async def transmit_outbox_async(self, msg_len: int=-1) -> None:
+        """
+        Cooperative version of transmit_outbox(). The framed message goes out TX_SLICE_BYTES at a time,
+        yielding to the other asyncio tasks between slices. The gaps only lengthen the low time between
+        pulses, which the pulse-width receiver ignores
+
+        Args:
+            msg_len (int, optional): The length in bytes of the message to send. Defaults to -1,
+                which indicates transmission of the entire outbox message.
+        """
+        if msg_len == -1:
+            msg_len = len(self.outbox)
+        if msg_len == 0:
+            self.trace.emit(TRACE_INFO, TR_TX_EMPTY)
+            return
+        if not self.framed:
+            self.transmit_outbox(msg_len)
+            return
+        self._trace_tx(msg_len)
+        await self.transmit_data_async(self.outbox.view(0, msg_len))
+
+    def _trace_tx(self, msg_len: int) -> None:
+        if self.compressor is not None:
+            self.trace.emit(TRACE_INFO, TR_TX_COMPRESSED, msg_len)
+        else:
+            self.trace.emit(TRACE_INFO, TR_TX_FRAMES, msg_len, self._tx_frame_count(msg_len))
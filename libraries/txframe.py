@@ -0,0 +1,191 @@
+from machine import bitstream, disable_irq, enable_irq
+from utime import ticks_us, ticks_diff
+from micropython import const
+
+from arena import MemoryArena, arena_buffer
+from framing import FrameWriter, FRAME_MAX_PAYLOAD, FRAME_FLAG_LAST, FRAME_FLAG_COMPRESSED, FRAME_FLAG_FEC, \
+    FRAME_CONTROL_FLAGS
+from compression import LZSSCompressor
+from fec import FEC_MAX_DATA
+from feccodec import FecCodec
+from metrics import M_TX_WIRE_BYTES, M_TX_FRAMES
+
+# Transmit side of the laser link, from a message to pulses
+# A message is cut into frame payloads, compressed (compression.py) and FEC coded (fec.py) when those stages are
+#   on, and framed (framing.py). The frame goes out as segments: the head, the payload in slices of
+#   TX_SLICE_BYTES and the CRC tail, each clocked out by machine.bitstream() with interrupts disabled for at
+#   most tx_slice_bytes at a time. A modulated frame instead goes out as one chip buffer, in the IRQ-off
+#   slices the modulation lays it out in
+#
+# Bytes per transmit segment, the async transmit yields to other tasks between segments
+TX_SLICE_BYTES = const(4)
+# Longest stretch a binary PWM transmission keeps interrupts disabled for by default, see set_irq_budget().
+#   Interrupts come back on between bytes, so a byte is the least that goes out in one stretch
+TX_IRQ_OFF_MAX_US = const(50000)
+
+
+class FrameSender:
+    def _init_frame_tx(self, arena: MemoryArena=None) -> None:
+        """
+        Framing and coding half of LindaLaser's transmitter
+
+        Args:
+            arena (MemoryArena, optional): Arena to carve the coding buffers from. Defaults to None.
+        """
+        self.frame_writer = FrameWriter()
+        self._tx_head_mv = memoryview(self.frame_writer.head)
+        self._tx_tail_mv = memoryview(self.frame_writer.tail)
+        self._tx_coded = arena_buffer(arena, FRAME_MAX_PAYLOAD)
+        self._tx_coded_mv = memoryview(self._tx_coded)
+        self._tx_packed = arena_buffer(arena, FRAME_MAX_PAYLOAD)
+        self._tx_packed_mv = memoryview(self._tx_packed)
+        # Transmit scheduling: bytes per stretch with interrupts disabled (see set_irq_budget())
+        self.irq_budget_us = TX_IRQ_OFF_MAX_US
+        self.tx_slice_bytes = 1
+
+    def set_irq_budget(self, max_us: int) -> None:
+        """
+        Bound the time transmissions keep interrupts disabled. bitstream() needs them off to keep the pulse
+        timing exact, so a binary PWM transmission goes out in slices of as many bytes as fit in max_us at the
+        slowest bit of the timing, at least one, with interrupts back on in between. The pause between
+        slices only lasts as long as the pending interrupt handlers, well within the low time the receiver
+        allows after a bit. Modulated frames are laid out in slices of as many chips as fit in max_us, each
+        between the modulation's markers so the pause reads as idle, see Modulation.set_slice()
+
+        Args:
+            max_us (int): Longest stretch with interrupts disabled, in us
+
+        Raises:
+            ValueError: max_us is too short for one byte of the modulation between its markers
+        """
+        if self.modulation is not None:
+            self.modulation.set_slice(max_us // (8 * ((self.chip_timing[1] + 999) // 1000)))
+        self.irq_budget_us = max_us
+        bit_us = max(self._periods)
+        self.tx_slice_bytes = max(max_us // (8 * bit_us), 1)
+
+    def _transmit_buffer(self, outbox_mv: memoryview, start_idx: int=0, end_idx: int=32) -> bool:
+        """
+        Transmits data in the given memoryview by bit-banging the laser module output using machine.bitstream()
+        Uses high-low pulse duration modulation, defined in the four-tuple self.timing
+
+        Args:
+            outbox_mv (memoryview): Memoryview of a bytearray() containing data to transmit
+            start_idx (int): Index of memoryview byte to begin transmitting
+            end_idx (int): Index of memoryview bytes to end transmitting
+
+        Returns:
+            bool: False if the transmission was aborted before the end
+        """
+        buffer_mv = outbox_mv[start_idx:end_idx]
+        step = self.tx_slice_bytes
+        sent = True
+        for idx in range(0, len(buffer_mv), step):
+            if self._tx_abort:
+                sent = False
+                break
+            self._transmit_slice(buffer_mv[idx : idx+step], self.timing)
+        self.metrics.collect()
+        self.laser.off()
+        return sent
+
+    def _tx_segments(self, data_mv: memoryview, flags: int=0, first_seq: int=0):
+        """
+        Yield the successive memoryviews to clock out to send data_mv as a sequence of frames.
+        Each payload is sent straight from data_mv between the frame head and CRC tail, in slices
+        of at most TX_SLICE_BYTES, so nothing is copied. A modulated link instead yields each whole
+        frame as one chip buffer, sent in the marker-framed slices the modulation laid it out in.
+        With a compressor, each payload is instead as much of data_mv as fits in one LZSS block, and
+        with FEC each payload is encoded into a separate buffer
+
+        Args:
+            data_mv (memoryview): The message to send
+            flags (int, optional): Extra FRAME_FLAG_* bits set on every frame. Defaults to 0.
+            first_seq (int, optional): Sequence number of the first frame. Defaults to 0.
+
+        Yields:
+            memoryview: The next segment to transmit
+        """
+        self.frame_writer.seq = first_seq
+        compressor = self._tx_compressor(flags)
+        if compressor is not None:
+            compressor.reset_stats()
+            flags |= FRAME_FLAG_COMPRESSED
+        fec = self._tx_fec(flags)
+        msg_len = len(data_mv)
+        start = 0
+        while start < msg_len:
+            payload_mv, start = self._tx_payload(data_mv, start, compressor, fec)
+            yield from self._tx_frame(payload_mv, flags | (FRAME_FLAG_LAST if start == msg_len else 0), fec)
+
+    def _tx_frame_count(self, msg_len: int) -> int:
+        # Frames an uncompressed message goes out in
+        frame_data = FEC_MAX_DATA if self.fec_enabled else FRAME_MAX_PAYLOAD
+        return (msg_len + frame_data - 1) // frame_data
+
+    def _tx_compressor(self, flags: int) -> LZSSCompressor:
+        # Control frames always go out as they are
+        return None if flags & FRAME_CONTROL_FLAGS else self.compressor
+
+    def _tx_fec(self, flags: int) -> FecCodec:
+        return None if flags & FRAME_CONTROL_FLAGS or not self.fec_enabled else self.fec
+
+    def _tx_payload(self, data_mv: memoryview, start: int, compressor: LZSSCompressor=None, fec: FecCodec=None) -> tuple:
+        """
+        Returns:
+            tuple: (payload of the frame that carries data_mv from start, before FEC, where the next frame starts)
+        """
+        room = FEC_MAX_DATA if fec is not None else FRAME_MAX_PAYLOAD
+        if compressor is not None:
+            consumed, length = compressor.compress(data_mv, start, self._tx_packed_mv[:room])
+            return self._tx_packed_mv[:length], start + consumed
+        end = min(start + room, len(data_mv))
+        return data_mv[start:end], end
+
+    def _tx_frame(self, payload_mv: memoryview, flags: int, fec: FecCodec=None):
+        """
+        Yield the segments of one frame, numbered with the frame writer's next sequence number
+        """
+        if fec is not None:
+            payload_mv = self._tx_coded_mv[:fec.encode_into(payload_mv, self._tx_coded)]
+            flags |= FRAME_FLAG_FEC
+        writer = self.frame_writer
+        writer.prepare(payload_mv, flags)
+        self.metrics.add(M_TX_FRAMES)
+        head_mv = self._tx_head_mv
+        tail_mv = self._tx_tail_mv
+        if self.modulation is not None:
+            yield self.modulation.modulate((head_mv, payload_mv, tail_mv))
+            return
+        yield head_mv
+        for idx in range(0, len(payload_mv), TX_SLICE_BYTES):
+            yield payload_mv[idx : idx+TX_SLICE_BYTES]
+        yield tail_mv
+
+    def _transmit_segment(self, segment_mv: memoryview) -> None:
+        """
+        Clock a segment out, tx_slice_bytes at a time with interrupts disabled. A modulated segment goes
+        out in the slices its chip buffer is laid out in, see Modulation.set_slice()
+        """
+        if self.modulation is not None:
+            step = self.modulation.slice_bytes or max(len(segment_mv), 1)
+            for idx in range(0, len(segment_mv), step):
+                self._transmit_slice(segment_mv[idx : idx+step], self.chip_timing)
+            return
+        step = self.tx_slice_bytes
+        for idx in range(0, len(segment_mv), step):
+            self._transmit_slice(segment_mv[idx : idx+step], self.timing)
+
+    def _transmit_slice(self, slice_mv: memoryview, timing: tuple) -> None:
+        state = disable_irq()
+        start = ticks_us()
+        bitstream(self.laser, 0, timing, slice_mv)
+        elapsed = ticks_diff(ticks_us(), start)
+        enable_irq(state)
+        self.metrics.irq_off(elapsed)
+        self.metrics.add(M_TX_WIRE_BYTES, len(slice_mv))
+
+    def _tx_stop_point(self, segment_mv: memoryview) -> bool:
+        # The segment just sent finished a frame, and more of the message is to come
+        return (segment_mv is self._tx_tail_mv or self.modulation is not None) and \
+            not self.frame_writer.flags & FRAME_FLAG_LAST
@@ -0,0 +1,74 @@
+from framing import FRAME_FLAG_MORE
+
+# Transmissions of the messages queued in the outbox (see memory.OutboxBuffer), in one session highest
+#   priority first. Each goes out through transmit_data(), with the preemption of preempt_tx() handled
+#   between messages (see transmit.py)
+
+
+class QueueSender:
+    def transmit_queue(self) -> int:
+        """
+        Transmit every message queued in the outbox in one session, highest priority first, taking each out
+        of the queue once it is sent. All but the last go out with FRAME_FLAG_MORE, so a receiver with a
+        queueing inbox keeps listening for the next one. A message preempted by a more urgent one (see
+        preempt_tx()) is sent again after it, abort_tx() leaves the rest of the queue for later
+
+        Returns:
+            int: Number of messages sent
+        """
+        outer = self._tx_begin()
+        outbox = self.outbox
+        sent = 0
+        slot = outbox.peek()
+        while slot >= 0:
+            self._tx_queue_start(slot)
+            self.transmit_data(outbox.message(slot), FRAME_FLAG_MORE if outbox.queued() > 1 else 0)
+            sent += not self.tx_aborted
+            if not self._tx_queue_done(slot):
+                break
+            slot = outbox.peek()
+        self.tx_priority = -1
+        self._tx_end(outer)
+        return sent
+
+    async def transmit_queue_async(self) -> int:
+        """
+        Cooperative version of transmit_queue(). Messages queued while it runs go out in the same session,
+        and one of a higher priority preempts the message being sent
+
+        Returns:
+            int: Number of messages sent
+        """
+        outer = self._tx_begin()
+        outbox = self.outbox
+        sent = 0
+        slot = outbox.peek()
+        while slot >= 0:
+            self._tx_queue_start(slot)
+            await self.transmit_data_async(outbox.message(slot), FRAME_FLAG_MORE if outbox.queued() > 1 else 0)
+            sent += not self.tx_aborted
+            if not self._tx_queue_done(slot):
+                break
+            slot = outbox.peek()
+        self.tx_priority = -1
+        self._tx_end(outer)
+        return sent
+
+    def _tx_queue_start(self, slot: int) -> None:
+        self.tx_priority = self.outbox._priorities[slot]
+        self._trace_tx(self.outbox._lengths[slot])
+
+    def _tx_queue_done(self, slot: int) -> bool:
+        """
+        Take a queued message that was sent out of the queue, and clear a preemption
+
+        Returns:
+            bool: False if the transmission is to stop, leaving the rest of the queue
+        """
+        if not self.tx_aborted:
+            self.outbox.pop(slot)
+        if not self._tx_preempted:
+            return not self._tx_abort
+        self._tx_preempted = False
+        self._tx_abort = False
+        return True
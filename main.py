@@ -1,13 +1,14 @@
-import gc
 import logging
 import sys
+import uasyncio as asyncio
 
-from utime import sleep_ms
 from machine import Pin
 
 from libraries.rgbled import WS2812
 from libraries.gpio import BUTTON_B_PIN, BUTTON_R_PIN, SWITCH_PIN, LED_PIN
 from libraries.linda import Linda
+from libraries.runtime import LindaRuntime
+from libraries.trace import TRACE_INFO
 
 # Logging setup
 logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
@@ -22,81 +23,62 @@ switch = Pin(SWITCH_PIN, Pin.IN, pull=Pin.PULL_DOWN)
 button_B = Pin(BUTTON_B_PIN, Pin.IN, pull=Pin.PULL_DOWN)
 button_R = Pin(BUTTON_R_PIN, Pin.IN, pull=Pin.PULL_DOWN)
 
-# Disable automatic garbage collection
-gc.disable()
+# Automatic garbage collection stays on: the buffers live in one arena allocated up front (see Linda) and the
+#   transmit and receive loops don't allocate, so collections are short and land between transfers
+#   (see Metrics.collect())
 
-# Set up builtin neopixel rgbled with default pins
+# Builtin neopixel rgbled with default pins, its driver comes up on first use
 ws = WS2812(brightness=16)
 
+# Serve the AMSAT buffer as an I2C target, the AMSAT controller moving messages in and out in chunks through
+#   its register map (see libraries/iic.py). Needs machine.I2CTarget, MicroPython 1.26 or later
+AMSAT_I2C = False
+
 # Top-level LINDA object
-linda = Linda()
+linda = Linda(i2c=AMSAT_I2C)
 linda.laser._toggle_tx(False)
-
-# Set initial idle state based on toggle switch
-idle = bool(switch.value())
-active_tx_rx = False
-
-# Moby Dick, by Herman Melville
-# Chapter 30: The Pipe
-linda.laser.outbox._read_ascii('When Stubb had departed, Ahab stood for a while leaning over the bulwarks; and then, as had been usual with him of late, calling a sailor of the watch, he sent him below for his ivory stool, and also his pipe. Lighting the pipe at the binnacle lamp and planting the stool on the weather side of the deck, he sat and smoked. \
-    In old Norse time, the thrones of the sea-loving Danish kinds were fabricated, saith tradition, of the tusks of the narwhale. How could one look at Ahab then, seated on that tripod of bones, without bethinking him of the royalty it symbolized? For a Khan of the plank, and a king of the sea and a great lord of Leviathans was Ahab. \
-    Some moments passed, during which the thick vapor came from his mouth in quick and constant puffs, which blew back again into his face. "How now", he soliloquized at last, withdrawing the tube, "this smoking no longer soothes. Oh, my pipe! hard must it go with me if thy charm be gone! Here have I been unconsciously toiling, not pleasuring- aye, and ignorantly smmoking to the windward all the while; to windward, and with such nervous whiffs, as if, like the dying whale, my final jets were the strongest and the fullest of trouble. What business have I with this pipe? This thing that is meant for sereneness, to send up mild white vapors among mild white hairs, not among torn iron-grey locks like mine. I\'ll smoke no more-"\
-    He tossed the still lighted pipe into the sea. The fire hissed in the waves; the same instant the ship shot by the bubble the sinking pipe made. With slouched hat, Ahab lurchingly paced the planks.')
-
-
-# Set up interrupt handlers for buttons/switch
-def handle_button_R(irq):
-    global active_tx_rx
-    linda.laser.tx_toggle = True
-    active_tx_rx = True
-
-def handle_button_B(irq):
-    global active_tx_rx
-    linda.laser.tx_toggle = False
-    active_tx_rx = True
-
-def toggle_idle(irq):
-    global idle
-    idle = bool(switch.value())
-
-button_R.irq(handler=handle_button_R, trigger=Pin.IRQ_RISING)
-button_B.irq(handler=handle_button_B, trigger=Pin.IRQ_RISING)
-switch.irq(handler=toggle_idle, trigger=(Pin.IRQ_FALLING|Pin.IRQ_RISING))
-
-# Main functional loop
+# Dual-core mode hands the laser to a service on core 1, fed from the AMSAT side through lock-free rings
+DUAL_CORE = False
+# Send messages LZSS-compressed, the receiver decompresses compressed frames either way
+COMPRESS = True
+linda.laser.set_compression(COMPRESS)
+# Convolutionally code and interleave frame payloads against burst errors, at half the rate. The receiver
+#   decodes coded frames either way
+FEC = False
+linda.laser.set_fec(FEC)
+# Resend lost frames, acknowledged over the reverse laser path. Both ends have to use the same setting
+RELIABLE = False
+# Longest stretch a transmission keeps interrupts off for, the buttons and the AMSAT I2C target wait at most
+#   this long. The red button aborts a transmission, at the end of the frame on the wire
+IRQ_BUDGET_US = 50000
+linda.laser.set_irq_budget(IRQ_BUDGET_US)
+# Queue several messages in the outbox, each with the priority in the AMSAT PRIORITY register, and send them
+#   all in one session, highest priority first. The inbox keeps each received message apart. Not with
+#   DUAL_CORE or RELIABLE
+QUEUE = False
+linda.set_queueing(QUEUE)
+# Diagnostics go into a binary trace ring (see libraries/trace.py), rendered from the REPL with
+#   print('\n'.join(linda.trace.lines())) or saved with linda.trace.save() for tools/tracedump.py. Echoing them to
+#   the log as well formats each one as it happens, which is fine for the summaries at the end of a transfer
+TRACE_LEVEL = TRACE_INFO
+linda.trace.set_level(TRACE_LEVEL)
+linda.trace.set_echo(TRACE_INFO)
+
+def demo_message() -> str:
+    # Sent when the red button finds the outbox empty, only imported then so it doesn't slow down the boot
+    from libraries.sample import pipe
+    return pipe
+
+
+# Main functional runtime
 # If LINDA is idle, it will cycle through pretty colors on the builtin Neopixel rgbled
 #    this also acts as an alignment mode, where the attached LED will illuminate on laser detector activity
 # If LINDA is active, it will either transmit or receive upon Red/Blue button press
-#    Red button press will transmit data from the LindaLaser outbox memory buffer
+#    Red button press will transmit data from the LindaLaser outbox memory buffer, the demo message if it is empty
 #    Blue button press will start the receive routine which will capture incoming bits and save the resultant
 #        ASCII string to the LindaLaser inbox memory buffer
-# At the end of the main loop, run garbage collection and take a short rest
-while True:
-    ws.rgb_loop_step()
-    if idle:
-        linda.laser.laser.on()
-        # Alignment while idling -- turn builtin LED on when laser is detected
-        if not linda.laser.detector.value():
-            led.on()
-        else:
-            led.off()
-
-    else:
-        linda.laser.laser.off()
-        if active_tx_rx:
-            if linda.laser.tx_toggle:
-                log.info("Transmit begin")
-                ws.set_color(255,0,0)
-                linda.laser.transmit_outbox()
-                log.info("Transmit complete")
-                linda.laser._toggle_tx(False)
-            else:
-                log.info("Rx begin")
-                ws.set_color(0,0,255)
-                linda.laser.start_rx()
-                log.info("Rx complete")
-            
-            active_tx_rx = False
-
-    gc.collect()
-    sleep_ms(1)
+# Each of these runs as a uasyncio task, and the scheduler sleeps whenever every task is waiting
+if DUAL_CORE:
+    linda.start()
+runtime = LindaRuntime(linda, ws, led, switch, button_B, button_R, reliable=RELIABLE, message=demo_message)
+asyncio.run(runtime.run())
@@ -0,0 +1,41 @@
+# Heap measurement of the allocation budget check, see allocsim.py
+import tracemalloc
+
+
+class AllocMeter:
+    def __init__(self) -> None:
+        """
+        Heap use of repeated runs of one operation
+        """
+        self.calls = 0
+        self.peak = 0
+        # What measuring itself allocates, see calibrate()
+        self.overhead = 0
+
+    def calibrate(self) -> None:
+        """
+        Measure an operation that does nothing, and count only what real operations use on top of that
+        """
+        meter = AllocMeter()
+        for _ in range(8):
+            meter.measure(_nothing)
+        self.overhead = meter.peak
+
+    def measure(self, func, *args):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        self.calls += 1
+        self.peak = max(self.peak, peak - before - self.overhead)
+        return result
+
+    def wrap(self, func):
+        # Measured stand-in for a method, every call is one operation
+        def measured(*args):
+            return self.measure(func, *args)
+        return measured
+
+
+def _nothing() -> None:
+    pass
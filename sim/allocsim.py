@@ -0,0 +1,183 @@
+# Host-side allocation budget check
+# Runs the transmit, receive, encode and decode paths of the real libraries/ code in virtual time and measures
+#   the heap they use with tracemalloc: the peak of every operation above what was allocated before it,
+#   against a budget per operation, and how much more the library code holds on the heap after a whole pass
+#   of all of them, once the caches have been filled by a first one, which has to stay within
+#   ALLOC_GROWTH_BUDGET. A hot path that starts allocating a buffer per frame, or keeps something of every
+#   frame, fails the check. Exits with status 1 if any budget is exceeded
+# CPython allocates for things MicroPython doesn't (frames, memoryview slices, ints over 256), so the peak
+#   budgets leave room for that, but less than a frame payload
+#
+# Usage: python sim/allocsim.py [bytes=N] [seed=n]
+import sys
+
+_SIM_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _SIM_DIR + '/../libraries')
+sys.path.insert(0, _SIM_DIR)
+
+import random
+import tracemalloc
+
+from vclock import clock
+from allocmeter import AllocMeter
+from linksim import SimLink
+from linda import Linda
+from framedec import FrameDecoder
+from fec import FEC_MAX_DATA
+from feccodec import FecCodec
+from compression import LZSSCompressor
+from decompress import decompress_frame
+from sample import pipe as SAMPLE_TEXT
+
+# Only allocations made by libraries/ count towards the growth, not the harness's own bookkeeping
+_LIBRARY_TRACES = (tracemalloc.Filter(True, '*/libraries/*'),)
+
+# Peak bytes allowed per operation
+ALLOC_BUDGETS = {
+    'tx frame': 1024,
+    'tx frame compressed fec': 1280,
+    'pipeline frame': 256,
+    'rx drain': 640,
+    'frame decode': 640,
+    'fec encode': 512,
+    'fec decode': 768,
+    'compress': 640,
+    'decompress': 1024,
+}
+# Bytes the library code may hold on to after a steady-state pass
+ALLOC_GROWTH_BUDGET = 0
+
+
+def _push_frame(decoder: FrameDecoder, bits: bytes) -> None:
+    for bit in bits:
+        decoder.push_bit(bit)
+
+def _frame_bits(laser) -> bytes:
+    # Bits of the first frame laser sends of its outbox, as they go out on the wire
+    segments = laser._tx_segments(laser.outbox.view())
+    bits = bytearray()
+    for segment in segments:
+        for byte in segment:
+            bits.extend((byte >> (7 - idx)) & 1 for idx in range(8))
+        if segment is laser._tx_tail_mv:
+            break
+    return bytes(bits)
+
+def run(msg_len: int, seed: int) -> dict:
+    """
+    Measure every operation
+
+    Returns:
+        tuple: (AllocMeter of each operation by name, bytes the library code holds after the measured pass
+            that it didn't before)
+    """
+    clock.reset()
+    random.seed(seed)
+    message = bytes(random.getrandbits(8) for _ in range(msg_len))
+    text = SAMPLE_TEXT.encode('ascii')
+    text = (text * (msg_len // len(text) + 1))[:msg_len]
+    meters = {name: AllocMeter() for name in ALLOC_BUDGETS}
+    linda = Linda()
+    laser = linda.laser
+    laser.outbox.write(message)
+    frame_bits = _frame_bits(laser)
+    fec = FecCodec()
+    coded = bytearray(256)
+    decoded = bytearray(FEC_MAX_DATA + 2)
+    compressor = LZSSCompressor()
+    packed = bytearray(256)
+    unpacked = bytearray(msg_len)
+    decoder = FrameDecoder()
+    link = SimLink()
+    tx = link.node()
+    rx = link.node()
+    tx.outbox.write(message)
+    edges = link.capture(tx)
+
+    tracemalloc.start()
+    for meter in meters.values():
+        meter.calibrate()
+    # One warm-up pass fills the interpreter caches, the second is measured
+    for warm_up in (True, False):
+        if not warm_up:
+            rx_meter = meters['rx drain'].wrap(rx._drain_edges)
+            baseline = tracemalloc.take_snapshot().filter_traces(_LIBRARY_TRACES)
+        def op(name, func, *args):
+            return func(*args) if warm_up else meters[name].measure(func, *args)
+        data_mv = memoryview(message)
+        for start in range(0, msg_len, FEC_MAX_DATA):
+            chunk_mv = data_mv[start:start + FEC_MAX_DATA]
+            length = op('fec encode', fec.encode_into, chunk_mv, coded)
+            soft = bytes(0xFF if (coded[idx >> 3] >> (7 - (idx & 7))) & 1 else 0 for idx in range(8 * length))
+            op('fec decode', fec.decode_into, memoryview(soft), length, decoded)
+        text_mv = memoryview(text)
+        start = 0
+        while start < msg_len:
+            consumed, length = op('compress', compressor.compress, text_mv, start, packed)
+            op('decompress', decompress_frame, memoryview(packed)[:length], memoryview(unpacked))
+            start += consumed
+        for frame in range(4):
+            op('frame decode', _push_frame, decoder, frame_bits)
+        # Frame by frame, the way the transmit loop pulls them
+        laser.set_compression(False)
+        laser.set_fec(False)
+        segments = laser._tx_segments(laser.outbox.view())
+        while op('tx frame', _consume_frame, laser, segments):
+            pass
+        laser.set_compression(True)
+        laser.set_fec(True)
+        segments = laser._tx_segments(laser.outbox.view())
+        while op('tx frame compressed fec', _consume_frame, laser, segments):
+            pass
+        laser.set_compression(False)
+        laser.set_fec(False)
+        pipeline = laser.tx_pipeline
+        for chunk_mv, flags in pipeline._chunks(laser.outbox.view(), 0):
+            op('pipeline frame', pipeline._prepare, 0, chunk_mv, flags)
+        # Only the draining of the capture ring is measured, not the simulated detector feeding it
+        if not warm_up:
+            rx._drain_edges = rx_meter
+        link.deliver(rx, edges, clock.now + link.lead_in_us)
+        rx.start_rx()
+        if not warm_up:
+            del rx._drain_edges
+    end = tracemalloc.take_snapshot().filter_traces(_LIBRARY_TRACES)
+    growth = sum(stat.size_diff for stat in end.compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+    if bytes(rx.inbox.view()) != message:
+        raise SystemExit("The measured reception didn't receive the message")
+    return meters, growth
+
+def _consume_frame(laser, segments) -> bool:
+    # Pull the segments of one frame, False once there are none left
+    for segment in segments:
+        if segment is laser._tx_tail_mv or laser.modulation is not None:
+            return True
+    return False
+
+def _parse_args(argv: list) -> dict:
+    args = {'bytes': '768', 'seed': '1'}
+    for arg in argv:
+        key, _, value = arg.partition('=')
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    return args
+
+def main(argv: list) -> None:
+    args = _parse_args(argv)
+    meters, growth = run(int(args['bytes']), int(args['seed']))
+    failed = growth > ALLOC_GROWTH_BUDGET
+    for name, meter in meters.items():
+        ok = meter.peak <= ALLOC_BUDGETS[name]
+        failed |= not ok
+        print(f"{name}: {meter.calls} calls, peak {meter.peak} B (budget {ALLOC_BUDGETS[name]} B) "
+              f"{'ok' if ok else 'OVER BUDGET'}")
+    print(f"Library heap growth over the pass: {growth} B (budget {ALLOC_GROWTH_BUDGET} B) "
+          f"{'ok' if growth <= ALLOC_GROWTH_BUDGET else 'OVER BUDGET'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
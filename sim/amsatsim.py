@@ -0,0 +1,144 @@
+# Host-side AMSAT I2C simulator
+# Plays the AMSAT controller against the real Linda I2C target (libraries/iic.py) on the simulated bus in
+#   virtual time: a message goes into the data window in chunks and is committed to the laser outbox, then
+#   a received message is fetched back out of the inbox the same way
+#
+# Usage: python sim/amsatsim.py [bytes=N] [chunk=N] [freq=hz] [seed=n]
+# Any parameter may be a comma-separated list to sweep it, e.g. chunk=16,64,256 freq=100000,400000,1000000
+import sys
+
+_SIM_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _SIM_DIR + '/../libraries')
+sys.path.insert(0, _SIM_DIR)
+
+import random
+
+from machine import I2C
+from vclock import clock
+from linda import Linda
+from iic import I2C_TARGET_ID, I2C_TARGET_ADDR, I2C_REG_STATUS, I2C_REG_CONTROL, I2C_REG_RX_LEN, I2C_REG_WINDOW, \
+    I2C_DATA, I2C_CMD_NONE, I2C_CMD_COMMIT, I2C_CMD_FETCH, I2C_CMD_RX_DONE, I2C_STATUS_TX_READY, \
+    I2C_STATUS_RX_READY, I2C_STATUS_INBOX, I2C_STATUS_ERROR
+
+
+class AmsatController:
+    def __init__(self, linda: Linda, freq: int=400_000, chunk: int=64) -> None:
+        """
+        The AMSAT side of the I2C link, driving a Linda through its register block. Linda.service_i2c()
+        runs whenever the target signals a write, as the runtime's i2c_task would
+
+        Args:
+            linda (Linda): Controller with an I2C target
+            freq (int, optional): Bus clock in Hz. Defaults to 400000.
+            chunk (int, optional): Largest data window transfer in bytes. Defaults to 64.
+        """
+        self.linda = linda
+        self.bus = I2C(I2C_TARGET_ID, freq=freq)
+        self.chunk = chunk
+        linda.start_i2c().event = self
+
+    def set(self) -> None:
+        # Stands in for the runtime's ThreadSafeFlag
+        self.linda.service_i2c()
+
+    def _write(self, memaddr: int, data) -> None:
+        self.bus.writeto_mem(I2C_TARGET_ADDR, memaddr, data, addrsize=16)
+
+    def _read(self, memaddr: int, nbytes: int) -> bytes:
+        return self.bus.readfrom_mem(I2C_TARGET_ADDR, memaddr, nbytes, addrsize=16)
+
+    def status(self) -> int:
+        return self._read(I2C_REG_STATUS, 1)[0]
+
+    def window(self) -> int:
+        window = self._read(I2C_REG_WINDOW, 2)
+        return (window[0] << 8) | window[1]
+
+    def _command(self, command: int, *args: int) -> bool:
+        """
+        Issue a command and poll CONTROL until the target has carried it out
+
+        Returns:
+            bool: False if the target rejected it
+        """
+        self._write(I2C_REG_CONTROL, bytes((command,) + args))
+        while self._read(I2C_REG_CONTROL, 1)[0] != I2C_CMD_NONE:
+            pass
+        return not self.status() & I2C_STATUS_ERROR
+
+    def send(self, data: bytes) -> bool:
+        """
+        Hand a message over to the laser outbox, at most window() bytes
+        """
+        while not self.status() & I2C_STATUS_TX_READY:
+            pass
+        for start in range(0, len(data), self.chunk):
+            self._write(I2C_DATA + start, data[start:start + self.chunk])
+        return self._command(I2C_CMD_COMMIT, len(data) >> 8, len(data) & 0xFF)
+
+    def receive(self) -> bytes:
+        """
+        Fetch the laser inbox
+
+        Returns:
+            bytes: The received message, None if there was none
+        """
+        if not self.status() & I2C_STATUS_INBOX or not self._command(I2C_CMD_FETCH):
+            return None
+        if not self.status() & I2C_STATUS_RX_READY:
+            return None
+        rx_len = self._read(I2C_REG_RX_LEN, 2)
+        length = (rx_len[0] << 8) | rx_len[1]
+        data = bytearray(length)
+        for start in range(0, length, self.chunk):
+            data[start:start + self.chunk] = self._read(I2C_DATA + start, min(self.chunk, length - start))
+        self._command(I2C_CMD_RX_DONE)
+        return bytes(data)
+
+
+def _parse_args(argv: list) -> dict:
+    args = {'bytes': '4096', 'chunk': '64', 'freq': '400000', 'seed': '1'}
+    for arg in argv:
+        key, _, value = arg.partition('=')
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    return args
+
+def _sweep(args: dict) -> list:
+    # Cartesian product of every comma-separated option
+    runs = [{}]
+    for key, value in args.items():
+        runs = [dict(run, **{key: int(v)}) for run in runs for v in value.split(',')]
+    return runs
+
+def main(argv: list) -> None:
+    for run in _sweep(_parse_args(argv)):
+        clock.reset()
+        random.seed(run['seed'])
+        linda = Linda(i2c=True)
+        amsat = AmsatController(linda, freq=run['freq'], chunk=run['chunk'])
+        msg_len = min(run['bytes'], amsat.window())
+        message = bytes(random.getrandbits(8) for _ in range(msg_len))
+
+        start = clock.now
+        sent = amsat.send(message)
+        tx_us = clock.now - start
+        sent_ok = sent and bytes(linda.laser.outbox.view()) == message
+
+        # Loop the outbox back into the inbox, as if the other node had sent it
+        linda.laser.inbox.write(linda.laser.outbox.view())
+        linda.service_i2c()
+        start = clock.now
+        received = amsat.receive()
+        rx_us = clock.now - start
+        received_ok = received == message and len(linda.laser.inbox) == 0
+
+        print(f"{msg_len} B in {run['chunk']} B chunks at {run['freq'] // 1000} kHz: "
+              f"send {'ok' if sent_ok else 'FAILED'} {tx_us / 1000:.1f} ms ({8e6 * msg_len / max(tx_us, 1):.0f} bps), "
+              f"receive {'ok' if received_ok else 'FAILED'} {rx_us / 1000:.1f} ms ({8e6 * msg_len / max(rx_us, 1):.0f} bps)")
+        linda.i2c.deinit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,170 @@
+# Host-side benchmark of the encode/transmit/receive/decode stages
+# Times the real libraries/ code of every stage in wall-clock time over a range of message sizes, and measures
+#   the heap it needs, under CPython or the MicroPython unix port (micropython sim/bench.py), with the modules
+#   here standing in for the MicroPython ones. Prints one JSON object per stage and size:
+#   {"impl": ..., "stage": ..., "bytes": ..., "bps": message bytes per second, "heap": bytes, "status": ...}
+#   and compares them with the baseline of the same implementation in sim/bench_baseline.json. A stage that
+#   is more than tolerance slower than its baseline, or needs more than tolerance and BENCH_HEAP_SLACK
+#   more heap, fails, and the run exits with status 1
+# heap is the peak above what was allocated before the stage under CPython (tracemalloc), and everything the
+#   stage allocates with the garbage collector off under MicroPython, which has no peak counter
+# A full sweep takes about five minutes under CPython, mostly tracing the FEC decoder's heap use
+#
+# Usage: python sim/bench.py [sizes=64,1024,16384,65536] [stages=name,...] [tolerance=0.5] [save=0|1] [seed=n]
+#   save=1 writes the results as the new baseline of this implementation instead of checking them
+import sys
+
+_SIM_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _SIM_DIR + '/../libraries')
+sys.path.insert(0, _SIM_DIR)
+
+import gc
+import json
+import random
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython
+    from time import perf_counter_ns
+
+    def ticks_us() -> int:
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        return ticks1 - ticks2
+
+try:
+    import tracemalloc
+except ImportError:  # MicroPython unix port
+    tracemalloc = None
+
+import membuffer
+from benchstages import BENCH_STAGES
+
+BENCH_BASELINE = _SIM_DIR + '/bench_baseline.json'
+# Every stage runs for at least this long per size, repeating it if needs be
+BENCH_MIN_US = 200_000
+# Heap allowed above the baseline on top of the tolerance, for allocator noise
+BENCH_HEAP_SLACK = 256
+
+
+class _Discard:
+    # Takes the place of the console for MemoryBuffer._print_data_ascii()
+    def write(self, text) -> int:
+        return len(text)
+
+
+def _heap(run) -> int:
+    """
+    Returns:
+        int: Heap bytes one run of the operation needs
+    """
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - before
+    gc.disable()
+    before = gc.mem_alloc()
+    run()
+    used = gc.mem_alloc() - before
+    gc.enable()
+    return used
+
+def _throughput(run, size: int) -> int:
+    """
+    Returns:
+        int: Message bytes per second, over as many runs as take BENCH_MIN_US
+    """
+    runs = 0
+    start = ticks_us()
+    elapsed = 0
+    while elapsed < BENCH_MIN_US:
+        run()
+        runs += 1
+        elapsed = ticks_diff(ticks_us(), start)
+    return 1_000_000 * size * runs // max(elapsed, 1)
+
+def measure(stage: str, size: int, seed: int) -> dict:
+    random.seed(seed)
+    run = BENCH_STAGES[stage](size)
+    # A first run fills the caches, e.g. the compressor's hash tables, so the heap is the same in any order
+    run()
+    heap = _heap(run)
+    return {'impl': sys.implementation.name, 'stage': stage, 'bytes': size, 'bps': _throughput(run, size),
+            'heap': heap}
+
+def check(result: dict, baseline: dict, tolerance: float) -> str:
+    """
+    Returns:
+        str: 'ok', 'no baseline', or what regressed
+    """
+    expected = baseline.get(result['stage'], {}).get(str(result['bytes']))
+    if expected is None:
+        return 'no baseline'
+    problems = []
+    if result['bps'] < expected['bps'] * (1 - tolerance):
+        problems.append(f"SLOWER than {expected['bps']} bps")
+    if result['heap'] > expected['heap'] * (1 + tolerance) + BENCH_HEAP_SLACK:
+        problems.append(f"MORE HEAP than {expected['heap']} B")
+    return ', '.join(problems) if problems else 'ok'
+
+def _load_baselines() -> dict:
+    try:
+        with open(BENCH_BASELINE) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def _save_baseline(baselines: dict, results: list) -> None:
+    baseline = baselines.setdefault(sys.implementation.name, {})
+    for result in results:
+        baseline.setdefault(result['stage'], {})[str(result['bytes'])] = {'bps': result['bps'], 'heap': result['heap']}
+    with open(BENCH_BASELINE, 'w') as f:
+        try:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        except TypeError:  # MicroPython's json takes no formatting options
+            json.dump(baselines, f)
+        f.write('\n')
+
+def _parse_args(argv: list) -> dict:
+    args = {'sizes': '64,1024,16384,65536', 'stages': ','.join(BENCH_STAGES), 'tolerance': '0.5', 'save': '0',
+            'seed': '1'}
+    for arg in argv:
+        key, _, value = arg.partition('=')
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    for stage in args['stages'].split(','):
+        if stage not in BENCH_STAGES:
+            raise SystemExit(f"Unknown stage {stage}, expected one of {', '.join(BENCH_STAGES)}")
+    return args
+
+def main(argv: list) -> None:
+    args = _parse_args(argv)
+    save = args['save'] == '1'
+    tolerance = float(args['tolerance'])
+    baselines = _load_baselines()
+    baseline = baselines.get(sys.implementation.name, {})
+    # The printing stage writes to the console through membuffer.stdout
+    membuffer.stdout = _Discard()
+    results = []
+    failed = False
+    for stage in args['stages'].split(','):
+        for size in (int(size) for size in args['sizes'].split(',')):
+            result = measure(stage, size, int(args['seed']))
+            result['status'] = 'saved' if save else check(result, baseline, tolerance)
+            failed |= result['status'] not in ('ok', 'no baseline', 'saved')
+            results.append(result)
+            print(json.dumps(result))
+    if save:
+        _save_baseline(baselines, results)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
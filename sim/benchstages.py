@@ -0,0 +1,192 @@
+# Stages of the encode/transmit/receive/decode benchmark, see bench.py
+# Each stage takes the message size, does its setup and returns the operation to measure, which handles a
+#   whole message of that size
+import random
+from array import array
+
+from memory import InboxBuffer, OutboxBuffer
+from laser import LindaLaser
+from rxedge import RX_EDGE_RING_SIZE, RX_EDGE_RING_MASK
+from encoding import hamming_encode_into, hamming_decode_into
+from asciicode import _encode_ascii, _decode_ascii, binary_list_to_string
+from framing import FrameWriter, FRAME_MAX_PAYLOAD, FRAME_FLAG_LAST
+from framedec import FrameDecoder
+from fec import FEC_MAX_DATA
+from feccodec import FecCodec
+from compression import LZSSCompressor
+from decompress import decompress_frame
+from sample import pipe as SAMPLE_TEXT
+from vclock import TICKS_MASK
+
+
+def _text(size: int) -> str:
+    text = SAMPLE_TEXT * (size // len(SAMPLE_TEXT) + 1)
+    return text[:size]
+
+def _stage_encode_ascii(size: int):
+    text = _text(size)
+    return lambda: _encode_ascii(text)
+
+def _stage_decode_ascii(size: int):
+    encoded_mv = memoryview(_encode_ascii(_text(size)))
+    return lambda: _decode_ascii(encoded_mv)
+
+def _stage_binary_list_to_string(size: int):
+    data = _text(size).encode('ascii')
+    bits = [(byte >> (7 - idx)) & 1 for byte in data for idx in range(8)]
+    return lambda: binary_list_to_string(bits)
+
+def _stage_read_ascii(size: int):
+    text = _text(size)
+    outbox = OutboxBuffer(size)
+    return lambda: outbox._read_ascii(text)
+
+def _stage_print_data_ascii(size: int):
+    outbox = OutboxBuffer(size)
+    outbox._read_ascii(_text(size))
+    return lambda: outbox._print_data_ascii()
+
+def _stage_hamming_encode(size: int):
+    data_mv = memoryview(bytes(random.getrandbits(8) for _ in range(size)))
+    encoded = bytearray(2 * size)
+    return lambda: hamming_encode_into(data_mv, encoded)
+
+def _stage_hamming_decode(size: int):
+    encoded = bytearray(2 * size)
+    hamming_encode_into(memoryview(bytes(random.getrandbits(8) for _ in range(size))), encoded)
+    encoded_mv = memoryview(encoded)
+    decoded = bytearray(size)
+    return lambda: hamming_decode_into(encoded_mv, decoded)
+
+def _stage_frame_encode(size: int):
+    data_mv = memoryview(bytes(random.getrandbits(8) for _ in range(size)))
+    writer = FrameWriter()
+    def run():
+        for start in range(0, size, FRAME_MAX_PAYLOAD):
+            writer.prepare(data_mv[start:start + FRAME_MAX_PAYLOAD])
+    return run
+
+def _stage_frame_decode(size: int):
+    # The bits of every frame of the message as the receiver sees them, one byte per bit
+    data = bytes(random.getrandbits(8) for _ in range(size))
+    writer = FrameWriter()
+    wire = bytearray()
+    for start in range(0, size, FRAME_MAX_PAYLOAD):
+        payload = data[start:start + FRAME_MAX_PAYLOAD]
+        writer.prepare(payload, FRAME_FLAG_LAST if start + FRAME_MAX_PAYLOAD >= size else 0)
+        wire.extend(writer.head + payload + writer.tail)
+    bits = bytes((byte >> (7 - idx)) & 1 for byte in wire for idx in range(8))
+    decoder = FrameDecoder()
+    def run():
+        push_bit = decoder.push_bit
+        for bit in bits:
+            push_bit(bit)
+    return run
+
+def _stage_transmit(size: int):
+    # Every frame of the message through the transmit loop, clocked out by the simulated machine.bitstream()
+    laser = LindaLaser(InboxBuffer(size), OutboxBuffer(size))
+    data_mv = memoryview(bytes(random.getrandbits(8) for _ in range(size)))
+    def run():
+        for segment_mv in laser._tx_segments(data_mv):
+            laser._transmit_segment(segment_mv)
+    return run
+
+def _stage_receive(size: int):
+    # The edges of every frame of the message as the detector IRQ captures them, drained into the inbox a
+    #   ring at a time
+    data = bytes(random.getrandbits(8) for _ in range(size))
+    tx = LindaLaser(InboxBuffer(size), OutboxBuffer(size))
+    trace = array('d')
+    tx.laser.trace = trace
+    for segment_mv in tx._tx_segments(memoryview(data)):
+        tx._transmit_segment(segment_mv)
+    # Wrapped as ticks_us() wraps them. The detector outputs LOW while it sees the laser
+    ticks = array('i', (int(t) & TICKS_MASK for t in trace))
+    levels = bytes(idx & 1 for idx in range(len(trace)))
+    rx = LindaLaser(InboxBuffer(size), OutboxBuffer(size))
+    def run():
+        rx._reset_edge_rx()
+        ring_ticks = rx._edge_ticks
+        ring_levels = rx._edge_level
+        for start in range(0, len(ticks), RX_EDGE_RING_SIZE - 1):
+            head = rx._edge_head
+            for idx in range(start, min(start + RX_EDGE_RING_SIZE - 1, len(ticks))):
+                ring_ticks[head] = ticks[idx]
+                ring_levels[head] = levels[idx]
+                head = (head + 1) & RX_EDGE_RING_MASK
+            rx._edge_head = head
+            rx._drain_edges()
+    run()
+    if bytes(rx.inbox.view()) != data:
+        raise SystemExit("The receive stage didn't receive the message")
+    return run
+
+def _stage_fec_encode(size: int):
+    data_mv = memoryview(bytes(random.getrandbits(8) for _ in range(size)))
+    fec = FecCodec()
+    coded = bytearray(FRAME_MAX_PAYLOAD)
+    def run():
+        for start in range(0, size, FEC_MAX_DATA):
+            fec.encode_into(data_mv[start:start + FEC_MAX_DATA], coded)
+    return run
+
+def _stage_fec_decode(size: int):
+    fec = FecCodec()
+    coded = bytearray(FRAME_MAX_PAYLOAD)
+    frames = []
+    for start in range(0, size, FEC_MAX_DATA):
+        chunk = bytes(random.getrandbits(8) for _ in range(min(FEC_MAX_DATA, size - start)))
+        length = fec.encode_into(memoryview(chunk), coded)
+        soft = bytes(0xFF if (coded[idx >> 3] >> (7 - (idx & 7))) & 1 else 0 for idx in range(8 * length))
+        frames.append((memoryview(soft), length))
+    decoded = bytearray(FEC_MAX_DATA + 2)
+    def run():
+        for soft_mv, length in frames:
+            fec.decode_into(soft_mv, length, decoded)
+    return run
+
+def _stage_compress(size: int):
+    text_mv = memoryview(_text(size).encode('ascii'))
+    compressor = LZSSCompressor()
+    packed = bytearray(FRAME_MAX_PAYLOAD)
+    def run():
+        start = 0
+        while start < size:
+            start += compressor.compress(text_mv, start, packed)[0]
+    return run
+
+def _stage_decompress(size: int):
+    text_mv = memoryview(_text(size).encode('ascii'))
+    compressor = LZSSCompressor()
+    packed = bytearray(FRAME_MAX_PAYLOAD)
+    blocks = []
+    start = 0
+    while start < size:
+        consumed, length = compressor.compress(text_mv, start, packed)
+        blocks.append(memoryview(bytes(packed[:length])))
+        start += consumed
+    unpacked_mv = memoryview(bytearray(size))
+    def run():
+        for block_mv in blocks:
+            decompress_frame(block_mv, unpacked_mv)
+    return run
+
+# In pipeline order
+BENCH_STAGES = {
+    'read_ascii': _stage_read_ascii,
+    'encode_ascii': _stage_encode_ascii,
+    'compress': _stage_compress,
+    'hamming_encode': _stage_hamming_encode,
+    'fec_encode': _stage_fec_encode,
+    'frame_encode': _stage_frame_encode,
+    'transmit': _stage_transmit,
+    'receive': _stage_receive,
+    'frame_decode': _stage_frame_decode,
+    'fec_decode': _stage_fec_decode,
+    'hamming_decode': _stage_hamming_decode,
+    'decompress': _stage_decompress,
+    'decode_ascii': _stage_decode_ascii,
+    'binary_list_to_string': _stage_binary_list_to_string,
+    'print_data_ascii': _stage_print_data_ascii,
+}
@@ -0,0 +1,111 @@
+# Free-space optical channel model applied to a recorded laser pulse train
+from array import array
+from math import cos, log, pi, sqrt
+import random
+
+
+class Channel:
+    def __init__(self, jitter_us: float=0.0, dropout: float=0.0, burst_rate_hz: float=0.0,
+                 burst_us: float=0.0, skew_ppm: float=0.0, stretch_us: float=0.0, drift_us_per_s: float=0.0,
+                 seed=None) -> None:
+        """
+        Impairments applied between the transmitting laser and the receiving detector
+
+        Args:
+            jitter_us (float, optional): Standard deviation of Gaussian jitter added to every edge. Defaults to 0.
+            dropout (float, optional): Probability that any single pulse is lost. Defaults to 0.
+            burst_rate_hz (float, optional): Mean rate of burst errors (beam wobble, sunlight, a hand in the beam),
+                during which the detector sees light continuously. Defaults to 0.
+            burst_us (float, optional): Duration of each burst error. Defaults to 0.
+            skew_ppm (float, optional): Receiver clock error relative to the transmitter, in ppm. Defaults to 0.
+            stretch_us (float, optional): Added to every pulse width, e.g. a detector slower to turn off than on.
+                Negative values shorten the pulses. Defaults to 0.
+            drift_us_per_s (float, optional): Further change of the pulse widths per second of transmission, e.g.
+                as the laser and detector warm up. Defaults to 0.
+            seed (int, optional): Random seed for reproducible runs. Defaults to None.
+        """
+        self.jitter_us = jitter_us
+        self.dropout = dropout
+        self.burst_rate_hz = burst_rate_hz
+        self.burst_us = burst_us
+        self.skew_ppm = skew_ppm
+        self.stretch_us = stretch_us
+        self.drift_us_per_s = drift_us_per_s
+        if seed is not None:
+            random.seed(seed)
+
+    def __repr__(self) -> str:
+        return f"Channel(jitter={self.jitter_us}us, dropout={self.dropout}, bursts={self.burst_rate_hz}Hz x " \
+               f"{self.burst_us}us, skew={self.skew_ppm}ppm, stretch={self.stretch_us}us{self.drift_us_per_s:+}us/s)"
+
+    def apply(self, edges: array) -> array:
+        """
+        Pass a pulse train through the channel
+
+        Args:
+            edges (array): Laser on/off transition times in us, starting with the laser turning on
+
+        Returns:
+            array: Light on/off transition times in us as seen by the detector
+        """
+        scale = 1 + self.skew_ppm * 1e-6
+        received = array('d')
+        for idx in range(0, len(edges) - 1, 2):
+            if self.dropout and random.random() < self.dropout:
+                continue
+            on = edges[idx] * scale + self._jitter()
+            off = edges[idx + 1] * scale + self._jitter() + self.stretch_us + self.drift_us_per_s * edges[idx] * 1e-6
+            if off <= on:
+                continue
+            if len(received) and on <= received[-1]:
+                # Jitter pushed two pulses together, the detector sees one
+                if off > received[-1]:
+                    received[-1] = off
+                continue
+            received.append(on)
+            received.append(off)
+        if self.burst_rate_hz and self.burst_us and len(received):
+            received = _union(received, self._bursts(received[-1]))
+        return received
+
+    def _jitter(self) -> float:
+        if not self.jitter_us:
+            return 0.0
+        # Box-Muller, the MicroPython random module has no gauss()
+        u1 = 1.0 - random.random()
+        return self.jitter_us * sqrt(-2.0 * log(u1)) * cos(2 * pi * random.random())
+
+    def _bursts(self, end_us: float) -> array:
+        bursts = array('d')
+        mean_gap_us = 1000000 / self.burst_rate_hz
+        now = 0.0
+        while True:
+            now += -log(1.0 - random.random()) * mean_gap_us
+            if now >= end_us:
+                return bursts
+            bursts.append(now)
+            bursts.append(now + self.burst_us)
+            now += self.burst_us
+
+
+def _union(first: array, second: array) -> array:
+    """
+    Merge two sorted lists of on/off intervals into the intervals where either is on
+    """
+    merged = array('d')
+    i = 0
+    j = 0
+    while i < len(first) or j < len(second):
+        if j >= len(second) or (i < len(first) and first[i] <= second[j]):
+            on, off = first[i], first[i + 1]
+            i += 2
+        else:
+            on, off = second[j], second[j + 1]
+            j += 2
+        if len(merged) and on <= merged[-1]:
+            if off > merged[-1]:
+                merged[-1] = off
+        else:
+            merged.append(on)
+            merged.append(off)
+    return merged
@@ -0,0 +1,103 @@
+# Simulated I2C bus of the machine module, controllers and memory-mode targets on the virtual clock
+from vclock import clock
+
+# Simulated I2C targets, by (bus id, address), reached by the controllers on the same bus
+_i2c_targets = {}
+
+
+class I2C:
+    def __init__(self, id, scl=None, sda=None, freq: int=400_000) -> None:
+        """
+        Simulated I2C controller. Transfers reach the I2CTargets made on the same bus id, and take their
+        bus time at freq in virtual time: 9 clocks per byte, plus 2 for each start and stop condition
+        """
+        self.id = id
+        self.freq = freq
+
+    def scan(self) -> list:
+        return sorted(addr for bus, addr in _i2c_targets if bus == self.id)
+
+    def _target(self, addr: int):
+        target = _i2c_targets.get((self.id, addr))
+        if target is None:
+            # No ACK to the address byte, like MicroPython's OSError: [Errno 19] ENODEV
+            raise OSError(19)
+        return target
+
+    def _clock(self, nbytes: int, conditions: int=2) -> None:
+        clock.advance((9 * nbytes + 2 * conditions) * 1000000 / self.freq)
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, *, addrsize: int=8) -> None:
+        target = self._target(addr)
+        self._clock(1 + addrsize // 8 + len(buf))
+        target._write(memaddr, addrsize, buf)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, *, addrsize: int=8) -> None:
+        target = self._target(addr)
+        # Address and memory address written, then a repeated start to read
+        self._clock(2 + addrsize // 8 + len(buf), 3)
+        target._read(memaddr, addrsize, buf)
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, *, addrsize: int=8) -> bytes:
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
+        return bytes(buf)
+
+
+class I2CTarget:
+    IRQ_ADDR_MATCH_READ = 0x01
+    IRQ_ADDR_MATCH_WRITE = 0x02
+    IRQ_READ_REQ = 0x04
+    IRQ_WRITE_REQ = 0x08
+    IRQ_END_READ = 0x10
+    IRQ_END_WRITE = 0x20
+
+    def __init__(self, id, addr: int, *, addrsize: int=7, mem=None, mem_addrsize: int=8, scl=None, sda=None) -> None:
+        """
+        Simulated machine.I2CTarget in memory mode only: controllers on the same bus read and write mem
+        at the memory address they send, wrapping around at its end
+        """
+        if mem is None:
+            raise ValueError("only memory mode is simulated")
+        self.id = id
+        self.addr = addr
+        self.mem = memoryview(mem)
+        self.mem_addrsize = mem_addrsize
+        self._handler = None
+        self._trigger = 0
+        self._flags = 0
+        _i2c_targets[(id, addr)] = self
+
+    def deinit(self) -> None:
+        _i2c_targets.pop((self.id, self.addr), None)
+
+    def irq(self, handler=None, trigger: int=IRQ_END_READ | IRQ_END_WRITE, hard: bool=False):
+        if handler is not None:
+            self._handler = handler
+            self._trigger = trigger
+        return self
+
+    def flags(self) -> int:
+        return self._flags
+
+    def _write(self, memaddr: int, addrsize: int, buf) -> None:
+        if addrsize != self.mem_addrsize:
+            raise OSError(5)
+        size = len(self.mem)
+        for idx, byte in enumerate(buf):
+            self.mem[(memaddr + idx) % size] = byte
+        self._event(I2CTarget.IRQ_END_WRITE)
+
+    def _read(self, memaddr: int, addrsize: int, buf) -> None:
+        if addrsize != self.mem_addrsize:
+            raise OSError(5)
+        size = len(self.mem)
+        for idx in range(len(buf)):
+            buf[idx] = self.mem[(memaddr + idx) % size]
+        self._event(I2CTarget.IRQ_END_READ)
+
+    def _event(self, flag: int) -> None:
+        if self._handler is not None and self._trigger & flag:
+            self._flags = flag
+            # Soft IRQ, run once the transfer is over
+            clock.schedule(self._handler, self)
@@ -0,0 +1,196 @@
+# Host-side LINDA link simulator
+# Runs the real libraries/ code against the simulated machine module in virtual time:
+#   transmit_outbox -> recorded pulse train -> Channel -> detector IRQs -> start_rx -> inbox
+#
+# Usage: python sim/linksim.py [bytes=N] [jitter=us] [dropout=p] [burst_rate=hz] [burst_us=us] [skew=ppm] [seed=n]
+#                              [mod=pwm|pwm4|ppm4|manchester] [data=random|text] [compress=0|1] [arq=0|1]
+#                              [fec=0|1] [depth=rows] [stretch=us] [drift=us/s] [scale=%] [adaptive=0|1] [file=0|1]
+#   arq=1 runs a reliable transfer (arq.py), with both nodes linked live in both directions
+#   file=1 sends the message as a file, block by block (filebuffer.py), bytes= may then exceed the buffers
+# Any parameter may be a comma-separated list to sweep it, e.g. jitter=0,100,200,400 or mod=pwm,pwm4
+import sys
+from array import array
+
+_SIM_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _SIM_DIR + '/../libraries')
+sys.path.insert(0, _SIM_DIR)
+
+import random
+
+from vclock import clock
+from channel import Channel
+from laser import LindaLaser, BITSTREAM_TIMING
+from memory import InboxBuffer, OutboxBuffer
+from chipmodes import MODULATIONS
+from fec import FEC_DEPTH
+from livelink import LiveLink, _wall_time
+from sample import pipe as SAMPLE_TEXT
+
+
+class SimLink(LiveLink):
+    def __init__(self, channel: Channel=None, lead_in_us: float=2000.0, buffer_size: int=64000,
+                 modulation: str='pwm', compress: bool=False, fec: bool=False, depth: int=FEC_DEPTH,
+                 timing: tuple=BITSTREAM_TIMING, adaptive: bool=True) -> None:
+        """
+        Connects simulated LindaLaser nodes through a channel model
+
+        Args:
+            channel (Channel, optional): Impairments between laser and detector. Defaults to a perfect channel.
+            lead_in_us (float, optional): Idle time between the receiver starting and the first pulse. Defaults to 2000.
+            buffer_size (int, optional): Inbox/outbox size of nodes made by node(). Defaults to 64000.
+            modulation (str, optional): Key of MODULATIONS used by nodes made by node(). Defaults to 'pwm',
+                binary pulse-width modulation.
+            compress (bool, optional): Nodes made by node() compress what they send. Defaults to False.
+            fec (bool, optional): Nodes made by node() send with forward error correction. Defaults to False.
+            depth (int, optional): FEC interleaver rows of nodes made by node(). Defaults to FEC_DEPTH.
+            timing (tuple, optional): Pulse timing of nodes made by node(), in ns. Defaults to BITSTREAM_TIMING.
+            adaptive (bool, optional): Nodes made by node() track the received pulse widths. Defaults to True.
+        """
+        self.channel = channel
+        self.lead_in_us = lead_in_us
+        self.buffer_size = buffer_size
+        self.modulation = modulation
+        self.compress = compress
+        self.fec = fec
+        self.depth = depth
+        self.timing = timing
+        self.adaptive = adaptive
+
+    def node(self) -> LindaLaser:
+        modulation = MODULATIONS[self.modulation]() if self.modulation in MODULATIONS else None
+        laser = LindaLaser(InboxBuffer(self.buffer_size), OutboxBuffer(self.buffer_size), timing=self.timing,
+                           modulation=modulation)
+        laser.set_adaptive(self.adaptive)
+        laser.set_compression(self.compress)
+        laser.set_fec(self.fec, self.depth)
+        return laser
+
+    def capture(self, tx: LindaLaser, msg_len: int=-1) -> array:
+        """
+        Run transmit_outbox() on a node and record the pulse train its laser produced
+
+        Returns:
+            array: Laser on/off transition times in us, relative to the start of the transmission
+        """
+        trace = array('d')
+        tx.laser.trace = trace
+        start = clock.now
+        tx.transmit_outbox(msg_len)
+        tx.laser.trace = None
+        return array('d', (t - start for t in trace))
+
+    def deliver(self, rx: LindaLaser, edges: array, start_us: float) -> None:
+        """
+        Queue a pulse train on a node's detector. The detector outputs LOW while it sees light
+        """
+        clock.feed(rx.detector, array('d', (start_us + t for t in edges)), start_level=1)
+
+    def transfer(self, tx: LindaLaser, rx: LindaLaser, msg_len: int=-1) -> dict:
+        """
+        Send tx's outbox to rx's inbox over the channel
+
+        Returns:
+            dict: Link statistics for the transfer
+        """
+        edges = self.capture(tx, msg_len)
+        if self.channel is not None:
+            edges = self.channel.apply(edges)
+        link_us = edges[-1] if len(edges) else 0.0
+        self.deliver(rx, edges, clock.now + self.lead_in_us)
+        wall_start = _wall_time()
+        rx.start_rx()
+        wall_s = _wall_time() - wall_start
+        return self._stats(tx, rx, msg_len, link_us, wall_s)
+
+    def _stats(self, tx: LindaLaser, rx: LindaLaser, msg_len: int, link_us: float, wall_s: float,
+               sent_data=None, received_data=None) -> dict:
+        sent = len(tx.outbox) if msg_len < 0 else msg_len
+        # What was sent and what arrived, the outbox and inbox unless given
+        if sent_data is None:
+            sent_data = tx.outbox.view(0, sent)
+        if received_data is None:
+            received_data = rx.inbox.view()
+        errors = bit_errors(sent_data, received_data)
+        # Message bytes that arrived intact, the measure of what got through a lossy link
+        good = sum(1 for a, b in zip(sent_data, received_data) if a == b)
+        return {
+            'sent_bytes': sent,
+            'received_bytes': len(received_data),
+            'bit_errors': errors,
+            'ber': errors / (8 * sent) if sent else 0.0,
+            'link_s': link_us / 1000000,
+            'bps': 8 * sent / (link_us / 1000000) if link_us else 0.0,
+            'good_bps': 8 * good / (link_us / 1000000) if link_us else 0.0,
+            'wall_s': wall_s,
+            'speedup': link_us / 1000000 / wall_s if wall_s else 0.0,
+            'rx_overflows': rx.rx_overflows,
+            'rx_invalid': rx.rx_invalid,
+            'frames_ok': rx.frame_decoder.frames_ok,
+            'frames_bad': rx.frame_decoder.frames_bad,
+            'fec_fixed': rx.fec.frames_fixed,
+        }
+
+
+def bit_errors(sent, received) -> int:
+    """
+    Count differing bits between two byte buffers, missing or extra bytes count as 8 errors each
+    """
+    errors = 8 * abs(len(sent) - len(received))
+    for idx in range(min(len(sent), len(received))):
+        diff = sent[idx] ^ received[idx]
+        while diff:
+            diff &= diff - 1
+            errors += 1
+    return errors
+
+def _parse_args(argv: list) -> dict:
+    args = {'bytes': '256', 'jitter': '0', 'dropout': '0', 'burst_rate': '0', 'burst_us': '0',
+            'skew': '0', 'seed': '1', 'mod': 'pwm', 'data': 'random', 'compress': '0', 'arq': '0',
+            'fec': '0', 'depth': str(FEC_DEPTH), 'stretch': '0', 'drift': '0', 'scale': '100', 'adaptive': '1',
+            'file': '0'}
+    for arg in argv:
+        key, _, value = arg.partition('=')
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    return args
+
+def _sweep(args: dict) -> list:
+    # Cartesian product of every comma-separated option
+    runs = [{}]
+    for key, value in args.items():
+        runs = [dict(run, **{key: v if key in ('mod', 'data') else float(v)}) for run in runs for v in value.split(',')]
+    return runs
+
+def main(argv: list) -> None:
+    for run in _sweep(_parse_args(argv)):
+        clock.reset()
+        random.seed(int(run['seed']))
+        channel = Channel(jitter_us=run['jitter'], dropout=run['dropout'], burst_rate_hz=run['burst_rate'],
+                          burst_us=run['burst_us'], skew_ppm=run['skew'], stretch_us=run['stretch'],
+                          drift_us_per_s=run['drift'])
+        timing = tuple(int(t * run['scale'] / 100) for t in BITSTREAM_TIMING)
+        link = SimLink(channel, modulation=run['mod'], compress=bool(run['compress']), fec=bool(run['fec']),
+                       depth=int(run['depth']), timing=timing, adaptive=bool(run['adaptive']))
+        tx = link.node()
+        rx = link.node()
+        msg_len = int(run['bytes'])
+        if run['data'] == 'text':
+            text = SAMPLE_TEXT.encode('ascii')
+            message = (text * (msg_len // len(text) + 1))[:msg_len]
+        else:
+            message = bytes(random.getrandbits(8) for _ in range(msg_len))
+        if run['file']:
+            stats = link.transfer_file(tx, rx, message, bool(run['arq']))
+        else:
+            tx.outbox.write(message)
+            stats = link.transfer_reliable(tx, rx) if run['arq'] else link.transfer(tx, rx)
+        print(f"{run['mod']}{'' if run['scale'] == 100 else ' at ' + str(run['scale']) + '%'}{'' if run['adaptive'] else ' static'}{' compressed' if run['compress'] else ''}{' arq' if run['arq'] else ''}{' fec' if run['fec'] else ''}{' file' if run['file'] else ''} {channel}: {stats['sent_bytes']} B -> {stats['received_bytes']} B, "
+              f"{stats['bit_errors']} bit errors (BER {stats['ber']:.2e}), {stats['bps']:.0f} bps ({stats['good_bps']:.0f} intact), "
+              f"{stats['link_s']:.2f} s link in {stats['wall_s']:.2f} s ({stats['speedup']:.0f}x real time), "
+              f"{stats['frames_ok']} frames ok ({stats['fec_fixed']} fixed by FEC), {stats['frames_bad']} dropped, "
+              f"{stats['rx_overflows']} overflows, {stats['rx_invalid']} invalid pulses")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
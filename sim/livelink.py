@@ -0,0 +1,105 @@
+# Live exchanges of the link simulator
+# Mixed into SimLink (linksim.py): both nodes run at once on the virtual clock, each laser linked to the other
+#   node's detector through the channel as it transmits, for the transfers that go both ways
+import os
+import tempfile
+from array import array
+
+import uasyncio as asyncio
+from vclock import clock
+from laser import LindaLaser
+from arq import send_reliable
+from arqrx import receive_reliable
+from filebuffer import FileOutbox, FileInbox
+from filexfer import send_file, receive_file
+
+try:
+    from time import perf_counter as _wall_time
+except ImportError:  # MicroPython unix port
+    from time import time as _wall_time
+
+
+class LiveLink:
+    def connect(self, tx: LindaLaser, rx: LindaLaser) -> None:
+        """
+        Link tx's laser to rx's detector live through the channel, for exchanges that go both ways
+        """
+        def relay(edges: array) -> None:
+            start = edges[0]
+            received = array('d', (t - start for t in edges))
+            if self.channel is not None:
+                received = self.channel.apply(received)
+            self.deliver(rx, received, start)
+        tx.laser.link = relay
+        rx.detector.remote = True
+
+    def _unlink(self, *nodes) -> None:
+        for node in nodes:
+            node.laser.link = None
+            node.detector.remote = False
+
+    def transfer_reliable(self, tx: LindaLaser, rx: LindaLaser, msg_len: int=-1) -> dict:
+        """
+        Send tx's outbox to rx's inbox with selective-repeat ARQ, acknowledgements going back over the channel
+
+        Returns:
+            dict: Link statistics for the transfer, link_s and bps cover the whole exchange
+        """
+        self.connect(tx, rx)
+        self.connect(rx, tx)
+        sent = len(tx.outbox) if msg_len < 0 else msg_len
+
+        # The transfer is over for the sender once its last burst is acknowledged, the receiver lingers on
+        finished = []
+
+        async def exchange() -> None:
+            receiver = asyncio.create_task(receive_reliable(rx))
+            await asyncio.sleep_ms(int(self.lead_in_us // 1000))
+            await send_reliable(tx, tx.outbox.view(0, sent))
+            finished.append(clock.now)
+            await receiver
+
+        start = clock.now
+        wall_start = _wall_time()
+        asyncio.run(exchange())
+        wall_s = _wall_time() - wall_start
+        self._unlink(tx, rx)
+        return self._stats(tx, rx, msg_len, finished[0] - start, wall_s)
+
+    def transfer_file(self, tx: LindaLaser, rx: LindaLaser, data: bytes, reliable: bool=False) -> dict:
+        """
+        Send data from a file on tx to a file on rx, block by block, with the two nodes linked live. With
+        reliable, every block goes with selective-repeat ARQ
+
+        Returns:
+            dict: Link statistics for the transfer, link_s and bps cover the whole exchange
+        """
+        self.connect(tx, rx)
+        if reliable:
+            self.connect(rx, tx)
+        finished = []
+        with tempfile.TemporaryDirectory() as directory:
+            tx_path = os.path.join(directory, 'tx.bin')
+            rx_path = os.path.join(directory, 'rx.bin')
+            with open(tx_path, 'wb') as f:
+                f.write(data)
+            outbox = FileOutbox(tx_path)
+            inbox = FileInbox(rx_path)
+
+            async def exchange() -> None:
+                receiver = asyncio.create_task(receive_file(rx, inbox, reliable=reliable))
+                await asyncio.sleep_ms(int(self.lead_in_us // 1000))
+                await send_file(tx, outbox, reliable=reliable)
+                finished.append(clock.now)
+                await receiver
+
+            start = clock.now
+            wall_start = _wall_time()
+            asyncio.run(exchange())
+            wall_s = _wall_time() - wall_start
+            received = b''
+            if os.path.exists(rx_path):
+                with open(rx_path, 'rb') as f:
+                    received = f.read()
+        self._unlink(tx, rx)
+        return self._stats(tx, rx, len(data), finished[0] - start, wall_s, data, received)
@@ -0,0 +1,142 @@
+# Simulated machine module for running LINDA off-board on the virtual clock
+from array import array
+
+from vclock import clock
+# The I2C bus lives in i2cbus.py, machine.I2C and machine.I2CTarget are what the firmware imports
+from i2cbus import I2C, I2CTarget
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode: int=-1, pull: int=-1, value=None) -> None:
+        self.id = id
+        self.mode = mode
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        if value is not None:
+            self._value = 1 if value else 0
+        self._handler = None
+        self._trigger = 0
+        # Output pins record their rising/falling edge times here when set to an array('d')
+        self.trace = None
+        # Output pins hand the pulse train of every bitstream() call to link(edges) when set, before it is
+        #   clocked out, e.g. to feed another node's detector live
+        self.link = None
+        # Input pins driven by another simulated board, whose IRQs disable_irq() on this one can't hold back
+        self.remote = False
+
+    def __repr__(self) -> str:
+        return f"Pin({self.id})"
+
+    def value(self, level=None):
+        if level is None:
+            return self._value
+        self._set(1 if level else 0)
+
+    def on(self) -> None:
+        self._set(1)
+
+    def off(self) -> None:
+        self._set(0)
+
+    high = on
+    low = off
+
+    def toggle(self) -> None:
+        self._set(1 - self._value)
+
+    def irq(self, handler=None, trigger: int=IRQ_FALLING | IRQ_RISING, hard: bool=False):
+        self._handler = handler
+        self._trigger = trigger
+
+    def _set(self, level: int) -> None:
+        # Driven by the firmware -- record the edge if this output is being traced
+        if level != self._value and self.trace is not None:
+            self.trace.append(clock.now)
+        self._value = level
+
+    def _drive(self, level: int) -> None:
+        # Driven from outside (a queued waveform) -- fire the IRQ if the edge matches its trigger
+        if level == self._value:
+            return
+        self._value = level
+        if self._handler is not None and self._trigger & (Pin.IRQ_RISING if level else Pin.IRQ_FALLING):
+            clock.irq(self._handler, self)
+
+
+def bitstream(pin: Pin, encoding: int, timing, buf) -> None:
+    """
+    Simulated machine.bitstream(). Records the high-low pulse train on a traced pin and blocks for
+    its duration in virtual time
+    """
+    if encoding != 0:
+        raise ValueError("only encoding 0 is supported")
+    # Timing is given in ns, the virtual clock runs in us
+    high_0, low_0, high_1, low_1 = (t / 1000 for t in timing)
+    trace = pin.trace
+    edges = array('d') if pin.link is not None else None
+    start = clock.now
+    now = start
+    for byte in buf:
+        for shift in range(7, -1, -1):
+            if (byte >> shift) & 1:
+                high, low = high_1, low_1
+            else:
+                high, low = high_0, low_0
+            if trace is not None and high > 0:
+                if len(trace) and trace[-1] == now:
+                    # Zero-length low between two highs, merge them into one pulse
+                    trace.pop()
+                else:
+                    trace.append(now)
+                trace.append(now + high)
+            if edges is not None and high > 0:
+                if len(edges) and edges[-1] == now:
+                    edges.pop()
+                else:
+                    edges.append(now)
+                edges.append(now + high)
+            now += high + low
+    if edges:
+        pin.link(edges)
+    pin._value = 0
+    clock.advance_to(now)
+
+def time_pulse_us(pin: Pin, pulse_level: int, timeout_us: int=1000000) -> int:
+    """
+    Simulated machine.time_pulse_us() using the queued waveform of the pin
+    """
+    start = clock.now
+    if pin.value() != pulse_level:
+        start = clock.next_change(pin, clock.now, pulse_level)
+        if start is None or start - clock.now > timeout_us:
+            clock.now += timeout_us
+            return -2
+    end = clock.next_change(pin, start, 1 - pulse_level)
+    if end is None or end - start > timeout_us:
+        clock.now = start + timeout_us
+        return -1
+    clock.now = end
+    return int(end - start)
+
+def disable_irq() -> bool:
+    state = clock.irq_enabled
+    clock.irq_enabled = False
+    return state
+
+def enable_irq(state: bool=True) -> None:
+    clock.irq_enabled = state
+    if state:
+        clock.release_irqs()
+
+def freq(hz=None) -> int:
+    return 125_000_000
+
+def idle() -> None:
+    clock.advance(clock.spin_step_us)
@@ -0,0 +1,21 @@
+# Simulated micropython module
+from vclock import clock
+
+
+def const(value):
+    return value
+
+def schedule(func, arg) -> None:
+    clock.schedule(func, arg)
+
+def native(func):
+    return func
+
+def viper(func):
+    return func
+
+def alloc_emergency_exception_buf(size: int) -> None:
+    pass
+
+def mem_info(verbose: int=0) -> None:
+    pass
@@ -0,0 +1,24 @@
+# Simulated neopixel module
+
+
+class NeoPixel:
+    def __init__(self, pin, n: int, bpp: int=3, timing: int=1) -> None:
+        self.pin = pin
+        self.n = n
+        self._pixels = [(0,) * bpp for _ in range(n)]
+
+    def __setitem__(self, idx: int, color) -> None:
+        self._pixels[idx] = color
+
+    def __getitem__(self, idx: int):
+        return self._pixels[idx]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def fill(self, color) -> None:
+        for idx in range(self.n):
+            self._pixels[idx] = color
+
+    def write(self) -> None:
+        pass
@@ -0,0 +1,79 @@
+# Simulated uasyncio: CPython asyncio running on the virtual clock
+# The event loop reads time from the virtual clock, and instead of blocking in select() it advances
+# virtual time, delivering queued pin waveforms (and their IRQs) until a task becomes runnable
+import asyncio as _asyncio
+import selectors
+
+from asyncio import CancelledError, Event, Lock, TimeoutError, create_task, gather, sleep, wait_for
+
+from vclock import clock
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    def __init__(self) -> None:
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        if timeout is None or timeout > 0:
+            end = None if timeout is None else clock.now + timeout * 1000000
+            # Stop early if an IRQ made a task runnable (e.g. a ThreadSafeFlag was set)
+            while not self.loop._ready:
+                next_event = clock.next_event()
+                if end is None and next_event is None:
+                    raise RuntimeError("Simulation deadlock: every task is waiting and no input is queued")
+                target = end if next_event is None else (next_event if end is None else min(next_event, end))
+                clock.advance_to(target)
+                if end is not None and clock.now >= end:
+                    break
+        return super().select(0)
+
+
+class _VirtualEventLoop(_asyncio.SelectorEventLoop):
+    def __init__(self) -> None:
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+
+    def time(self) -> float:
+        return clock.now / 1000000
+
+
+class ThreadSafeFlag:
+    """
+    Flag that can be set from an IRQ handler and awaited by a single task
+    """
+    def __init__(self) -> None:
+        self._event = Event()
+
+    def set(self) -> None:
+        self._event.set()
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    async def wait(self) -> None:
+        await self._event.wait()
+        self._event.clear()
+
+
+async def sleep_ms(ms: int) -> None:
+    await sleep(ms / 1000)
+
+async def wait_for_ms(awaitable, timeout_ms: int):
+    return await wait_for(awaitable, timeout_ms / 1000)
+
+def new_event_loop():
+    loop = _VirtualEventLoop()
+    _asyncio.set_event_loop(loop)
+    return loop
+
+def get_event_loop():
+    return new_event_loop()
+
+def run(coro):
+    loop = new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -0,0 +1,30 @@
+# Simulated utime running on the virtual clock
+from vclock import clock, TICKS_MASK, TICKS_PERIOD
+
+
+def ticks_us() -> int:
+    # Polling outside an IRQ lets virtual time pass, so busy-wait loops terminate
+    if not clock.in_irq:
+        clock.advance(clock.spin_step_us)
+    return int(clock.now) & TICKS_MASK
+
+def ticks_ms() -> int:
+    if not clock.in_irq:
+        clock.advance(clock.spin_step_us)
+    return int(clock.now // 1000) & TICKS_MASK
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    half = TICKS_PERIOD // 2
+    return ((ticks1 - ticks2 + half) & TICKS_MASK) - half
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & TICKS_MASK
+
+def sleep_us(us: int) -> None:
+    clock.advance(us)
+
+def sleep_ms(ms: int) -> None:
+    clock.advance(ms * 1000)
+
+def sleep(seconds: float) -> None:
+    clock.advance(seconds * 1000000)
@@ -0,0 +1,130 @@
+# Virtual time base shared by the simulated machine, utime and micropython modules
+import heapq
+
+# MicroPython ticks_us() wraps at 2^30
+TICKS_PERIOD = 1 << 30
+TICKS_MASK = TICKS_PERIOD - 1
+
+
+class VirtualClock:
+    def __init__(self, spin_step_us: float=50.0) -> None:
+        """
+        Discrete-event virtual clock. Input waveforms are queued per pin and delivered in time order
+        whenever simulated code lets time pass (ticks_us polling, sleep, bitstream)
+
+        Args:
+            spin_step_us (float, optional): Virtual time consumed by each ticks_us() call outside of an IRQ,
+                so busy-wait loops make progress. Defaults to 50.
+        """
+        self.now = 0.0
+        self.spin_step_us = spin_step_us
+        self.irq_enabled = True
+        self.in_irq = False
+        self._heap = []
+        self._seq = 0
+        self._pending_irqs = []
+        self._scheduled = []
+
+    def reset(self) -> None:
+        self.__init__(self.spin_step_us)
+
+    def feed(self, pin, times, start_level: int=1) -> None:
+        """
+        Queue a waveform on an input pin. The level toggles at every time in the sequence
+
+        Args:
+            pin (Pin): Simulated input pin to drive
+            times (_sequence_): Increasing absolute transition times in microseconds, e.g. an array('d')
+            start_level (int, optional): Level before the first transition. Defaults to 1 (detector idle HIGH).
+        """
+        self._push(_Waveform(pin, times, start_level))
+
+    def _push(self, wave) -> None:
+        if wave.idx < len(wave.times):
+            self._seq += 1
+            heapq.heappush(self._heap, (wave.times[wave.idx], self._seq, wave))
+
+    def next_change(self, pin, after: float, level: int):
+        """
+        Look ahead in the queued waveforms of a pin for the first transition to the given level
+
+        Returns:
+            float: Time of the transition, or None if nothing is queued
+        """
+        for _, _, wave in self._heap:
+            if wave.pin is pin:
+                for idx in range(wave.idx, len(wave.times)):
+                    if wave.times[idx] >= after and wave.level_after(idx) == level:
+                        return wave.times[idx]
+        return None
+
+    def advance_to(self, when: float) -> None:
+        """
+        Move virtual time forward, delivering every queued pin transition up to that time
+        """
+        while self._heap and self._heap[0][0] <= when:
+            event_time, _, wave = heapq.heappop(self._heap)
+            if event_time > self.now:
+                self.now = event_time
+            level = wave.level_after(wave.idx)
+            wave.idx += 1
+            self._push(wave)
+            wave.pin._drive(level)
+        if when > self.now:
+            self.now = when
+
+    def advance(self, delta_us: float) -> None:
+        self.advance_to(self.now + delta_us)
+
+    def idle(self) -> bool:
+        return not self._heap
+
+    def next_event(self):
+        """
+        Time of the next queued pin transition, or None if nothing is queued
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def irq(self, handler, pin) -> None:
+        """
+        Run a pin IRQ handler, or hold it until interrupts are re-enabled
+        """
+        if not self.irq_enabled and not pin.remote:
+            self._pending_irqs.append((handler, pin))
+            return
+        self.in_irq = True
+        try:
+            handler(pin)
+        finally:
+            self.in_irq = False
+        self.run_scheduled()
+
+    def release_irqs(self) -> None:
+        pending = self._pending_irqs
+        self._pending_irqs = []
+        for handler, pin in pending:
+            self.irq(handler, pin)
+
+    def schedule(self, func, arg) -> None:
+        self._scheduled.append((func, arg))
+        if not self.in_irq:
+            self.run_scheduled()
+
+    def run_scheduled(self) -> None:
+        while self._scheduled:
+            func, arg = self._scheduled.pop(0)
+            func(arg)
+
+
+class _Waveform:
+    def __init__(self, pin, times, start_level: int) -> None:
+        self.pin = pin
+        self.times = times
+        self.start_level = start_level
+        self.idx = 0
+
+    def level_after(self, idx: int) -> int:
+        return self.start_level ^ ((idx + 1) & 1)
+
+
+clock = VirtualClock()
@@ -0,0 +1,124 @@
+# Batch stages of the ground-station decoder, see gsdecode.py: the frames in the bit stream of a capture and
+#   the Hamming codewords of their payloads, each found or decoded all at once with NumPy
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from encoding import HAMMING_CODES, HAMMING_TOTAL_SIZE
+from framing import crc16, FRAME_SYNC_WORD, FRAME_SYNC_MAX_ERRORS, FRAME_HEADER_SIZE, FRAME_CRC_SIZE, \
+    FRAME_MAX_PAYLOAD
+
+
+def _popcount16(values):
+    table = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+    return table[values >> 8] + table[values & 0xFF]
+
+def find_frames(bits, seg_bounds) -> list:
+    """
+    Find the frames in the bit stream: every position the sync word matches, within FRAME_SYNC_MAX_ERRORS,
+    at once, then the header and CRC of each candidate in turn, skipping the candidates inside a frame
+
+    Args:
+        bits (array): Every bit of the capture
+        seg_bounds (array): Index of the first bit of every segment, and the number of bits after the last
+
+    Returns:
+        list: (segment, seq, flags, payload start bit, payload length, CRC ok) of every frame with a valid header
+    """
+    if len(bits) < 16:
+        return []
+    windows = np.lib.stride_tricks.sliding_window_view(bits, 16).astype(np.int64) @ (1 << np.arange(15, -1, -1))
+    candidates = np.flatnonzero(_popcount16(windows ^ FRAME_SYNC_WORD) <= FRAME_SYNC_MAX_ERRORS) + 16
+    segments = np.searchsorted(seg_bounds, candidates, side='right') - 1
+    frames = []
+    next_bit = 0
+    for start, segment in zip(candidates.tolist(), segments.tolist()):
+        if start < next_bit:
+            continue
+        seg_end = seg_bounds[segment + 1]
+        payload = start + 8 * FRAME_HEADER_SIZE
+        if payload > seg_end:
+            continue
+        header = np.packbits(bits[start:payload]).tobytes()
+        length = (header[0] << 8) | header[1]
+        if header[4] != crc16(header[0:4]) & 0xFF or length > FRAME_MAX_PAYLOAD:
+            continue
+        end = payload + 8 * (length + FRAME_CRC_SIZE)
+        if end > seg_end:
+            continue
+        body = np.packbits(bits[payload:end]).tobytes()
+        crc_ok = crc16(body[:length], crc16(header)) == (body[length] << 8) | body[length + 1]
+        frames.append((segment, header[2], header[3], payload, length, crc_ok))
+        next_bit = end
+    return frames
+
+
+class BatchHamming:
+    def __init__(self, total_size: int=HAMMING_TOTAL_SIZE) -> None:
+        """
+        SECDED Hamming decoder of whole arrays of codewords, with the codeword layout of hammingcode.HammingCode
+
+        Args:
+            total_size (int, optional): Codeword bits, one of HAMMING_CODES. Defaults to HAMMING_TOTAL_SIZE.
+        """
+        if total_size not in HAMMING_CODES:
+            raise ValueError(f"Unsupported Hamming block size {total_size}, choose from {tuple(HAMMING_CODES)}")
+        self.total_size = total_size
+        self.data_size, self.parity_size = HAMMING_CODES[total_size]
+        positions = np.arange(total_size)
+        # Everything but position 0 and the powers of two
+        self.data_positions = positions[(positions & (positions - 1)) != 0]
+        # Bit i of every position, the syndrome of a codeword is the XOR of the positions of its 1 bits
+        self.syndrome_matrix = (positions[:, None] >> np.arange(self.parity_size)) & 1
+        self.syndrome_weights = 1 << np.arange(self.parity_size)
+
+    def decode(self, codewords) -> tuple:
+        """
+        Correct every codeword with a single bit error, and flag those with two
+
+        Args:
+            codewords (array): (codewords, total_size) array of bits, corrected in place
+
+        Returns:
+            tuple: (data bits as a (codewords, data_size) array, corrected per codeword, detected per codeword)
+        """
+        syndromes = ((codewords @ self.syndrome_matrix) & 1) @ self.syndrome_weights
+        corrected = (codewords.sum(axis=1) & 1).astype(bool)
+        # An odd number of flipped bits is taken as one, at the position the syndrome points to, the total
+        #   parity bit for a syndrome of 0
+        rows = np.flatnonzero(corrected)
+        codewords[rows, syndromes[rows]] ^= 1
+        detected = ~corrected & (syndromes != 0)
+        return codewords[:, self.data_positions], corrected, detected
+
+    def decode_blocks(self, bits, blocks: list) -> tuple:
+        """
+        Decode the codewords of many blocks of the bit stream, e.g. frame payloads, in one batch. Each block
+        holds whole codewords from its start, what is left at its end is padding
+
+        Args:
+            bits (array): The bit stream
+            blocks (list): (start bit, bit count) of every block
+
+        Returns:
+            tuple: (data bytes of every block, codewords, corrected and detected codewords of every block)
+        """
+        total = self.total_size
+        counts = np.array([count // total for _, count in blocks], dtype=np.int64)
+        if not counts.sum():
+            empty = np.zeros(len(blocks), dtype=np.int64)
+            return [b''] * len(blocks), counts, empty, empty
+        index = np.concatenate([np.arange(start, start + count * total) for (start, _), count in zip(blocks, counts)])
+        codewords = bits[index].reshape(-1, total).astype(np.int64)
+        data, corrected, detected = self.decode(codewords)
+        data = data.astype(np.uint8)
+        ends = np.cumsum(counts)[:-1]
+        block_data = np.split(data, ends)
+        block_bytes = []
+        for block in block_data:
+            # Whole bytes only, the rest pads the last codeword
+            flat = block.reshape(-1)
+            block_bytes.append(np.packbits(flat[:len(flat) & ~7]).tobytes())
+        return block_bytes, counts, np.add.reduceat(corrected, np.r_[0, ends]) * (counts > 0), \
+            np.add.reduceat(detected, np.r_[0, ends]) * (counts > 0)
@@ -0,0 +1,77 @@
+# Capture stage of the ground-station decoder, see gsdecode.py: the capture file to pulses and bit decisions
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GS_UNITS = {'s': 1e6, 'ms': 1e3, 'us': 1.0, 'ns': 1e-3}
+# Adaptive threshold: rounds of two-means clustering of the pulse widths
+GS_CLUSTER_ROUNDS = 8
+
+
+def load_capture(path: str, unit: str, first: int):
+    """
+    Returns:
+        tuple: (edge times in us, detector level after each edge) as arrays, in time order
+    """
+    if path.endswith('.npy'):
+        table = np.load(path)
+    else:
+        # Skip the header lines of a logic analyser export
+        with open(path) as f:
+            skip = 0
+            for line in f:
+                try:
+                    float(line.replace(',', ' ').split()[0])
+                    break
+                except (ValueError, IndexError):
+                    skip += 1
+        table = np.loadtxt(path, delimiter=',' if path.endswith('.csv') else None, skiprows=skip, ndmin=2)
+    table = np.asarray(table, dtype=np.float64)
+    if table.ndim == 1 or table.shape[1] == 1:
+        times = table.reshape(-1)
+        levels = (np.arange(len(times)) + first) & 1
+    else:
+        times = table[:, 0]
+        levels = table[:, 1].astype(np.uint8) & 1
+    order = np.argsort(times, kind='stable')
+    times = times[order] * GS_UNITS[unit]
+    levels = levels[order]
+    # Samples rather than changes: keep only the rows where the level changes
+    keep = np.ones(len(levels), dtype=bool)
+    keep[1:] = levels[1:] != levels[:-1]
+    return times[keep], levels[keep]
+
+def pulses(times, levels, lit: int):
+    """
+    Returns:
+        tuple: (start in us, width in us) of every pulse of light, a lit level followed by a dark one
+    """
+    starts = np.flatnonzero((levels[:-1] == lit) & (levels[1:] != lit))
+    return times[starts], times[starts + 1] - times[starts]
+
+def threshold_us(widths, timing: tuple, adaptive: bool) -> float:
+    """
+    Width between the 0 and 1 pulses, from the nominal high times, or learned from the capture by two-means
+    clustering starting there, as classifier.py does while receiving
+    """
+    centroid_0 = timing[0] / 1000
+    centroid_1 = timing[2] / 1000
+    if adaptive and len(widths):
+        for _ in range(GS_CLUSTER_ROUNDS):
+            ones = widths > (centroid_0 + centroid_1) / 2
+            if ones.all() or not ones.any():
+                break
+            centroid_0 = widths[~ones].mean()
+            centroid_1 = widths[ones].mean()
+    return (centroid_0 + centroid_1) / 2
+
+def segment_ids(starts, widths, gap_us: float):
+    """
+    Returns:
+        array: Segment number of every pulse, a new segment starting after each silence longer than gap_us
+    """
+    ids = np.zeros(len(starts), dtype=np.int64)
+    if len(starts) > 1:
+        ids[1:] = np.cumsum(starts[1:] - (starts[:-1] + widths[:-1]) > gap_us)
+    return ids
@@ -0,0 +1,181 @@
+# Host-side ground-station decoder for captured pulse traces
+# Decodes a capture of the detector line, from a logic analyser export or raw edge timestamps, with NumPy
+#   array operations from start to finish instead of replaying it bit by bit through the receiver:
+#   edge times -> pulse widths -> bit decisions -> frames -> np.packbits() -> Hamming syndrome correction of
+#   every codeword of the capture in one batch. Multi-million-edge captures decode in seconds
+# The pulse timing comes from BITSTREAM_TIMING (libraries/laser.py) and the Hamming layout from HAMMING_CODES
+#   and HammingCode (libraries/encoding.py, hammingcode.py): position 0 the total parity bit, parity bits at
+#   the powers of two and data bits everywhere else, codewords packed back to back MSB first. Transmissions
+#   are told apart by silences longer than RX_MAX_ERASED_BITS bit periods, and each one is a segment of the
+#   report, one line per segment:
+#   pulses, invalid pulses, bits, frames, codewords, corrected and detected codewords, and the channel BER
+#   they imply, (corrected + 2 detected) / codeword bits. With ref= the message that was sent, each segment
+#   also gets its residual BER after correction, the bytes of frames that never arrived counting as wrong
+# Capture formats: a .npy array or a text/CSV file, of edge times, or of (time, level) rows such as a logic
+#   analyser exports, header lines allowed. Edge times alone alternate in level from first=
+# Framed captures (framed=1) are searched for frames, and the payloads of data frames are decoded, e.g. of a
+#   TxPipeline with encode=hamming_encode_into. Compressed, FEC and control frames are only counted. With
+#   framed=0 every segment is one run of codewords, as an unframed link sends them. code=0 skips the
+#   Hamming stage
+# The capture stage is in gscapture.py, the frame search and Hamming decoder in gsbatch.py
+#
+# Usage: python tools/gsdecode.py capture [unit=s|ms|us|ns] [first=0|1] [lit=0|1] [framed=0|1] [code=8|16|32|0]
+#   [timing=h0,l0,h1,l1] [threshold=us] [adaptive=0|1] [ref=file] [out=file]
+import sys
+
+_TOOLS_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _TOOLS_DIR + '/../libraries')
+# For the micropython, machine and utime stand-ins
+sys.path.insert(0, _TOOLS_DIR + '/../sim')
+
+from time import perf_counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from laser import BITSTREAM_TIMING
+from rxedge import RX_MAX_ERASED_BITS
+from encoding import HAMMING_CODES, HAMMING_TOTAL_SIZE
+from framing import FRAME_FLAG_LAST, FRAME_FLAG_COMPRESSED, FRAME_FLAG_FEC, FRAME_CONTROL_FLAGS
+from gscapture import load_capture, pulses, threshold_us, segment_ids, GS_UNITS
+from gsbatch import find_frames, BatchHamming
+
+
+def decode_capture(times, levels, args: dict) -> list:
+    """
+    Returns:
+        list: A dict of statistics and decoded data for every segment of the capture
+    """
+    timing = BITSTREAM_TIMING if args['timing'] is None else tuple(int(t) for t in args['timing'].split(','))
+    starts, widths = pulses(times, levels, int(args['lit']))
+    max_pulse_us = (timing[2] + timing[3]) / 1000
+    gap_us = RX_MAX_ERASED_BITS * max((timing[0] + timing[1]) / 1000, max_pulse_us)
+    ids = segment_ids(starts, widths, gap_us)
+    # Pulses too long to be a bit, merged by stray light, are dropped as the receiver does
+    valid = widths <= max_pulse_us
+    threshold = float(args['threshold']) if args['threshold'] else \
+        threshold_us(widths[valid], timing, args['adaptive'] == '1')
+    bits = (widths[valid] > threshold).astype(np.uint8)
+    n_segments = int(ids[-1]) + 1 if len(ids) else 0
+    pulse_counts = np.bincount(ids, minlength=n_segments)
+    bit_counts = np.bincount(ids[valid], minlength=n_segments)
+    seg_bounds = np.r_[0, np.cumsum(bit_counts)]
+    segments = [{'segment': seg, 'start_s': round(float(starts[np.searchsorted(ids, seg)]) / 1e6, 6),
+                 'pulses': int(pulse_counts[seg]), 'invalid': int(pulse_counts[seg] - bit_counts[seg]),
+                 'bits': int(bit_counts[seg]), 'frames': 0, 'crc_bad': 0, 'skipped': 0, 'codewords': 0,
+                 'corrected': 0, 'detected': 0, 'missing': 0, 'data': bytearray(), 'present': bytearray()}
+                for seg in range(n_segments)]
+    # Blocks of codewords, the segment each belongs to and the frames missing before it
+    blocks = []
+    owners = []
+    gaps = []
+    if args['framed'] == '1':
+        # Sequence number and flags of the last data frame of every segment
+        previous = {}
+        for segment, seq, flags, payload, length, crc_ok in find_frames(bits, seg_bounds):
+            stats = segments[segment]
+            stats['frames'] += 1
+            stats['crc_bad'] += not crc_ok
+            if flags & (FRAME_CONTROL_FLAGS | FRAME_FLAG_COMPRESSED | FRAME_FLAG_FEC):
+                stats['skipped'] += 1
+                continue
+            # Every message starts at sequence number 0, and the one after a last frame is a new message
+            prev_seq, prev_flags = previous.get(segment, (-1, FRAME_FLAG_LAST))
+            gaps.append(seq if prev_flags & FRAME_FLAG_LAST else (seq - prev_seq - 1) & 0xFF)
+            previous[segment] = (seq, flags)
+            blocks.append((payload, 8 * length))
+            owners.append(segment)
+    else:
+        for seg in range(n_segments):
+            blocks.append((int(seg_bounds[seg]), int(bit_counts[seg])))
+            owners.append(seg)
+            gaps.append(0)
+    code = int(args['code'])
+    if code:
+        block_bytes, counts, corrected, detected = BatchHamming(code).decode_blocks(bits, blocks)
+        for owner, count, fixed, flagged in zip(owners, counts.tolist(), corrected.tolist(), detected.tolist()):
+            stats = segments[owner]
+            stats['codewords'] += count
+            stats['corrected'] += fixed
+            stats['detected'] += flagged
+    else:
+        block_bytes = [np.packbits(bits[start:start + (count & ~7)]).tobytes() for start, count in blocks]
+    # Lay the data out as it was sent, a missing frame taking the place of a full one, zeros that the
+    #   present mask leaves out
+    full = {}
+    for owner, data in zip(owners, block_bytes):
+        full[owner] = max(full.get(owner, 0), len(data))
+    for owner, data, gap in zip(owners, block_bytes, gaps):
+        stats = segments[owner]
+        stats['missing'] += gap * full[owner]
+        stats['data'] += bytes(gap * full[owner]) + data
+        stats['present'] += bytes(gap * full[owner]) + b'\x01' * len(data)
+    for stats in segments:
+        code_bits = stats['codewords'] * code
+        stats['ber'] = (stats['corrected'] + 2 * stats['detected']) / code_bits if code_bits else 0.0
+    return segments
+
+def residual_ber(stats: dict, ref: bytes) -> float:
+    """
+    Returns:
+        float: Bits of the reference message that the decoded data of a segment gets wrong, or lacks, per
+            reference bit
+    """
+    if not ref:
+        return 0.0
+    common = min(len(stats['data']), len(ref))
+    diff = np.frombuffer(stats['data'], dtype=np.uint8, count=common) ^ np.frombuffer(ref, dtype=np.uint8, count=common)
+    present = np.frombuffer(stats['present'], dtype=bool, count=common)
+    errors = int(np.unpackbits(diff[present]).sum()) + 8 * (len(ref) - int(present.sum()))
+    return errors / (8 * len(ref))
+
+def _parse_args(argv: list) -> dict:
+    args = {'capture': None, 'unit': 's', 'first': '0', 'lit': '0', 'framed': '1', 'code': str(HAMMING_TOTAL_SIZE),
+            'timing': None, 'threshold': None, 'adaptive': '1', 'ref': None, 'out': None}
+    for arg in argv:
+        key, sep, value = arg.partition('=')
+        if not sep:
+            key, value = 'capture', arg
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    if args['capture'] is None:
+        raise SystemExit("No capture file given")
+    if args['unit'] not in GS_UNITS:
+        raise SystemExit(f"Unknown unit {args['unit']}, expected one of {', '.join(GS_UNITS)}")
+    if args['code'] != '0' and int(args['code']) not in HAMMING_CODES:
+        raise SystemExit(f"Unknown code {args['code']}, expected 0 or one of {', '.join(map(str, HAMMING_CODES))}")
+    return args
+
+def main(argv: list) -> None:
+    if np is None:
+        raise SystemExit("The ground-station decoder needs NumPy: pip install numpy")
+    args = _parse_args(argv)
+    start = perf_counter()
+    times, levels = load_capture(args['capture'], args['unit'], int(args['first']))
+    loaded = perf_counter()
+    segments = decode_capture(times, levels, args)
+    decoded = perf_counter()
+    ref = None
+    if args['ref'] is not None:
+        with open(args['ref'], 'rb') as f:
+            ref = f.read()
+    for stats in segments:
+        line = ' '.join(f"{key}={value}" for key, value in stats.items() if key not in ('data', 'present', 'ber'))
+        line += f" bytes={len(stats['data'])} ber={stats['ber']:.2e}"
+        if ref is not None:
+            line += f" residual_ber={residual_ber(stats, ref):.2e}"
+        print(line)
+    if args['out'] is not None:
+        with open(args['out'], 'wb') as f:
+            for stats in segments:
+                f.write(stats['data'])
+    elapsed = decoded - start
+    print(f"{len(times)} edges, {len(segments)} segments: loaded in {loaded - start:.2f} s, decoded in "
+          f"{decoded - loaded:.2f} s ({len(times) / max(elapsed, 1e-9):.0f} edges/s)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
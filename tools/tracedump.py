@@ -0,0 +1,49 @@
+# Host-side trace decoder
+# Renders a binary trace dump written by Trace.save() (libraries/tracering.py), copied off the board e.g. with
+#   mpremote cp :linda_trace.bin . , one event per line with its time, sequence number and level. Gaps in the
+#   sequence numbers are the events that were recorded but overwritten before the dump
+#
+# Usage: python tools/tracedump.py [file] [level=debug|info|warning|error]
+import sys
+
+_TOOLS_DIR = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+sys.path.insert(0, _TOOLS_DIR + '/../libraries')
+# For the micropython and utime stand-ins
+sys.path.insert(0, _TOOLS_DIR + '/../sim')
+
+from trace import decode, render, TRACE_FILE, TRACE_LEVEL_NAMES
+
+
+def _parse_args(argv: list) -> dict:
+    args = {'file': TRACE_FILE, 'level': 'debug'}
+    for arg in argv:
+        key, sep, value = arg.partition('=')
+        if not sep:
+            key, value = 'file', arg
+        if key not in args:
+            raise SystemExit(f"Unknown option {key}, expected one of {', '.join(args)}")
+        args[key] = value
+    return args
+
+def main(argv: list) -> None:
+    args = _parse_args(argv)
+    levels = {name.lower(): level for level, name in TRACE_LEVEL_NAMES.items()}
+    if args['level'] not in levels:
+        raise SystemExit(f"Unknown level {args['level']}, expected one of {', '.join(levels)}")
+    with open(args['file'], 'rb') as f:
+        entries = decode(f.read())
+    start = entries[0][0] if entries else 0
+    expected = entries[0][3] if entries else 0
+    for tick, event, level, seq, a, b, c in entries:
+        if seq != expected:
+            print(f"... {(seq - expected) & 0xFFFF} events lost")
+        expected = (seq + 1) & 0xFFFF
+        if level < levels[args['level']]:
+            continue
+        # TICKS_US wraps around at 2^32
+        elapsed_ms = ((tick - start) & 0xFFFFFFFF) / 1000
+        print(f"{elapsed_ms:>10.3f} ms {seq:>5} {TRACE_LEVEL_NAMES.get(level, level):<7} {render(event, a, b, c)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])